@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'core',
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,16 +80,54 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+# Connections persist for DB_CONN_MAX_AGE seconds. Setting DB_ENGINE to
+# core.backends.postgresql_pool shares them between the threads of a
+# process instead, returning each to the pool when its request ends
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'django.db.backends.postgresql')
+DB_POOLED = DB_ENGINE == 'core.backends.postgresql_pool'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': DB_ENGINE,
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': 0 if DB_POOLED else int(
+            os.environ.get('DB_CONN_MAX_AGE', 60)
+        ),
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_SIZE', 10)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+        },
     }
 }
 
+# Ping persistent connections at the start of each request
+DB_HEALTH_CHECKS = os.environ.get('DB_HEALTH_CHECKS', '1') == '1'
+
+# Read replicas, given as comma separated hosts in DB_REPLICA_HOSTS. Safe
+# recipe API requests read from one unless the user wrote in the last
+# DB_PRIMARY_PIN_SECONDS or every replica lags more than DB_REPLICA_MAX_LAG
+# seconds behind the primary. The pins live in the CACHES alias named by
+# DB_PRIMARY_PIN_CACHE, which must be shared between processes
+
+DB_REPLICAS = []
+for index, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+    DB_REPLICAS.append(f'replica_{index}')
+    DATABASES[DB_REPLICAS[-1]] = dict(
+        DATABASES['default'],
+        HOST=host.strip(),
+        TEST={'MIRROR': 'default'}
+    )
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+DB_PRIMARY_PIN_SECONDS = int(os.environ.get('DB_PRIMARY_PIN_SECONDS', 5))
+DB_REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+DB_PRIMARY_PIN_CACHE = os.environ.get('DB_PRIMARY_PIN_CACHE')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -132,3 +172,92 @@ MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
 AUTH_USER_MODEL = 'core.User' 
+
+
+# Django REST framework
+# The JSON renderer and parser use orjson when it is installed and fall
+# back to the standard library otherwise
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'core.renderers.ChunkedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
+
+
+# Caches
+# The responses cache can be moved to disk locally with
+# RESPONSE_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# and a directory in RESPONSE_CACHE_LOCATION
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': os.environ.get(
+            'RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('RESPONSE_CACHE_LOCATION', 'responses'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+
+# Token authentication cache
+# TOKEN_AUTH_SHARED_CACHE names a CACHES alias shared between processes
+
+TOKEN_AUTH_CACHE_SIZE = int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 1024))
+TOKEN_AUTH_CACHE_TTL = int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60))
+TOKEN_AUTH_SHARED_CACHE = os.environ.get('TOKEN_AUTH_SHARED_CACHE')
+TOKEN_AUTH_SHARED_CACHE_TTL = 300
+
+
+# Recipe image processing
+# IMAGE_PROCESSING_BACKEND is 'process' for a worker pool or 'sync' to
+# process uploads inline
+
+IMAGE_PROCESSING_BACKEND = os.environ.get('IMAGE_PROCESSING_BACKEND', 'process')
+IMAGE_PROCESSING_WORKERS = int(os.environ.get('IMAGE_PROCESSING_WORKERS', 2))
+IMAGE_STAGING_ROOT = '/vol/web/staging'
+IMAGE_MAX_DIMENSION = 2048
+IMAGE_DERIVATIVE_SIZES = {'small': 160, 'medium': 480, 'large': 1024}
+IMAGE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+IMAGE_UPLOAD_EXPIRY = 24 * 60 * 60
+# A chunk still being written after this long is taken to have failed
+IMAGE_UPLOAD_WRITE_TIMEOUT = 10 * 60
+
+
+# Request instrumentation
+# Per view figures are served to admins at /api/instrumentation/. Off
+# unless an environment opts in with INSTRUMENTATION_ENABLED=1
+
+INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED') == '1'
+INSTRUMENTATION_DUPLICATE_QUERY_THRESHOLD = 3
+
+
+
+# Response cache
+# RESPONSE_CACHE names the CACHES alias for cached read responses, empty to
+# disable caching
+
+RESPONSE_CACHE = os.environ.get('RESPONSE_CACHE', 'responses')
+RESPONSE_CACHE_TIMEOUT = 300
+
+
+# Denormalized recipe links
+# Recipe lists and Postgres tag and ingredient filters read the id arrays
+# stored on each recipe instead of the through tables. Turn off while the
+# arrays need rebuilding with the rebuild_related_ids command
+
+RECIPE_DENORMALIZED_IDS = os.environ.get(
+    'RECIPE_DENORMALIZED_IDS', '1'
+) == '1'
@@ -18,8 +18,15 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from core.views import InstrumentationView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
+    path(
+        'api/instrumentation/',
+        InstrumentationView.as_view(),
+        name='instrumentation'
+    ),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
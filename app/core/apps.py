@@ -3,3 +3,13 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.core.signals import request_started
+
+        from core import signals  # noqa
+        from core.connections import check_connections
+        from core.routers import check_pin_cache
+
+        check_pin_cache()
+        request_started.connect(check_connections)
@@ -0,0 +1,155 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    """Thread safe LRU of token keys to cache entries with a time to live"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached entry for key or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+
+            return value
+
+    def set(self, key, value):
+        """Cache value, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove key from the cache"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(
+    max_size=getattr(settings, 'TOKEN_AUTH_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 60),
+)
+
+
+def _shared_cache():
+    """Return the shared cache tier if one is configured"""
+    alias = getattr(settings, 'TOKEN_AUTH_SHARED_CACHE', None)
+    if alias is None:
+        return None
+
+    return caches[alias]
+
+
+def _shared_cache_key(key):
+    """Return the shared cache key for a token without exposing the token"""
+    digest = hashlib.sha256(key.encode()).hexdigest()
+
+    return f'auth-token:{digest}'
+
+
+def invalidate_token(key):
+    """Drop a token from both cache tiers"""
+    token_cache.delete(key)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(_shared_cache_key(key))
+
+
+def _token_entry(token):
+    """Return the values of a token worth caching
+
+    Only the token row is cached. The user is read by primary key on every
+    request, so password changes and deactivation apply everywhere at once
+    and no user data is kept in the caches.
+    """
+    return (token.key, token.user_id, token.created)
+
+
+def _token_from_entry(entry):
+    """Build a token for one request from a cache entry, with its user"""
+    token = Token.from_db(
+        DEFAULT_DB_ALIAS,
+        ['key', 'user_id', 'created'],
+        entry
+    )
+    try:
+        token.user = get_user_model().objects.get(pk=token.user_id)
+    except get_user_model().DoesNotExist:
+        invalidate_token(token.key)
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+    return token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches token lookups
+
+    Tokens are kept in a bounded in-process LRU and, when
+    TOKEN_AUTH_SHARED_CACHE names a cache alias, in that cache as well.
+    Deleting a token invalidates both tiers in the current process; other
+    processes only drop their local entry once TOKEN_AUTH_CACHE_TTL
+    expires, so keep that short. Users are always read from the database.
+    """
+
+    def authenticate_credentials(self, key):
+        """Return the user and token for key, using the caches if possible
+
+        A cached token costs one primary key lookup of its user instead of
+        the token query joined to the user.
+        """
+        entry = token_cache.get(key)
+        shared = _shared_cache()
+        if entry is None and shared is not None:
+            entry = shared.get(_shared_cache_key(key))
+            if entry is not None:
+                token_cache.set(key, entry)
+        if entry is None:
+            user, token = super().authenticate_credentials(key)
+            entry = _token_entry(token)
+            if shared is not None:
+                shared.set(
+                    _shared_cache_key(key),
+                    entry,
+                    getattr(settings, 'TOKEN_AUTH_SHARED_CACHE_TTL', 300)
+                )
+            token_cache.set(key, entry)
+
+            return (user, token)
+
+        token = _token_from_entry(entry)
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+
+        return (token.user, token)
@@ -0,0 +1,33 @@
+from django.db.backends.postgresql import base
+
+from core.connections import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL backend drawing connections from an in-process pool
+
+    The POOL entry of the database settings sets MAX_SIZE and TIMEOUT, the
+    seconds to wait for a free connection. With CONN_MAX_AGE at 0 each
+    request hands its connection back to the pool when it finishes.
+    """
+
+    def _pool(self, conn_params=None):
+        options = self.settings_dict.get('POOL', {})
+
+        return get_pool(
+            self.alias,
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            ),
+            max_size=options.get('MAX_SIZE', 10),
+            timeout=options.get('TIMEOUT', 5.0),
+            reset=lambda connection: connection.rollback()
+        )
+
+    def get_new_connection(self, conn_params):
+        return self._pool(conn_params).checkout()
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self._pool().checkin(self.connection)
@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import connections
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection frees up in time"""
+
+
+def ping(connection):
+    """Return whether a DB-API connection still answers a query"""
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+    except Exception:
+        return False
+
+    return True
+
+
+def _close(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """Thread safe pool of DB-API connections
+
+    Up to max_size connections are opened with connect. Checked out
+    connections that fail check are replaced, and a checkout waits up to
+    timeout seconds for one to be checked in before raising PoolTimeout.
+    """
+
+    def __init__(self, connect, max_size=10, timeout=5.0, check=ping,
+                 reset=None):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check = check
+        self.reset = reset
+        self._idle = deque()
+        self._size = 0
+        self._lock = threading.Condition()
+        self._counts = dict.fromkeys(
+            ('checkouts', 'connects', 'discarded', 'waits', 'timeouts'), 0
+        )
+        self._wait_ms = 0.0
+        self._max_wait_ms = 0.0
+
+    def checkout(self):
+        """Return a live connection, opening one while below max_size"""
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        connection = None
+        waited = False
+        with self._lock:
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._counts['timeouts'] += 1
+                    raise PoolTimeout(
+                        f'No connection free after {self.timeout} seconds'
+                    )
+                waited = True
+                self._lock.wait(remaining)
+            if self._idle:
+                connection = self._idle.pop()
+            else:
+                self._size += 1
+            self._counts['checkouts'] += 1
+            if waited:
+                wait_ms = (time.perf_counter() - start) * 1000
+                self._counts['waits'] += 1
+                self._wait_ms += wait_ms
+                self._max_wait_ms = max(self._max_wait_ms, wait_ms)
+
+        if connection is not None and self.check is not None and \
+                not self.check(connection):
+            _close(connection)
+            with self._lock:
+                self._counts['discarded'] += 1
+            connection = None
+        if connection is None:
+            connection = self._connect()
+
+        return connection
+
+    def _connect(self):
+        try:
+            connection = self.connect()
+        except Exception:
+            self._release_slot()
+            raise
+        with self._lock:
+            self._counts['connects'] += 1
+
+        return connection
+
+    def _release_slot(self):
+        with self._lock:
+            self._size -= 1
+            self._lock.notify()
+
+    def checkin(self, connection):
+        """Return a checked out connection to the pool"""
+        if self.reset is not None:
+            try:
+                self.reset(connection)
+            except Exception:
+                self.discard(connection)
+                return
+        with self._lock:
+            self._idle.append(connection)
+            self._lock.notify()
+
+    def discard(self, connection):
+        """Close a checked out connection instead of returning it"""
+        _close(connection)
+        with self._lock:
+            self._counts['discarded'] += 1
+        self._release_slot()
+
+    def stats(self):
+        """Return the size, usage and wait time of the pool"""
+        with self._lock:
+            checkouts = self._counts['checkouts'] or 1
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                **self._counts,
+                'mean_wait_ms': round(self._wait_ms / checkouts, 3),
+                'max_wait_ms': round(self._max_wait_ms, 3),
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, connect, **options):
+    """Return the pool of a database alias, creating it on first use"""
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = ConnectionPool(connect, **options)
+
+        return pool
+
+
+def pool_stats():
+    """Return the stats of every connection pool in this process"""
+    with _pools_lock:
+        return {alias: pool.stats() for alias, pool in sorted(_pools.items())}
+
+
+def check_connections(**kwargs):
+    """Close persistent connections that stopped answering
+
+    Connected to request_started so a connection the database dropped
+    while idle is reopened instead of failing the request.
+    """
+    if not settings.DB_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if connection.connection is not None and \
+                not connection.in_atomic_block and \
+                not connection.is_usable():
+            connection.close()
@@ -0,0 +1,76 @@
+from django.db import NotSupportedError, models
+from django.db.models import Lookup
+
+
+class IdArrayField(models.Field):
+    """List of integer ids, stored as an integer array on PostgreSQL
+
+    Other databases store the ids as comma separated text, which can be
+    read back but not filtered on.
+    """
+    description = 'List of integer ids'
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return 'integer[]'
+
+        return 'text'
+
+    def get_placeholder(self, value, compiler, connection):
+        # An empty array literal has no type of its own on PostgreSQL
+        if connection.vendor == 'postgresql':
+            return '%s::integer[]'
+
+        return '%s'
+
+    def to_python(self, value):
+        if value is None or isinstance(value, list):
+            return value
+        if isinstance(value, str):
+            return [int(pk) for pk in value.split(',') if pk]
+
+        return list(value)
+
+    def from_db_value(self, value, expression, connection):
+        return self.to_python(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is None:
+            return None
+        if connection.vendor == 'postgresql':
+            return [int(pk) for pk in value]
+
+        return ','.join(str(pk) for pk in value)
+
+
+class IdArrayLookup(Lookup):
+    """Array operator lookup, available on PostgreSQL only"""
+    operator = None
+
+    def as_sql(self, compiler, connection):
+        raise NotSupportedError(
+            f'{self.lookup_name} lookups on id arrays need PostgreSQL'
+        )
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+
+        return (
+            f'{lhs} {self.operator} {rhs}::integer[]',
+            lhs_params + rhs_params
+        )
+
+
+@IdArrayField.register_lookup
+class IdArrayContains(IdArrayLookup):
+    """Match arrays holding every one of the given ids"""
+    lookup_name = 'contains'
+    operator = '@>'
+
+
+@IdArrayField.register_lookup
+class IdArrayOverlap(IdArrayLookup):
+    """Match arrays holding any of the given ids"""
+    lookup_name = 'overlap'
+    operator = '&&'
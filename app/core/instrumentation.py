@@ -0,0 +1,208 @@
+import bisect
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+# Upper bounds of the latency histogram buckets in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:\s*\?\s*,?)+\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Return sql with literals removed so repeats of a query compare equal
+
+    String and numeric literals and %s placeholders become ?, and IN lists
+    of any length collapse to IN (...).
+    """
+    sql = _STRING.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+
+    return _SPACE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """Database execute wrapper counting and timing queries by fingerprint"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self, threshold):
+        """Return fingerprints run at least threshold times, most first"""
+        return [
+            (sql, count) for sql, count in self.fingerprints.most_common()
+            if count >= threshold
+        ]
+
+
+@contextmanager
+def time_serialization(request):
+    """Add the time spent in the block to the serialize timing of request
+
+    Nothing is measured unless InstrumentationMiddleware handles request.
+    """
+    # DRF requests keep attributes apart from the wrapped HttpRequest
+    timing = getattr(
+        getattr(request, '_request', request),
+        '_serialize_timing',
+        None
+    )
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing[0] += time.perf_counter() - start
+
+
+class ViewStats:
+    """Aggregated measurements of the requests to one view"""
+
+    def __init__(self):
+        self.requests = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.sql_ms = 0.0
+        self.render_ms = 0.0
+        self.serialize_ms = 0.0
+        self.response_bytes = 0
+        self.duplicate_requests = 0
+        self.duplicates = Counter()
+
+    def add(self, total_ms, queries, sql_ms, render_ms, serialize_ms, size,
+            duplicates):
+        self.requests += 1
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, total_ms)] += 1
+        self.total_ms += total_ms
+        self.max_ms = max(self.max_ms, total_ms)
+        self.queries += queries
+        self.max_queries = max(self.max_queries, queries)
+        self.sql_ms += sql_ms
+        self.render_ms += render_ms
+        self.serialize_ms += serialize_ms
+        self.response_bytes += size
+        if duplicates:
+            self.duplicate_requests += 1
+            for sql, count in duplicates:
+                self.duplicates[sql] = max(self.duplicates[sql], count)
+
+    def as_dict(self):
+        requests = self.requests or 1
+        buckets = {
+            f'le_{bound}ms': count
+            for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)
+        }
+        buckets['le_inf'] = self.buckets[-1]
+
+        return {
+            'requests': self.requests,
+            'latency_buckets': buckets,
+            'mean_ms': round(self.total_ms / requests, 3),
+            'max_ms': round(self.max_ms, 3),
+            'mean_queries': round(self.queries / requests, 2),
+            'max_queries': self.max_queries,
+            'mean_sql_ms': round(self.sql_ms / requests, 3),
+            'mean_render_ms': round(self.render_ms / requests, 3),
+            'mean_serialize_ms': round(self.serialize_ms / requests, 3),
+            'mean_response_bytes': round(self.response_bytes / requests),
+            'duplicate_query_requests': self.duplicate_requests,
+            'duplicate_queries': [
+                {'sql': sql, 'max_per_request': count}
+                for sql, count in self.duplicates.most_common(10)
+            ],
+        }
+
+
+class RequestStats:
+    """Thread safe in-memory measurements of every view in this process"""
+
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def record(self, view, **measurements):
+        """Add the measurements of one request to a view"""
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = ViewStats()
+            stats.add(**measurements)
+
+    def snapshot(self):
+        """Return the aggregated measurements of every view"""
+        with self._lock:
+            return {
+                view: stats.as_dict()
+                for view, stats in sorted(self._views.items())
+            }
+
+    def clear(self):
+        """Forget every measurement"""
+        with self._lock:
+            self._views.clear()
+
+
+request_stats = RequestStats()
+
+
+class CacheStats:
+    """Thread safe hit, miss and bypass counts of a cache by name"""
+
+    OUTCOMES = ('hit', 'miss', 'bypass')
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, outcome):
+        """Count one lookup of name with the given outcome"""
+        with self._lock:
+            counts = self._counts.setdefault(name, Counter())
+            counts[outcome] += 1
+
+    def snapshot(self):
+        """Return the counts and hit ratio of every name"""
+        with self._lock:
+            snapshot = {}
+            for name, counts in sorted(self._counts.items()):
+                lookups = counts['hit'] + counts['miss']
+                snapshot[name] = {
+                    outcome: counts[outcome] for outcome in self.OUTCOMES
+                }
+                snapshot[name]['hit_ratio'] = round(
+                    counts['hit'] / lookups, 3
+                ) if lookups else None
+
+            return snapshot
+
+    def clear(self):
+        """Forget every count"""
+        with self._lock:
+            self._counts.clear()
+
+
+cache_stats = CacheStats()
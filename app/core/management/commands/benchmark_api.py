@@ -0,0 +1,474 @@
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import invalidate_token
+from core.models import Ingredient, Recipe, RecipeImageUpload, Tag
+from core.seed import SEED_PASSWORD, seed
+from recipe.images import staging_path
+
+
+BULK_ITEMS = 100
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded benchmark data"""
+
+
+def percentile(values, fraction):
+    """Return the nearest rank percentile of values"""
+    ordered = sorted(values)
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+
+    return ordered[rank - 1]
+
+
+def _png():
+    """Return a small PNG image"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (200, 80, 40)).save(buffer, format='PNG')
+
+    return buffer.getvalue()
+
+
+class Scenarios:
+    """Build the requests for every API endpoint
+
+    Each scenario returns the client method name and its arguments for
+    request number i. Any objects a request needs are created here, before
+    the request is timed.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.recipe_ids = list(
+            Recipe.objects.filter(user=user).order_by('id').values_list(
+                'id', flat=True
+            )
+        )
+        self.tag_ids = list(
+            Tag.objects.filter(user=user).values_list('id', flat=True)
+        )
+        self.ingredient_ids = list(
+            Ingredient.objects.filter(user=user).values_list('id', flat=True)
+        )
+        self.image = _png()
+        recipe = Recipe.objects.get(id=self.recipe_ids[0])
+        self.word = recipe.title.split()[0]
+
+    def all(self):
+        """Return (name, scenario) for every endpoint"""
+        return (
+            ('user create', self.user_create),
+            ('user token', self.user_token),
+            ('user me', self.user_me),
+            ('user me update', self.user_me_update),
+            ('tags list', self.tags_list),
+            ('tags assigned_only', self.tags_assigned_only),
+            ('tags typeahead', self.tags_typeahead),
+            ('tags create', self.tags_create),
+            ('ingredients list', self.ingredients_list),
+            ('ingredients create', self.ingredients_create),
+            ('recipes list', self.recipes_list),
+            ('recipes by tag', self.recipes_by_tag),
+            ('recipes search', self.recipes_search),
+            ('recipe detail', self.recipe_detail),
+            ('recipe create', self.recipe_create),
+            ('recipe update', self.recipe_update),
+            ('recipe partial update', self.recipe_partial_update),
+            ('recipe delete', self.recipe_delete),
+            ('recipes bulk create', self.recipes_bulk_create),
+            ('recipes bulk update', self.recipes_bulk_update),
+            ('recipe upload image', self.recipe_upload_image),
+            ('recipe start image upload', self.recipe_start_image_upload),
+            ('recipe image upload status', self.recipe_image_upload_status),
+            ('recipe image upload chunk', self.recipe_image_upload_chunk),
+        )
+
+    def _recipe_id(self, i):
+        return self.recipe_ids[i % len(self.recipe_ids)]
+
+    def _recipe_payload(self, i):
+        return {
+            'title': f'Benchmark recipe {i}',
+            'time_minutes': 10 + i % 50,
+            'price': '7.50',
+            'tag': self.tag_ids[i % len(self.tag_ids):][:2],
+            'ingredient': self.ingredient_ids[
+                i % len(self.ingredient_ids):
+            ][:3],
+        }
+
+    def user_create(self, i):
+        return 'post', (reverse('user:create'), {
+            'email': f'benchmark-{i}@khalti.com',
+            'password': 'benchmark',
+            'name': 'Benchmark',
+        }), {}
+
+    def user_token(self, i):
+        return 'post', (reverse('user:token'), {
+            'email': self.user.email,
+            'password': SEED_PASSWORD,
+        }), {}
+
+    def user_me(self, i):
+        return 'get', (reverse('user:me'),), {}
+
+    def user_me_update(self, i):
+        return 'patch', (reverse('user:me'), {'name': f'Seed user {i}'}), {}
+
+    def tags_list(self, i):
+        return 'get', (reverse('recipe:tag-list'),), {}
+
+    def tags_assigned_only(self, i):
+        return 'get', (reverse('recipe:tag-list'), {'assigned_only': 1}), {}
+
+    def tags_typeahead(self, i):
+        return 'get', (reverse('recipe:tag-list'), {'q': 'tag 1'}), {}
+
+    def tags_create(self, i):
+        return 'post', (
+            reverse('recipe:tag-list'),
+            {'name': f'benchmark tag {i}'}
+        ), {}
+
+    def ingredients_list(self, i):
+        return 'get', (reverse('recipe:ingredient-list'),), {}
+
+    def ingredients_create(self, i):
+        return 'post', (
+            reverse('recipe:ingredient-list'),
+            {'name': f'benchmark ingredient {i}'}
+        ), {}
+
+    def recipes_list(self, i):
+        return 'get', (reverse('recipe:recipe-list'),), {}
+
+    def recipes_by_tag(self, i):
+        return 'get', (
+            reverse('recipe:recipe-list'),
+            {'tag': self.tag_ids[i % len(self.tag_ids)]}
+        ), {}
+
+    def recipes_search(self, i):
+        return 'get', (
+            reverse('recipe:recipe-list'),
+            {'search': self.word}
+        ), {}
+
+    def recipe_detail(self, i):
+        return 'get', (
+            reverse('recipe:recipe-detail', args=[self._recipe_id(i)]),
+        ), {}
+
+    def recipe_create(self, i):
+        return 'post', (
+            reverse('recipe:recipe-list'),
+            self._recipe_payload(i)
+        ), {'format': 'json'}
+
+    def recipe_update(self, i):
+        return 'put', (
+            reverse('recipe:recipe-detail', args=[self._recipe_id(i)]),
+            self._recipe_payload(i)
+        ), {'format': 'json'}
+
+    def recipe_partial_update(self, i):
+        return 'patch', (
+            reverse('recipe:recipe-detail', args=[self._recipe_id(i)]),
+            {'title': f'Patched recipe {i}'}
+        ), {'format': 'json'}
+
+    def recipe_delete(self, i):
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Doomed recipe',
+            time_minutes=1,
+            price=1
+        )
+        return 'delete', (
+            reverse('recipe:recipe-detail', args=[recipe.id]),
+        ), {}
+
+    def recipes_bulk_create(self, i):
+        return 'post', (
+            reverse('recipe:recipe-bulk'),
+            [self._recipe_payload(i + n) for n in range(BULK_ITEMS)]
+        ), {'format': 'json'}
+
+    def recipes_bulk_update(self, i):
+        return 'patch', (
+            reverse('recipe:recipe-bulk'),
+            [
+                {'id': self._recipe_id(i + n), 'time_minutes': 1 + i % 60}
+                for n in range(min(BULK_ITEMS, len(self.recipe_ids)))
+            ]
+        ), {'format': 'json'}
+
+    def recipe_upload_image(self, i):
+        image = io.BytesIO(self.image)
+        image.name = 'image.png'
+        return 'post', (
+            reverse('recipe:recipe-upload-image', args=[self._recipe_id(i)]),
+            {'image': image}
+        ), {'format': 'multipart'}
+
+    def recipe_start_image_upload(self, i):
+        return 'post', (
+            reverse(
+                'recipe:recipe-start-image-upload',
+                args=[self._recipe_id(i)]
+            ),
+            {'size': len(self.image)}
+        ), {'format': 'json'}
+
+    def _upload(self, i):
+        """Create an empty chunked upload"""
+        path = staging_path()
+        open(path, 'wb').close()
+        return RecipeImageUpload.objects.create(
+            recipe_id=self._recipe_id(i),
+            size=len(self.image),
+            path=path
+        )
+
+    def recipe_image_upload_status(self, i):
+        upload = self._upload(i)
+        return 'get', (reverse(
+            'recipe:recipe-image-upload-chunk',
+            args=[upload.recipe_id, upload.id]
+        ),), {}
+
+    def recipe_image_upload_chunk(self, i):
+        upload = self._upload(i)
+        return 'put', (
+            reverse(
+                'recipe:recipe-image-upload-chunk',
+                args=[upload.recipe_id, upload.id]
+            ),
+            self.image
+        ), {
+            'content_type': 'application/octet-stream',
+            'HTTP_CONTENT_RANGE': (
+                f'bytes 0-{len(self.image) - 1}/{len(self.image)}'
+            ),
+        }
+
+
+class Command(BaseCommand):
+    """Measure latency, queries and throughput of every API endpoint
+
+    Data is seeded and every request is made inside one transaction that
+    is rolled back afterwards, so the database is left untouched. Images
+    are stored in a temporary directory removed after the run. Requests
+    go through the Django test client, so timings include the full
+    middleware, authentication and serialization stack but no network or
+    WSGI server.
+
+    Every endpoint is measured twice: cold, with the response cache off
+    and the token forgotten before each request, and warm, with both
+    caches in use.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--ingredients', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Timed requests per endpoint'
+        )
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--endpoints',
+            help='Comma separated endpoint names to run, default all'
+        )
+        parser.add_argument(
+            '--output',
+            help='Write JSON results to this file instead of stdout'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='JSON results of an earlier run to compare against'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Allowed p50 slowdown against the baseline, as a fraction'
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1.')
+        results = None
+        try:
+            with transaction.atomic():
+                self.stderr.write('Seeding benchmark data...')
+                user = seed(
+                    users=options['users'],
+                    tags=options['tags'],
+                    ingredients=options['ingredients'],
+                    recipes=options['recipes'],
+                    seed=0
+                )[0]
+                results = self._run(user, options)
+                raise Rollback
+        except Rollback:
+            self.stderr.write('Seeded data rolled back')
+
+        report = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report + '\n')
+        else:
+            self.stdout.write(report)
+
+        if options['baseline']:
+            self._compare(results, options['baseline'], options['tolerance'])
+
+    def _run(self, user, options):
+        """Time every selected endpoint and return the results"""
+        client = APIClient()
+        token = Token.objects.create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        scenarios = Scenarios(user).all()
+        if options['endpoints']:
+            selected = set(options['endpoints'].split(','))
+            unknown = selected - {name for name, _ in scenarios}
+            if unknown:
+                raise CommandError(
+                    f'Unknown endpoints: {", ".join(sorted(unknown))}'
+                )
+            scenarios = [item for item in scenarios if item[0] in selected]
+
+        counter = itertools.count()
+        endpoints = {}
+        # Uploaded, staged and processed images go to a directory removed
+        # after the run, as the rollback cannot take files back
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            MEDIA_ROOT=os.path.join(root, 'media'),
+            IMAGE_STAGING_ROOT=os.path.join(root, 'staging')
+        ):
+            for name, scenario in scenarios:
+                self.stderr.write(f'Benchmarking {name}...')
+                with override_settings(RESPONSE_CACHE=''):
+                    cold = self._measure(
+                        client,
+                        scenario,
+                        counter,
+                        options,
+                        before=lambda: invalidate_token(token.key)
+                    )
+                warm = self._measure(client, scenario, counter, options)
+                endpoints[name] = {'cold': cold, 'warm': warm}
+
+        return {
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'seed': {
+                key: options[key]
+                for key in ('users', 'tags', 'ingredients', 'recipes')
+            },
+            'requests': options['requests'],
+            'endpoints': endpoints,
+        }
+
+    def _request(self, client, request):
+        """Make a request and fail on an error response"""
+        method, args, kwargs = request
+        res = getattr(client, method)(*args, **kwargs)
+        if res.status_code >= 400:
+            raise CommandError(
+                f'{method.upper()} {args[0]} returned {res.status_code}'
+            )
+
+        return res
+
+    def _measure(self, client, scenario, counter, options, before=None):
+        """Return latency, query and throughput figures for a scenario
+
+        before is called ahead of every request, untimed.
+        """
+        for _ in range(options['warmup']):
+            if before is not None:
+                before()
+            self._request(client, scenario(next(counter)))
+
+        count = options['requests']
+        timings = []
+        queries = []
+        method = path = None
+        for _ in range(count):
+            request = scenario(next(counter))
+            method, (path, *_), _kwargs = request
+            if before is not None:
+                before()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                self._request(client, request)
+                timings.append(time.perf_counter() - start)
+            queries.append(len(captured))
+
+        return {
+            'method': method.upper(),
+            'path': path,
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 3),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+            'mean_ms': round(statistics.mean(timings) * 1000, 3),
+            'queries_per_request': round(statistics.mean(queries), 2),
+            'throughput_rps': round(count / sum(timings), 1),
+        }
+
+    def _compare(self, results, baseline_path, tolerance):
+        """Fail if an endpoint got slower or needs more queries"""
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)['endpoints']
+
+        regressions = []
+        for name, modes in results['endpoints'].items():
+            for mode, current in modes.items():
+                previous = baseline.get(name, {}).get(mode)
+                if previous is None:
+                    continue
+                label = f'{name} ({mode})'
+                if current['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+                    regressions.append(
+                        f'{label}: p50 {previous["p50_ms"]} -> '
+                        f'{current["p50_ms"]} ms'
+                    )
+                if current['queries_per_request'] > \
+                        previous['queries_per_request']:
+                    regressions.append(
+                        f'{label}: queries '
+                        f'{previous["queries_per_request"]} -> '
+                        f'{current["queries_per_request"]}'
+                    )
+
+        if regressions:
+            raise CommandError(
+                'Regressions against baseline:\n' + '\n'.join(regressions)
+            )
+        self.stderr.write(
+            self.style.SUCCESS('No regressions against baseline')
+        )
@@ -0,0 +1,108 @@
+import random
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.models import Recipe, Tag
+from core.related_ids import adjust_recipe_counts
+from recipe.filters import filter_assigned
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded benchmark data"""
+
+
+class Command(BaseCommand):
+    """Compare a DISTINCT join with the recipe_count filter of assigned_only
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tags', type=int, default=20000)
+        parser.add_argument('--recipes', type=int, default=50000)
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        try:
+            with transaction.atomic():
+                user = self._seed(options)
+                self._compare(user, options['repeat'])
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Seeded data rolled back')
+
+    def _seed(self, options):
+        """Create a user with tags and tagged recipes"""
+        self.stdout.write('Seeding benchmark data...')
+        user = get_user_model().objects.create_user(
+            'benchmark@khalti.com',
+            'benchmark'
+        )
+        Tag.objects.bulk_create(
+            Tag(user=user, name=f'tag {i}') for i in range(options['tags'])
+        )
+        Recipe.objects.bulk_create(
+            Recipe(user=user, title=f'recipe {i}', time_minutes=1, price=1)
+            for i in range(options['recipes'])
+        )
+        # Primary keys are read back as not every backend returns them
+        # from bulk_create
+        recipe_ids = Recipe.objects.filter(user=user).values_list(
+            'id', flat=True
+        )
+        tag_ids = list(
+            Tag.objects.filter(user=user).values_list('id', flat=True)
+        )
+        # Only assign half of the tags so the filter has work to do
+        assignable = tag_ids[:len(tag_ids) // 2]
+        links = []
+        for recipe_id in recipe_ids:
+            for tag_id in random.sample(
+                assignable,
+                min(options['tags_per_recipe'], len(assignable))
+            ):
+                links.append(
+                    Recipe.tag.through(recipe_id=recipe_id, tag_id=tag_id)
+                )
+        Recipe.tag.through.objects.bulk_create(links)
+        # Bulk inserts send no m2m_changed signals to maintain the counts
+        adjust_recipe_counts('tag', Counter(link.tag_id for link in links))
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        return user
+
+    def _compare(self, user, repeat):
+        """Print plans and timings for both assigned_only strategies"""
+        queryset = Tag.objects.filter(user=user)
+        strategies = (
+            ('DISTINCT join', queryset.filter(
+                recipe__isnull=False
+            ).order_by('-name').distinct()),
+            ('recipe_count', filter_assigned(queryset).order_by(
+                '-name', 'id'
+            )),
+        )
+        explain_options = {}
+        if connection.vendor == 'postgresql':
+            explain_options = {'analyze': True}
+
+        for label, strategy in strategies:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                count = len(list(strategy.values_list('id', flat=True)))
+                timings.append(time.perf_counter() - start)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(strategy.explain(**explain_options))
+            self.stdout.write(
+                f'{count} rows, best of {repeat}: '
+                f'{min(timings) * 1000:.1f} ms'
+            )
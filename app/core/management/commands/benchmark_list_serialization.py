@@ -0,0 +1,88 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Prefetch
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Ingredient, Recipe, Tag
+from core.seed import seed
+from recipe.listing import recipe_rows, serialize_recipe_rows
+from recipe.serializers import RecipeSerializer
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded benchmark data"""
+
+
+class Command(BaseCommand):
+    """Compare model serializers against lean rows for recipe lists"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        try:
+            with transaction.atomic():
+                self.stdout.write('Seeding benchmark data...')
+                user = seed(
+                    users=1,
+                    tags=50,
+                    ingredients=200,
+                    recipes=options['recipes'],
+                    tags_per_recipe=options['tags_per_recipe'],
+                    ingredients_per_recipe=options['ingredients_per_recipe'],
+                    seed=0
+                )[0]
+                self._compare(user, options['repeat'])
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Seeded data rolled back')
+
+    def _compare(self, user, repeat):
+        """Time both ways of rendering every recipe of user as JSON"""
+        request = RequestFactory().get('/api/recipe/recipes/')
+        queryset = Recipe.objects.filter(user=user).order_by('-id')
+        renderer = JSONRenderer()
+
+        def serializers():
+            recipes = queryset.prefetch_related(
+                Prefetch('tag', queryset=Tag.objects.only('id')),
+                Prefetch('ingredient', queryset=Ingredient.objects.only('id')),
+            )
+            data = RecipeSerializer(
+                recipes,
+                many=True,
+                context={'request': request}
+            ).data
+            return renderer.render(data)
+
+        def rows():
+            data = serialize_recipe_rows(recipe_rows(queryset), request)
+            return renderer.render(data)
+
+        results = {}
+        for label, strategy in (('ModelSerializer', serializers),
+                                ('values() rows', rows)):
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                output = strategy()
+                timings.append(time.perf_counter() - start)
+            results[label] = (min(timings), output)
+            self.stdout.write(
+                f'{label:>16}: {min(timings) * 1000:8.1f} ms '
+                f'for {queryset.count()} recipes, {len(output)} bytes'
+            )
+
+        (slow, expected), (fast, actual) = results.values()
+        if actual != expected:
+            raise CommandError('Lean rows rendered different JSON')
+        self.stdout.write(self.style.SUCCESS(
+            f'Identical output, {slow / fast:.1f}x faster'
+        ))
@@ -0,0 +1,91 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.models import Recipe
+from recipe.filters import search_recipes
+
+
+WORDS = (
+    'apple', 'basil', 'butter', 'cabbage', 'carrot', 'cheese', 'chicken',
+    'chilli', 'coconut', 'coriander', 'cumin', 'curry', 'garlic', 'ginger',
+    'honey', 'lamb', 'lemon', 'lentil', 'mango', 'mushroom', 'noodle',
+    'onion', 'paneer', 'pepper', 'potato', 'prawn', 'rice', 'saffron',
+    'spinach', 'tamarind', 'tomato', 'yogurt',
+)
+BATCH_SIZE = 5000
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded benchmark data"""
+
+
+class Command(BaseCommand):
+    """Measure recipe search latency as the number of recipes grows"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='10000,100000,1000000',
+            help='Comma separated recipe counts to measure at'
+        )
+        parser.add_argument('--query', default='saffron lamb')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        try:
+            with transaction.atomic():
+                self._run(sizes, options['query'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Seeded data rolled back')
+
+    def _seed(self, user, count):
+        """Create count recipes with random titles"""
+        for start in range(0, count, BATCH_SIZE):
+            Recipe.objects.bulk_create(
+                Recipe(
+                    user=user,
+                    title=' '.join(random.sample(WORDS, 3)),
+                    time_minutes=10,
+                    price=5
+                )
+                for _ in range(min(BATCH_SIZE, count - start))
+            )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE core_recipe')
+
+    def _run(self, sizes, query, repeat):
+        """Seed up to each size and time the first page of a search"""
+        user = get_user_model().objects.create_user(
+            'benchmark@khalti.com',
+            'benchmark'
+        )
+        seeded = 0
+        baseline = None
+        for size in sizes:
+            self._seed(user, size - seeded)
+            seeded = size
+
+            queryset = search_recipes(
+                Recipe.objects.filter(user=user),
+                query
+            ).order_by('-rank', '-id')
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.values_list('id', flat=True)[:50])
+                timings.append(time.perf_counter() - start)
+
+            best = min(timings) * 1000
+            baseline = baseline or best
+            self.stdout.write(
+                f'{size:>10} recipes: {best:8.1f} ms '
+                f'({best / baseline:.1f}x, data {size / sizes[0]:.0f}x)'
+            )
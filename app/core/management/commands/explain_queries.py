@@ -0,0 +1,156 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.seed import seed
+
+
+# Text search only has an index to use on PostgreSQL
+TEXT_SEARCH_VENDORS = ('postgresql',)
+POSTGRES_SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+SQLITE_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)(.*)')
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded audit data"""
+
+
+def _endpoints(user):
+    """Return (label, url, params, text search) for each hot request"""
+    recipe = Recipe.objects.filter(user=user).order_by('id').first()
+    tag_ids = list(
+        recipe.tag.order_by('id').values_list('id', flat=True)[:2]
+    )
+    ingredient_id = recipe.ingredient.values_list('id', flat=True)[0]
+    tags = ','.join(str(tag_id) for tag_id in tag_ids)
+    word = recipe.title.split()[0]
+
+    return (
+        ('tags', reverse('recipe:tag-list'), {}, False),
+        ('tags assigned_only', reverse('recipe:tag-list'),
+         {'assigned_only': 1}, False),
+        ('tags typeahead', reverse('recipe:tag-list'), {'q': 'tag 1'}, True),
+        ('ingredients', reverse('recipe:ingredient-list'), {}, False),
+        ('ingredients assigned_only', reverse('recipe:ingredient-list'),
+         {'assigned_only': 1}, False),
+        ('ingredients typeahead', reverse('recipe:ingredient-list'),
+         {'q': word}, True),
+        ('recipes', reverse('recipe:recipe-list'), {}, False),
+        ('recipes by tag', reverse('recipe:recipe-list'),
+         {'tag': tags}, False),
+        ('recipes by all tags', reverse('recipe:recipe-list'),
+         {'tag': tags, 'match': 'all'}, False),
+        ('recipes by ingredient', reverse('recipe:recipe-list'),
+         {'ingredient': ingredient_id}, False),
+        ('recipes search', reverse('recipe:recipe-list'),
+         {'search': word}, True),
+        ('recipe detail',
+         reverse('recipe:recipe-detail', args=[recipe.id]), {}, False),
+    )
+
+
+def _explain(sql):
+    """Return the query plan of sql as text"""
+    prefix = 'EXPLAIN'
+    if connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN'
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}')
+        return '\n'.join(
+            ' '.join(str(column) for column in row)
+            for row in cursor.fetchall()
+        )
+
+
+def _full_scans(plan, vendor):
+    """Return the tables a query plan of vendor reads without an index"""
+    if vendor == 'postgresql':
+        return POSTGRES_SEQ_SCAN.findall(plan)
+
+    tables = set(connection.introspection.table_names())
+    return [
+        table for table, rest in SQLITE_SCAN.findall(plan)
+        if table in tables and 'USING' not in rest
+    ]
+
+
+class Command(BaseCommand):
+    """Fail if a hot API query reads a table without an index"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--tags', type=int, default=200)
+        parser.add_argument('--ingredients', type=int, default=500)
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--verbose-plans', action='store_true')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        failures = []
+        try:
+            with transaction.atomic():
+                self.stdout.write('Seeding audit data...')
+                user = seed(
+                    users=options['users'],
+                    tags=options['tags'],
+                    ingredients=options['ingredients'],
+                    recipes=options['recipes'],
+                    seed=0
+                )[0]
+                if connection.vendor == 'postgresql':
+                    # The audit tables are small enough that the planner
+                    # prefers sequential scans, so those are made a last
+                    # resort taken only when no index fits the query
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET LOCAL enable_seqscan = off')
+                failures = self._audit(user, options['verbose_plans'])
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Seeded data rolled back')
+
+        if failures:
+            raise CommandError(
+                'Sequential scans in: ' + ', '.join(sorted(set(failures)))
+            )
+        self.stdout.write(self.style.SUCCESS('All hot queries use indexes'))
+
+    def _audit(self, user, verbose):
+        """Explain every query each endpoint runs and return the offenders"""
+        client = APIClient()
+        client.force_authenticate(user)
+        failures = []
+        for label, url, params, text_search in _endpoints(user):
+            if text_search and connection.vendor not in TEXT_SEARCH_VENDORS:
+                self.stdout.write(f'{label}: skipped on {connection.vendor}')
+                continue
+
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                with CaptureQueriesContext(connection) as queries:
+                    res = client.get(url, params)
+            if res.status_code != 200:
+                raise CommandError(
+                    f'{label}: {url} returned {res.status_code}'
+                )
+
+            for query in queries.captured_queries:
+                if not query['sql'].lstrip().upper().startswith('SELECT'):
+                    continue
+                plan = _explain(query['sql'])
+                scans = _full_scans(plan, connection.vendor)
+                if scans or verbose:
+                    self.stdout.write(self.style.MIGRATE_HEADING(label))
+                    self.stdout.write(query['sql'])
+                    self.stdout.write(plan)
+                if scans:
+                    failures.append(label)
+                    self.stdout.write(self.style.ERROR(
+                        f'{label}: sequential scan on {", ".join(scans)}'
+                    ))
+            self.stdout.write(f'{label}: {len(queries)} queries checked')
+
+        return failures
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Recipe, RecipeImageUpload
+from recipe.images import process_recipe_image
+from recipe.uploads import discard_upload
+
+
+class Command(BaseCommand):
+    """Django command to process recipe images waiting in the queue"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-stuck',
+            action='store_true',
+            help='Requeue images left processing by a worker that died'
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        if options['retry_stuck']:
+            Recipe.objects.filter(
+                image_status=Recipe.IMAGE_PROCESSING
+            ).update(image_status=Recipe.IMAGE_PENDING)
+
+        pending = list(Recipe.objects.filter(
+            image_status=Recipe.IMAGE_PENDING
+        ).values_list('id', flat=True))
+        for recipe_id in pending:
+            process_recipe_image(recipe_id)
+
+        expired = RecipeImageUpload.objects.filter(
+            created__lt=timezone.now() - timedelta(
+                seconds=settings.IMAGE_UPLOAD_EXPIRY
+            )
+        )
+        for upload in expired:
+            discard_upload(upload)
+
+        self.stdout.write(self.style.SUCCESS('Image queue processed'))
@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+from core import versions
+from core.models import Recipe
+from core.related_ids import recipe_count, related_ids, \
+    sync_related_ids
+
+
+class Command(BaseCommand):
+    """Rebuild or verify the tag and ingredient ids stored on recipes
+
+    The recipe counts of tags and ingredients are checked as well.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Report recipes with stale ids without fixing them'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        fields = list(Recipe.RELATED_ID_FIELDS.values())
+        checked = 0
+        stale = set()
+        users = set()
+        last_id = 0
+        while True:
+            rows = list(Recipe.objects.filter(id__gt=last_id).order_by(
+                'id'
+            ).values('id', 'user_id', *fields)[:options['batch_size']])
+            if not rows:
+                break
+            last_id = rows[-1]['id']
+            checked += len(rows)
+            for relation, field in Recipe.RELATED_ID_FIELDS.items():
+                linked = related_ids([row['id'] for row in rows], relation)
+                outdated = [
+                    row for row in rows if row[field] != linked[row['id']]
+                ]
+                stale.update(row['id'] for row in outdated)
+                users.update(row['user_id'] for row in outdated)
+                if outdated and not options['verify']:
+                    sync_related_ids([row['id'] for row in outdated], relation)
+
+        miscounted = self._check_counts(options['verify'])
+
+        if options['verify']:
+            if stale or miscounted:
+                raise CommandError(
+                    f'{len(stale)} of {checked} recipes have stale ids, '
+                    f'{miscounted} recipe counts are wrong'
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f'All {checked} recipes have current ids'
+            ))
+            return
+
+        # Listings served from the old ids must not be answered from cache
+        for user_id in users:
+            versions.bump_versions(user_id, versions.RECIPES)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the ids of {len(stale)} of {checked} recipes '
+            f'and {miscounted} recipe counts'
+        ))
+
+    def _check_counts(self, verify):
+        """Count wrong recipe counts, fixing them unless verify is set"""
+        miscounted = 0
+        for relation in Recipe.RELATED_ID_FIELDS:
+            model = Recipe._meta.get_field(relation).related_model
+            wrong = model.objects.annotate(
+                linked=recipe_count(relation)
+            ).exclude(recipe_count=F('linked'))
+            rows = list(wrong.values('id', 'user_id'))
+            miscounted += len(rows)
+            if verify or not rows:
+                continue
+            model.objects.filter(id__in=[row['id'] for row in rows]).update(
+                recipe_count=recipe_count(relation)
+            )
+            collection = versions.TAGS if relation == 'tag' \
+                else versions.INGREDIENTS
+            for user_id in {row['user_id'] for row in rows}:
+                versions.bump_versions(user_id, collection, versions.RECIPES)
+
+        return miscounted
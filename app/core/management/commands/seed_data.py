@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.seed import SEED_PASSWORD, seed
+
+
+class Command(BaseCommand):
+    """Bulk generate users with tags, ingredients and linked recipes"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument(
+            '--tags',
+            type=int,
+            default=50,
+            help='Tags per user'
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=200,
+            help='Ingredients per user'
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=1000,
+            help='Recipes per user'
+        )
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Random seed for reproducible titles and links'
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        start = time.perf_counter()
+        with transaction.atomic():
+            users = seed(
+                users=options['users'],
+                tags=options['tags'],
+                ingredients=options['ingredients'],
+                recipes=options['recipes'],
+                tags_per_recipe=options['tags_per_recipe'],
+                ingredients_per_recipe=options['ingredients_per_recipe'],
+                seed=options['seed']
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(users)} users with '
+            f'{len(users) * options["recipes"]} recipes in '
+            f'{time.perf_counter() - start:.1f} s'
+        ))
+        if users:
+            self.stdout.write(
+                f'Log in as {users[0].email} with password {SEED_PASSWORD}'
+            )
@@ -1,22 +1,99 @@
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-from django.db import connections
+from django.db import DEFAULT_DB_ALIAS, connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     """Django command to pause execution until database is available"""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            action='append',
+            dest='databases',
+            help='Database alias to wait for, may be repeated'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=60,
+            help='Seconds to wait before giving up'
+        )
+        parser.add_argument('--initial-delay', type=float, default=0.1)
+        parser.add_argument('--max-delay', type=float, default=5)
+
     def handle(self, *args, **options):
         """Handle the command"""
+        aliases = list(dict.fromkeys(
+            options['databases'] or [DEFAULT_DB_ALIAS]
+        ))
+        for alias in aliases:
+            if alias not in connections.databases:
+                raise CommandError(f'Unknown database {alias}')
+
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
+        start = time.monotonic()
+        deadline = start + options['timeout']
+        with ThreadPoolExecutor(max_workers=len(aliases)) as executor:
+            results = list(executor.map(
+                lambda alias: self._wait(alias, start, deadline, options),
+                aliases
+            ))
+
+        unavailable = []
+        for alias, (elapsed, attempts) in zip(aliases, results):
+            if elapsed is None:
+                unavailable.append(alias)
+            else:
+                self.stdout.write(
+                    f'Database {alias} ready after {elapsed:.2f}s '
+                    f'({attempts} attempts)'
+                )
+        if unavailable:
+            raise CommandError(
+                f'Database {", ".join(unavailable)} unavailable after '
+                f'{options["timeout"]:g}s'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Database available!'))
+
+    def _probe(self, alias):
+        """Run a trivial query on alias, raising if it cannot connect"""
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        finally:
+            # Probes run in worker threads, which own their connections
+            connection.close()
+
+    def _wait(self, alias, start, deadline, options):
+        """Probe alias with exponential backoff until it answers
+
+        Return the seconds since start and the number of attempts, with
+        None in place of the seconds if the deadline passed first.
+        """
+        delay = options['initial_delay']
+        attempts = 0
+        while True:
+            attempts += 1
             try:
-                db_conn = connections['default']
+                self._probe(alias)
             except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
-
-        self.stdout.write(self.style.SUCCESS('Database available!'))
\ No newline at end of file
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None, attempts
+                pause = min(delay / 2 + random.uniform(0, delay / 2),
+                            remaining)
+                self.stdout.write(
+                    f'Database {alias} unavailable, '
+                    f'waiting {pause:.2f} seconds...'
+                )
+                time.sleep(pause)
+                delay = min(delay * 2, options['max_delay'])
+            else:
+                return time.monotonic() - start, attempts
@@ -0,0 +1,100 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from core.instrumentation import QueryRecorder, request_stats
+
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentationMiddleware:
+    """Measure queries, SQL, serializing and rendering time and size of
+    each response
+
+    The figures are sent back in a Server-Timing header and aggregated per
+    view in core.instrumentation.request_stats. Queries repeated with the
+    same fingerprint INSTRUMENTATION_DUPLICATE_QUERY_THRESHOLD times or more
+    in one request are logged as a likely N+1 pattern.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', False):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        request._render_timing = [None, None]
+        # Filled in by core.instrumentation.time_serialization
+        request._serialize_timing = [0.0]
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+
+        render_start, render_end = request._render_timing
+        render_ms = 0.0
+        if render_start is not None and render_end is not None:
+            render_ms = (render_end - render_start) * 1000
+        serialize_ms = request._serialize_timing[0] * 1000
+        sql_ms = recorder.duration * 1000
+        size = 0
+        if not response.streaming:
+            size = len(response.content)
+
+        duplicates = recorder.duplicates(
+            getattr(settings, 'INSTRUMENTATION_DUPLICATE_QUERY_THRESHOLD', 3)
+        )
+        view = self._view_name(request)
+        for sql, count in duplicates:
+            logger.warning(
+                'Query repeated %s times in %s: %s', count, view, sql
+            )
+
+        request_stats.record(
+            view,
+            total_ms=total_ms,
+            queries=recorder.count,
+            sql_ms=sql_ms,
+            render_ms=render_ms,
+            serialize_ms=serialize_ms,
+            size=size,
+            duplicates=duplicates
+        )
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={sql_ms:.3f};desc="{recorder.count} queries"',
+            f'serialize;dur={serialize_ms:.3f}',
+            f'render;dur={render_ms:.3f}',
+            f'total;dur={total_ms:.3f}',
+        ))
+
+        return response
+
+    def process_template_response(self, request, response):
+        """Time the rendering of DRF and template responses"""
+        timing = getattr(request, '_render_timing', None)
+        if timing is None:
+            return response
+
+        def finish(rendered):
+            timing[1] = time.perf_counter()
+
+        timing[0] = time.perf_counter()
+        response.add_post_render_callback(finish)
+
+        return response
+
+    def _view_name(self, request):
+        """Return the method and view name of a request"""
+        match = getattr(request, 'resolver_match', None)
+        # Unmatched paths share one entry to keep the stats bounded
+        name = match.view_name if match is not None else 'unresolved'
+
+        return f'{request.method} {name}'
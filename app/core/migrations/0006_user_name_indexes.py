@@ -0,0 +1,30 @@
+# Generated by Django 2.1.15 on 2026-10-18 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_auto_20220304_0640'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='ingredient',
+            field=models.ManyToManyField(to='core.Ingredient'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-name', 'id'], name='core_ingredient_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'], name='core_recipe_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-name', 'id'], name='core_tag_user_name_idx'),
+        ),
+    ]
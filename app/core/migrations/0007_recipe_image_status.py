@@ -0,0 +1,28 @@
+# Generated by Django 2.1.15 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_user_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_staging',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], max_length=16),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='ingredient',
+            field=models.ManyToManyField(to='core.Ingredient'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.1.15 on 2026-10-18 19:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_recipe_image_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeImageUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('size', models.BigIntegerField()),
+                ('offset', models.BigIntegerField(default=0)),
+                ('checksum', models.CharField(blank=True, max_length=64)),
+                ('path', models.CharField(max_length=255)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='ingredient',
+            field=models.ManyToManyField(to='core.Ingredient'),
+        ),
+        migrations.AddField(
+            model_name='recipeimageupload',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.Recipe'),
+        ),
+    ]
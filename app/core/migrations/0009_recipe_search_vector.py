@@ -0,0 +1,140 @@
+# Generated by Django 2.1.15 on 2026-10-18 19:26
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+SEARCH_SQL = """
+CREATE FUNCTION core_recipe_search_vector(recipe integer, title text)
+RETURNS tsvector AS $$
+    SELECT
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce((
+            SELECT string_agg(t.name, ' ')
+            FROM core_tag t
+            JOIN core_recipe_tag rt ON rt.tag_id = t.id
+            WHERE rt.recipe_id = recipe
+        ), '')), 'B') ||
+        setweight(to_tsvector('english', coalesce((
+            SELECT string_agg(i.name, ' ')
+            FROM core_ingredient i
+            JOIN core_recipe_ingredient ri ON ri.ingredient_id = i.id
+            WHERE ri.recipe_id = recipe
+        ), '')), 'B')
+$$ LANGUAGE sql STABLE;
+
+CREATE FUNCTION core_recipe_search_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := core_recipe_search_vector(NEW.id, NEW.title);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_search_update
+    BEFORE INSERT OR UPDATE OF title ON core_recipe
+    FOR EACH ROW EXECUTE PROCEDURE core_recipe_search_update();
+
+CREATE FUNCTION core_recipe_link_search_update() RETURNS trigger AS $$
+DECLARE
+    link record;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        link := OLD;
+    ELSE
+        link := NEW;
+    END IF;
+    UPDATE core_recipe
+    SET search_vector = core_recipe_search_vector(id, title)
+    WHERE id = link.recipe_id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_tag_search_update
+    AFTER INSERT OR DELETE ON core_recipe_tag
+    FOR EACH ROW EXECUTE PROCEDURE core_recipe_link_search_update();
+
+CREATE TRIGGER core_recipe_ingredient_search_update
+    AFTER INSERT OR DELETE ON core_recipe_ingredient
+    FOR EACH ROW EXECUTE PROCEDURE core_recipe_link_search_update();
+
+CREATE FUNCTION core_tag_search_update() RETURNS trigger AS $$
+BEGIN
+    UPDATE core_recipe r
+    SET search_vector = core_recipe_search_vector(r.id, r.title)
+    FROM core_recipe_tag rt
+    WHERE rt.recipe_id = r.id AND rt.tag_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_tag_search_update
+    AFTER UPDATE OF name ON core_tag
+    FOR EACH ROW EXECUTE PROCEDURE core_tag_search_update();
+
+CREATE FUNCTION core_ingredient_search_update() RETURNS trigger AS $$
+BEGIN
+    UPDATE core_recipe r
+    SET search_vector = core_recipe_search_vector(r.id, r.title)
+    FROM core_recipe_ingredient ri
+    WHERE ri.recipe_id = r.id AND ri.ingredient_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_ingredient_search_update
+    AFTER UPDATE OF name ON core_ingredient
+    FOR EACH ROW EXECUTE PROCEDURE core_ingredient_search_update();
+
+CREATE INDEX core_recipe_search_vector_idx
+    ON core_recipe USING gin (search_vector);
+
+UPDATE core_recipe SET search_vector = core_recipe_search_vector(id, title);
+"""
+
+DROP_SEARCH_SQL = """
+DROP INDEX IF EXISTS core_recipe_search_vector_idx;
+DROP TRIGGER IF EXISTS core_ingredient_search_update ON core_ingredient;
+DROP TRIGGER IF EXISTS core_tag_search_update ON core_tag;
+DROP TRIGGER IF EXISTS core_recipe_ingredient_search_update
+    ON core_recipe_ingredient;
+DROP TRIGGER IF EXISTS core_recipe_tag_search_update ON core_recipe_tag;
+DROP TRIGGER IF EXISTS core_recipe_search_update ON core_recipe;
+DROP FUNCTION IF EXISTS core_ingredient_search_update();
+DROP FUNCTION IF EXISTS core_tag_search_update();
+DROP FUNCTION IF EXISTS core_recipe_link_search_update();
+DROP FUNCTION IF EXISTS core_recipe_search_update();
+DROP FUNCTION IF EXISTS core_recipe_search_vector(integer, text);
+"""
+
+
+def create_search_triggers(apps, schema_editor):
+    """Maintain the recipe search vector in Postgres"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(SEARCH_SQL)
+
+
+def drop_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipeimageupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='ingredient',
+            field=models.ManyToManyField(to='core.Ingredient'),
+        ),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+TRIGRAM_SQL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+CREATE INDEX core_tag_user_name_trgm_idx
+    ON core_tag USING gin (user_id, name gin_trgm_ops);
+CREATE INDEX core_ingredient_user_name_trgm_idx
+    ON core_ingredient USING gin (user_id, name gin_trgm_ops);
+"""
+
+DROP_TRIGRAM_SQL = """
+DROP INDEX IF EXISTS core_ingredient_user_name_trgm_idx;
+DROP INDEX IF EXISTS core_tag_user_name_trgm_idx;
+"""
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Index tag and ingredient names for typeahead on Postgres"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(TRIGRAM_SQL)
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TRIGRAM_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 2.1.15 on 2026-10-18 19:29
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge tags and ingredients sharing a name for the same user
+
+    Recipes linked to a duplicate are relinked to the oldest object with
+    that name before the duplicates are deleted.
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, relation in (('Tag', 'tag'), ('Ingredient', 'ingredient')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, relation).through
+        column = f'{relation}_id'
+        duplicates = model.objects.values('user', 'name').annotate(
+            keep=Min('id'),
+            count=Count('id')
+        ).filter(count__gt=1)
+        for duplicate in duplicates:
+            drop = list(model.objects.filter(
+                user=duplicate['user'],
+                name=duplicate['name']
+            ).exclude(id=duplicate['keep']).values_list('id', flat=True))
+            linked = set(through.objects.filter(
+                **{column: duplicate['keep']}
+            ).values_list('recipe_id', flat=True))
+            relinked = set(through.objects.filter(
+                **{f'{column}__in': drop}
+            ).values_list('recipe_id', flat=True)) - linked
+            through.objects.bulk_create(
+                through(recipe_id=recipe_id, **{column: duplicate['keep']})
+                for recipe_id in relinked
+            )
+            model.objects.filter(id__in=drop).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_attr_name_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='ingredient',
+            field=models.ManyToManyField(to='core.Ingredient'),
+        ),
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='ingredient',
+            unique_together={('user', 'name')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='tag',
+            unique_together={('user', 'name')},
+        ),
+    ]
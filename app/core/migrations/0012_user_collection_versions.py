@@ -0,0 +1,33 @@
+# Generated by Django 2.1.15 on 2026-10-18 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_unique_user_attr_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='ingredients_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='tags_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='ingredient',
+            field=models.ManyToManyField(to='core.Ingredient'),
+        ),
+    ]
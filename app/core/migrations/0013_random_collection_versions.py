@@ -0,0 +1,34 @@
+# Generated by Django 2.1.15 on 2026-10-18 19:39
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_user_collection_versions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='ingredient',
+            field=models.ManyToManyField(to='core.Ingredient'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='ingredients_version',
+            field=models.BigIntegerField(default=core.models.initial_collection_version, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='recipes_version',
+            field=models.BigIntegerField(default=core.models.initial_collection_version, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='tags_version',
+            field=models.BigIntegerField(default=core.models.initial_collection_version, editable=False),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 2.1.15 on 2026-10-18 19:54
+
+import core.fields
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+
+
+RELATED_ID_FIELDS = {'tag': 'tag_ids', 'ingredient': 'ingredient_ids'}
+BATCH_SIZE = 500
+
+GIN_SQL = """
+CREATE INDEX core_recipe_user_tag_ids_gin_idx
+    ON core_recipe USING gin (user_id, tag_ids);
+CREATE INDEX core_recipe_user_ingredient_ids_gin_idx
+    ON core_recipe USING gin (user_id, ingredient_ids);
+"""
+
+DROP_GIN_SQL = """
+DROP INDEX IF EXISTS core_recipe_user_ingredient_ids_gin_idx;
+DROP INDEX IF EXISTS core_recipe_user_tag_ids_gin_idx;
+"""
+
+
+def fill_related_ids(apps, schema_editor):
+    """Copy the existing tag and ingredient links onto the recipes"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for relation, field in RELATED_ID_FIELDS.items():
+        through = Recipe._meta.get_field(relation).remote_field.through
+        column = f'{relation}_id'
+        ids = {}
+        links = through.objects.order_by('recipe_id', column).values_list(
+            'recipe_id', column
+        )
+        for recipe_id, pk in links.iterator():
+            ids.setdefault(recipe_id, []).append(pk)
+        batch = list(ids.items())
+        output_field = Recipe._meta.get_field(field)
+        for start in range(0, len(batch), BATCH_SIZE):
+            chunk = batch[start:start + BATCH_SIZE]
+            written = Case(
+                *(When(
+                    id=recipe_id,
+                    then=Value(pks, output_field=output_field)
+                ) for recipe_id, pks in chunk),
+                output_field=output_field
+            )
+            Recipe.objects.filter(
+                id__in=[recipe_id for recipe_id, _ in chunk]
+            ).update(**{field: written})
+
+
+def create_gin_indexes(apps, schema_editor):
+    """Index the id arrays for tag and ingredient filters on Postgres"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(GIN_SQL)
+
+
+def drop_gin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_GIN_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_random_collection_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=core.fields.IdArrayField(default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_ids',
+            field=core.fields.IdArrayField(default=list, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='ingredient',
+            field=models.ManyToManyField(to='core.Ingredient'),
+        ),
+        migrations.RunPython(fill_related_ids, migrations.RunPython.noop),
+        migrations.RunPython(create_gin_indexes, drop_gin_indexes),
+    ]
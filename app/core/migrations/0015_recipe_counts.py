@@ -0,0 +1,56 @@
+# Generated by Django 2.1.15 on 2026-10-18 19:58
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_recipes(apps, schema_editor):
+    """Count the recipes already linked to each tag and ingredient"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for relation in ('tag', 'ingredient'):
+        field = Recipe._meta.get_field(relation)
+        column = f'{relation}_id'
+        counts = field.remote_field.through.objects.filter(
+            **{column: OuterRef('pk')}
+        ).order_by().values(column).annotate(
+            count=Count('*')
+        ).values('count')
+        field.related_model.objects.update(recipe_count=Coalesce(
+            Subquery(counts, output_field=IntegerField()),
+            0
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_recipe_related_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='ingredient',
+            field=models.ManyToManyField(to='core.Ingredient'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-recipe_count', 'id'], name='core_ingredient_user_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-recipe_count', 'id'], name='core_tag_user_count_idx'),
+        ),
+        migrations.RunPython(count_recipes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+# istartswith compiles to UPPER(name::text) LIKE UPPER(%s) on Postgres, which
+# only an index on the same expression can serve
+UPPER_TRIGRAM_SQL = """
+CREATE INDEX core_tag_user_upper_name_trgm_idx
+    ON core_tag USING gin (user_id, (UPPER(name::text)) gin_trgm_ops);
+CREATE INDEX core_ingredient_user_upper_name_trgm_idx
+    ON core_ingredient USING gin (user_id, (UPPER(name::text)) gin_trgm_ops);
+"""
+
+DROP_UPPER_TRIGRAM_SQL = """
+DROP INDEX IF EXISTS core_ingredient_user_upper_name_trgm_idx;
+DROP INDEX IF EXISTS core_tag_user_upper_name_trgm_idx;
+"""
+
+
+def create_upper_trigram_indexes(apps, schema_editor):
+    """Index upper cased names for typeahead prefix matches on Postgres"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(UPPER_TRIGRAM_SQL)
+
+
+def drop_upper_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_UPPER_TRIGRAM_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_recipe_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_upper_trigram_indexes,
+            drop_upper_trigram_indexes
+        ),
+    ]
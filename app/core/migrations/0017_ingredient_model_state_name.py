@@ -0,0 +1,62 @@
+from django.db import migrations
+
+
+class RenameModelState(migrations.operations.base.Operation):
+    """Change the case of a model's name in the migration state only
+
+    RenameModel cannot rename a model to a name differing only in case,
+    and the table, content type and migration records do not depend on
+    the case, so the database is left alone.
+    """
+    reduces_to_sql = False
+    reversible = True
+
+    def __init__(self, old_name, new_name):
+        self.old_name = old_name
+        self.new_name = new_name
+
+    def deconstruct(self):
+        return (
+            self.__class__.__name__,
+            [],
+            {'old_name': self.old_name, 'new_name': self.new_name}
+        )
+
+    def _rename(self, app_label, state, name):
+        model_state = state.models[app_label, name.lower()]
+        model_state.name = name
+        state.reload_model(app_label, name.lower(), delay=False)
+
+    def state_forwards(self, app_label, state):
+        self._rename(app_label, state, self.new_name)
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        pass
+
+    def state_backwards(self, app_label, state):
+        self._rename(app_label, state, self.old_name)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        pass
+
+    def describe(self):
+        return f'Rename model state {self.old_name} to {self.new_name}'
+
+
+class Migration(migrations.Migration):
+    """Name the Ingredient model state as the model does
+
+    0003 created the model as 'ingredient', so the state pointed
+    recipe.ingredient at core.ingredient and makemigrations kept finding
+    an AlterField of it.
+    """
+
+    dependencies = [
+        ('core', '0016_attr_name_upper_trigram_indexes'),
+    ]
+
+    operations = [
+        RenameModelState(old_name='ingredient', new_name='Ingredient'),
+    ]
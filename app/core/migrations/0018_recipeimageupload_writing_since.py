@@ -0,0 +1,18 @@
+# Generated by Django 2.1.15 on 2026-10-18 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_ingredient_model_state_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipeimageupload',
+            name='writing_since',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,8 +1,12 @@
 import uuid
 import os
+import random
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+
+from core.fields import IdArrayField
 
 
 def recipe_image_file_path(instance, filename):
@@ -13,6 +17,22 @@ def recipe_image_file_path(instance, filename):
     return os.path.join('uploads/recipe/', filename)
 
 
+def recipe_image_derivative_path(name, size, ext):
+    """Generate the file path of a resized copy of a recipe image"""
+    root, _ = os.path.splitext(name)
+
+    return f'{root}_{size}.{ext}'
+
+
+def initial_collection_version():
+    """Return a random starting point for a new user's collection versions
+
+    Versions key ETags and cached responses, so a user reusing the id of a
+    deleted one must not start from a version that was already handed out.
+    """
+    return random.getrandbits(48)
+
+
 class UserManager(BaseUserManager):
 
     def create_user(self, email, password=None, **extra_fields):
@@ -36,43 +56,119 @@ class UserManager(BaseUserManager):
         return user
     
 
-class User(AbstractBaseUser, PermissionsMixin):
+class MaintainedFieldsMixin:
+    """Leave fields kept up to date by queryset updates out of saves
+
+    Instances loaded before such an update would otherwise write the old
+    values back when saved.
+    """
+    MAINTAINED_FIELDS = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.MAINTAINED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(MaintainedFieldsMixin, AbstractBaseUser, PermissionsMixin):
     """Customer user model that support using emain instate of username"""
     email = models.EmailField(max_length=255, unique=True)
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    recipes_version = models.BigIntegerField(
+        default=initial_collection_version,
+        editable=False
+    )
+    tags_version = models.BigIntegerField(
+        default=initial_collection_version,
+        editable=False
+    )
+    ingredients_version = models.BigIntegerField(
+        default=initial_collection_version,
+        editable=False
+    )
 
     objects =UserManager()
 
     USERNAME_FIELD = 'email'
+    VERSION_FIELDS = ('recipes_version', 'tags_version', 'ingredients_version')
+    MAINTAINED_FIELDS = VERSION_FIELDS
 
 
-class Tag(models.Model):
+class Tag(MaintainedFieldsMixin, models.Model):
     """Tag to be used for a recipe"""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    # Number of recipes linked, kept in step by signals and the bulk writes
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    MAINTAINED_FIELDS = ('recipe_count',)
+
+    class Meta:
+        unique_together = (('user', 'name'),)
+        indexes = [
+            models.Index(
+                fields=['user', '-name', 'id'],
+                name='core_tag_user_name_idx'
+            ),
+            models.Index(
+                fields=['user', '-recipe_count', 'id'],
+                name='core_tag_user_count_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
     
-class Ingredient(models.Model):
+class Ingredient(MaintainedFieldsMixin, models.Model):
     """Ingredient to be used for recipe"""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
             on_delete=models.CASCADE
     )
+    # Number of recipes linked, kept in step by signals and the bulk writes
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    MAINTAINED_FIELDS = ('recipe_count',)
+
+    class Meta:
+        unique_together = (('user', 'name'),)
+        indexes = [
+            models.Index(
+                fields=['user', '-name', 'id'],
+                name='core_ingredient_user_name_idx'
+            ),
+            models.Index(
+                fields=['user', '-recipe_count', 'id'],
+                name='core_ingredient_user_count_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(MaintainedFieldsMixin, models.Model):
     """Recipe model objects"""
+    IMAGE_PENDING = 'pending'
+    IMAGE_PROCESSING = 'processing'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = (
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_PROCESSING, 'Processing'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    )
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
             on_delete=models.CASCADE
@@ -84,9 +180,46 @@ class Recipe(models.Model):
     ingredient = models.ManyToManyField("Ingredient")
     tag = models.ManyToManyField("Tag")
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
-
-
+    image_status = models.CharField(
+        max_length=16,
+        choices=IMAGE_STATUS_CHOICES,
+        blank=True
+    )
+    image_staging = models.CharField(max_length=255, blank=True)
+    # Maintained by database triggers on Postgres, see migration 0009
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Copies of the tag and ingredient links in ascending id order, kept
+    # in step by signals and the bulk writes
+    tag_ids = IdArrayField(default=list, editable=False)
+    ingredient_ids = IdArrayField(default=list, editable=False)
+
+    RELATED_ID_FIELDS = {'tag': 'tag_ids', 'ingredient': 'ingredient_ids'}
+    MAINTAINED_FIELDS = tuple(RELATED_ID_FIELDS.values())
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-id'],
+                name='core_recipe_user_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+
+
+class RecipeImageUpload(models.Model):
+    """Resumable upload of a recipe image sent in chunks"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    checksum = models.CharField(max_length=64, blank=True)
+    path = models.CharField(max_length=255)
+    created = models.DateTimeField(auto_now_add=True)
+    # Set while a request streams a chunk into the file
+    writing_since = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return str(self.id)
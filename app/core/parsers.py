@@ -0,0 +1,28 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from core.renderers import FastJSONRenderer, orjson
+
+
+class FastJSONParser(JSONParser):
+    """JSON parser decoding with orjson when it is installed
+
+    orjson always rejects NaN and infinity, so it is only used while
+    STRICT_JSON is on, as it is by default.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        data = stream.read() if stream is not None else b''
+        try:
+            if encoding.lower().replace('-', '') != 'utf8':
+                data = data.decode(encoding)
+            return orjson.loads(data)
+        except (UnicodeDecodeError, LookupError, ValueError) as exc:
+            raise ParseError(f'JSON parse error - {exc}')
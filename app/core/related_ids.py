@@ -0,0 +1,99 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, \
+    Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from core.models import Recipe
+
+
+ID_BATCH_SIZE = 500
+
+
+def related_ids(recipe_ids, relation):
+    """Return the ids each recipe links to through relation, ascending"""
+    recipe_ids = list(recipe_ids)
+    through = getattr(Recipe, relation).through
+    column = f'{relation}_id'
+    ids = {recipe_id: [] for recipe_id in recipe_ids}
+    for start in range(0, len(recipe_ids), ID_BATCH_SIZE):
+        links = through.objects.filter(
+            recipe_id__in=recipe_ids[start:start + ID_BATCH_SIZE]
+        ).order_by(column).values_list('recipe_id', column)
+        for recipe_id, pk in links:
+            ids[recipe_id].append(pk)
+
+    return ids
+
+
+def linked_recipe_ids(relation, pk):
+    """Return the ids of the recipes linked to one tag or ingredient"""
+    through = getattr(Recipe, relation).through
+
+    return list(through.objects.filter(
+        **{f'{relation}_id': pk}
+    ).values_list('recipe_id', flat=True))
+
+
+def sync_related_ids(recipe_ids, relation):
+    """Copy the links of recipes through relation into their id column
+
+    Returns the ids written for each recipe. Each batch of ID_BATCH_SIZE
+    recipes is locked, read and written with one UPDATE. The lock makes a
+    concurrent change to the same recipes wait until this one commits and
+    then read its links, so neither overwrites the other's ids.
+    """
+    name = Recipe.RELATED_ID_FIELDS[relation]
+    field = Recipe._meta.get_field(name)
+    recipe_ids = sorted(set(recipe_ids))
+    ids = {}
+    for start in range(0, len(recipe_ids), ID_BATCH_SIZE):
+        with transaction.atomic(savepoint=False):
+            # Rows are locked in id order so concurrent syncs cannot deadlock
+            locked = list(Recipe.objects.select_for_update().filter(
+                id__in=recipe_ids[start:start + ID_BATCH_SIZE]
+            ).order_by('id').values_list('id', flat=True))
+            chunk = related_ids(locked, relation)
+            if not chunk:
+                continue
+            written = Case(
+                *(When(id=recipe_id, then=Value(pks, output_field=field))
+                  for recipe_id, pks in chunk.items()),
+                output_field=field
+            )
+            Recipe.objects.filter(id__in=list(chunk)).update(
+                **{name: written}
+            )
+        ids.update(chunk)
+
+    return ids
+
+
+def adjust_recipe_counts(relation, deltas):
+    """Add to the recipe counts of tags or ingredients
+
+    deltas maps primary keys to the change in their count. Keys sharing
+    a change are updated together, so a bulk write costs one UPDATE per
+    distinct change.
+    """
+    model = Recipe._meta.get_field(relation).related_model
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(pk)
+    for delta, pks in by_delta.items():
+        model.objects.filter(id__in=pks).update(
+            recipe_count=F('recipe_count') + delta
+        )
+
+
+def recipe_count(relation):
+    """Return an expression counting the recipes linked to each object"""
+    through = getattr(Recipe, relation).through
+    column = f'{relation}_id'
+    counts = through.objects.filter(
+        **{column: OuterRef('pk')}
+    ).order_by().values(column).annotate(count=Count('*')).values('count')
+
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
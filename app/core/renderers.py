@@ -0,0 +1,156 @@
+import types
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+CHUNK_SIZE = 64 * 1024
+LINE_SEPARATORS = (
+    (b'\xe2\x80\xa8', b'\\u2028'),
+    (b'\xe2\x80\xa9', b'\\u2029'),
+)
+_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON renderer encoding with orjson when it is installed
+
+    Output matches JSONRenderer: values orjson has no native support for,
+    such as Decimal and lazy translation strings, go through DRF's encoder,
+    as do dates and times, which orjson would format differently, and
+    U+2028/U+2029 stay escaped. Indented output and anything orjson
+    rejects, such as integers over 64 bits, fall back to JSONRenderer.
+    orjson writes NaN and infinity as null where JSONRenderer refuses them.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or \
+                not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=_default,
+                option=(
+                    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                )
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        for separator, escaped in LINE_SEPARATORS:
+            ret = ret.replace(separator, escaped)
+
+        return ret
+
+
+class ChunkedJSONRenderer(FastJSONRenderer):
+    """JSON renderer that can encode lists one item at a time
+
+    Selected with ?format=json-chunked, as plain application/json requests
+    pick FastJSONRenderer first. Views using ChunkedRenderMixin then send
+    the body in chunks as it is encoded. The response data itself, one
+    page of results, is still built in memory first; the export action
+    streams a user's recipes straight from the database.
+    """
+    format = 'json-chunked'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+
+        return b''.join(self.stream(data))
+
+    def _encode(self, value):
+        if value is None:
+            return b'null'
+
+        return super().render(value)
+
+    def _items(self, value):
+        """Yield the parts of value, one list item at a time"""
+        if isinstance(value, (list, tuple, types.GeneratorType)):
+            yield b'['
+            for index, item in enumerate(value):
+                if index:
+                    yield b','
+                yield self._encode(item)
+            yield b']'
+        else:
+            yield self._encode(value)
+
+    def _parts(self, data):
+        if isinstance(data, dict):
+            yield b'{'
+            for index, (key, value) in enumerate(data.items()):
+                if index:
+                    yield b','
+                yield self._encode(str(key)) + b':'
+                yield from self._items(value)
+            yield b'}'
+        else:
+            yield from self._items(data)
+
+    def stream(self, data):
+        """Yield data as JSON in chunks of about CHUNK_SIZE bytes"""
+        chunk = []
+        size = 0
+        for part in self._parts(data):
+            chunk.append(part)
+            size += len(part)
+            if size >= CHUNK_SIZE:
+                yield b''.join(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield b''.join(chunk)
+
+
+class NDJSONRenderer(FastJSONRenderer):
+    """Renderer writing each item of a list as its own line of JSON"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+        if not isinstance(data, (list, tuple)):
+            data = [data]
+
+        return b''.join(
+            super(NDJSONRenderer, self).render(item) + b'\n'
+            for item in data
+        )
+
+
+class ChunkedRenderMixin:
+    """Chunk successful responses when ChunkedJSONRenderer is chosen"""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        renderer = getattr(request, 'accepted_renderer', None)
+        if not isinstance(renderer, ChunkedJSONRenderer) or \
+                response.status_code != 200 or \
+                getattr(response, 'data', None) is None:
+            return response
+
+        streaming = StreamingHttpResponse(
+            renderer.stream(response.data),
+            status=response.status_code,
+            content_type=renderer.media_type
+        )
+        for header, value in response.items():
+            if header.lower() != 'content-type':
+                streaming[header] = value
+
+        return streaming
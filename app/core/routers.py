@@ -0,0 +1,148 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+
+
+# Seconds a replica's lag measurement is trusted before checking again
+LAG_CHECK_INTERVAL = 1.0
+LAG_SQL = (
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+    'THEN 0 '
+    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+_state = threading.local()
+_health = {}
+_health_lock = threading.Lock()
+
+
+def replica_lag(alias):
+    """Return the seconds alias trails the primary, None if unreachable"""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            lag = cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+
+    return float(lag or 0)
+
+
+def _is_healthy(alias):
+    """Return whether alias lags at most DB_REPLICA_MAX_LAG seconds"""
+    now = time.monotonic()
+    with _health_lock:
+        checked = _health.get(alias)
+    if checked is not None and now - checked[0] < LAG_CHECK_INTERVAL:
+        return checked[1]
+
+    lag = replica_lag(alias)
+    healthy = lag is not None and lag <= settings.DB_REPLICA_MAX_LAG
+    with _health_lock:
+        _health[alias] = (now, healthy)
+
+    return healthy
+
+
+def choose_replica():
+    """Return a random replica close to the primary, None if none is"""
+    replicas = list(settings.DB_REPLICAS)
+    random.shuffle(replicas)
+    for alias in replicas:
+        if _is_healthy(alias):
+            return alias
+
+    return None
+
+
+def check_pin_cache():
+    """Fail unless pins are kept in a cache shared between processes
+
+    A user's next read may be served by any process, so a pin only
+    visible to the process that took the write would not be honoured.
+    """
+    if not settings.DB_REPLICAS:
+        return
+    alias = getattr(settings, 'DB_PRIMARY_PIN_CACHE', None)
+    if not alias or alias not in settings.CACHES:
+        raise ImproperlyConfigured(
+            'DB_PRIMARY_PIN_CACHE must name a CACHES alias when '
+            'DB_REPLICAS is set.'
+        )
+    if isinstance(caches[alias], (DummyCache, LocMemCache)):
+        raise ImproperlyConfigured(
+            f'DB_PRIMARY_PIN_CACHE {alias!r} is not shared between '
+            f'processes.'
+        )
+
+
+def _pin_cache():
+    return caches[settings.DB_PRIMARY_PIN_CACHE]
+
+
+def _pin_key(user_id):
+    return f'db-primary-pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Read from the primary for the user's next DB_PRIMARY_PIN_SECONDS"""
+    _pin_cache().set(_pin_key(user_id), True, settings.DB_PRIMARY_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    """Return whether the user wrote recently enough to need the primary"""
+    return _pin_cache().get(_pin_key(user_id), False)
+
+
+class ReplicaRouter:
+    """Send reads to the replica chosen for the current request
+
+    Outside ReplicaReadMixin views no replica is chosen, so every query
+    goes to the primary. Writes always do.
+    """
+
+    def db_for_read(self, model, **hints):
+        return getattr(_state, 'alias', None)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DB_REPLICAS
+
+
+class ReplicaReadMixin:
+    """Read from a replica for safe requests of users without recent writes
+
+    A successful unsafe request pins its user to the primary for
+    DB_PRIMARY_PIN_SECONDS so they read their own writes.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if settings.DB_REPLICAS and request.method in SAFE_METHODS and \
+                not is_pinned(request.user.id):
+            _state.alias = choose_replica()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        _state.alias = None
+        if settings.DB_REPLICAS and request.method not in SAFE_METHODS and \
+                status.is_success(response.status_code):
+            pin_to_primary(request.user.id)
+
+        return super().finalize_response(request, response, *args, **kwargs)
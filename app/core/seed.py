@@ -0,0 +1,134 @@
+import random
+import uuid
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+
+from core.models import Ingredient, Recipe, Tag
+from core.related_ids import adjust_recipe_counts
+
+
+WORDS = (
+    'apple', 'basil', 'butter', 'cabbage', 'carrot', 'cheese', 'chicken',
+    'chilli', 'coconut', 'coriander', 'cumin', 'curry', 'garlic', 'ginger',
+    'honey', 'lamb', 'lemon', 'lentil', 'mango', 'mushroom', 'noodle',
+    'onion', 'paneer', 'pepper', 'potato', 'prawn', 'rice', 'saffron',
+    'spinach', 'tamarind', 'tomato', 'yogurt',
+)
+SEED_PASSWORD = 'seedpass123'
+MAX_BATCH_SIZE = 5000
+
+
+def _bulk_create(model, objs):
+    """Insert objs in batches the database backend can handle"""
+    objs = list(objs)
+    if not objs:
+        return
+    fields = [field for field in model._meta.concrete_fields]
+    batch_size = min(
+        MAX_BATCH_SIZE,
+        max(connection.ops.bulk_batch_size(fields, objs), 1)
+    )
+    model.objects.bulk_create(objs, batch_size=batch_size)
+
+
+def _ids(queryset):
+    """Return the primary keys of queryset ordered by id"""
+    return list(queryset.order_by('id').values_list('id', flat=True))
+
+
+def _title():
+    return ' '.join(random.sample(WORDS, 3))
+
+
+def seed(users=10, tags=50, ingredients=100, recipes=200,
+         tags_per_recipe=3, ingredients_per_recipe=5, seed=None):
+    """Bulk create users, each owning tags, ingredients and linked recipes
+
+    Returns the created users, who can log in with SEED_PASSWORD. Primary
+    keys are read back after each insert because not every backend
+    returns them from bulk_create.
+    """
+    rng_state = random.getstate()
+    if seed is not None:
+        random.seed(seed)
+    try:
+        run = uuid.uuid4().hex[:8]
+        password = make_password(SEED_PASSWORD)
+        _bulk_create(get_user_model(), (
+            get_user_model()(
+                email=f'seed-{run}-{i}@khalti.com',
+                name=f'Seed user {i}',
+                password=password
+            )
+            for i in range(users)
+        ))
+        created = list(get_user_model().objects.filter(
+            email__startswith=f'seed-{run}-'
+        ).order_by('id'))
+
+        for user in created:
+            _bulk_create(Tag, (
+                Tag(user=user, name=f'tag {i}') for i in range(tags)
+            ))
+            _bulk_create(Ingredient, (
+                Ingredient(user=user, name=f'{WORDS[i % len(WORDS)]} {i}')
+                for i in range(ingredients)
+            ))
+            tag_ids = _ids(Tag.objects.filter(user=user))
+            ingredient_ids = _ids(Ingredient.objects.filter(user=user))
+            links = [
+                (
+                    sorted(random.sample(
+                        tag_ids, min(tags_per_recipe, len(tag_ids))
+                    )),
+                    sorted(random.sample(
+                        ingredient_ids,
+                        min(ingredients_per_recipe, len(ingredient_ids))
+                    )),
+                )
+                for _ in range(recipes)
+            ]
+            _bulk_create(Recipe, (
+                Recipe(
+                    user=user,
+                    title=_title(),
+                    time_minutes=random.randint(5, 120),
+                    price=random.randint(100, 5000) / 100,
+                    tag_ids=recipe_tag_ids,
+                    ingredient_ids=recipe_ingredient_ids
+                )
+                for recipe_tag_ids, recipe_ingredient_ids in links
+            ))
+
+            # Recipes get ascending ids in the order they were inserted
+            recipe_ids = _ids(Recipe.objects.filter(user=user))
+            _bulk_create(Recipe.tag.through, (
+                Recipe.tag.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id, (recipe_tag_ids, _) in zip(recipe_ids, links)
+                for tag_id in recipe_tag_ids
+            ))
+            _bulk_create(Recipe.ingredient.through, (
+                Recipe.ingredient.through(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id
+                )
+                for recipe_id, (_, recipe_ingredient_ids)
+                in zip(recipe_ids, links)
+                for ingredient_id in recipe_ingredient_ids
+            ))
+            for relation, index in (('tag', 0), ('ingredient', 1)):
+                adjust_recipe_counts(relation, Counter(
+                    pk for recipe_links in links for pk in recipe_links[index]
+                ))
+    finally:
+        if seed is not None:
+            random.setstate(rng_state)
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    return created
@@ -0,0 +1,185 @@
+from collections import Counter
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+    pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core import versions
+from core.authentication import invalidate_token
+from core.models import Ingredient, Recipe, Tag
+from core.related_ids import adjust_recipe_counts, linked_recipe_ids, \
+    related_ids, sync_related_ids
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    """Forget a cached token when it changes or is deleted"""
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=Recipe)
+def bump_saved_recipe_versions(sender, instance, **kwargs):
+    """Mark a user's recipes as changed when a recipe is saved"""
+    versions.bump_versions(instance.user_id, versions.RECIPES)
+
+
+@receiver(post_delete, sender=Recipe)
+def bump_deleted_recipe_versions(sender, instance, **kwargs):
+    """Mark a user's collections as changed when a recipe and its links go"""
+    versions.bump_versions(instance.user_id, *versions.COLLECTIONS)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tag_versions(sender, instance, **kwargs):
+    """Mark a user's tags and the recipes showing them as changed"""
+    versions.bump_versions(
+        instance.user_id,
+        versions.TAGS,
+        versions.RECIPES
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredient_versions(sender, instance, **kwargs):
+    """Mark a user's ingredients and the recipes showing them as changed"""
+    versions.bump_versions(
+        instance.user_id,
+        versions.INGREDIENTS,
+        versions.RECIPES
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tag.through)
+def bump_recipe_tag_versions(sender, instance, action, **kwargs):
+    """Mark a user's recipes and tags as changed when links change"""
+    if action.startswith('post_'):
+        versions.bump_versions(
+            instance.user_id,
+            versions.RECIPES,
+            versions.TAGS
+        )
+
+
+@receiver(m2m_changed, sender=Recipe.ingredient.through)
+def bump_recipe_ingredient_versions(sender, instance, action, **kwargs):
+    """Mark a user's recipes and ingredients as changed when links change"""
+    if action.startswith('post_'):
+        versions.bump_versions(
+            instance.user_id,
+            versions.RECIPES,
+            versions.INGREDIENTS
+        )
+
+
+@receiver(m2m_changed, sender=Recipe.tag.through)
+@receiver(m2m_changed, sender=Recipe.ingredient.through)
+def sync_linked_related_ids(sender, instance, action, reverse, pk_set,
+                            **kwargs):
+    """Copy changed tag and ingredient links into the recipes' id columns"""
+    relation = 'tag' if sender is Recipe.tag.through else 'ingredient'
+    if reverse and action == 'pre_clear':
+        instance._cleared_recipe_ids = linked_recipe_ids(
+            relation,
+            instance.pk
+        )
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        ids = sync_related_ids([instance.pk], relation)
+        setattr(
+            instance,
+            Recipe.RELATED_ID_FIELDS[relation],
+            ids[instance.pk]
+        )
+    elif action == 'post_clear':
+        sync_related_ids(
+            instance.__dict__.pop('_cleared_recipe_ids', ()),
+            relation
+        )
+    else:
+        sync_related_ids(pk_set, relation)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_linked_recipes(sender, instance, **kwargs):
+    """Note the recipes whose links the deletion cascades to"""
+    instance._linked_recipe_ids = linked_recipe_ids(
+        sender._meta.model_name,
+        instance.pk
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def sync_unlinked_related_ids(sender, instance, **kwargs):
+    """Drop a deleted tag or ingredient from the recipes' id columns"""
+    sync_related_ids(
+        instance.__dict__.pop('_linked_recipe_ids', ()),
+        sender._meta.model_name
+    )
+
+
+def _unlinking(relation, instance, reverse, pk_set):
+    """Return the related ids of the links a remove or clear will delete
+
+    Django passes every requested id to remove, linked or not, so the
+    links are looked up before they go.
+    """
+    through = getattr(Recipe, relation).through
+    column = f'{relation}_id'
+    if reverse:
+        filters = {column: instance.pk}
+        if pk_set is not None:
+            filters['recipe_id__in'] = pk_set
+    else:
+        filters = {'recipe_id': instance.pk}
+        if pk_set is not None:
+            filters[f'{column}__in'] = pk_set
+
+    return list(
+        through.objects.filter(**filters).values_list(column, flat=True)
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tag.through)
+@receiver(m2m_changed, sender=Recipe.ingredient.through)
+def count_linked_recipes(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    """Keep the recipe counts of tags and ingredients in step with links"""
+    relation = 'tag' if sender is Recipe.tag.through else 'ingredient'
+    if action in ('pre_remove', 'pre_clear'):
+        instance.__dict__.setdefault('_unlinking', {})[relation] = \
+            _unlinking(relation, instance, reverse, pk_set)
+    elif action == 'post_add' and pk_set:
+        adjust_recipe_counts(
+            relation,
+            {instance.pk: len(pk_set)} if reverse
+            else dict.fromkeys(pk_set, 1)
+        )
+    elif action in ('post_remove', 'post_clear'):
+        unlinked = instance.__dict__.get('_unlinking', {}).pop(relation, ())
+        adjust_recipe_counts(relation, {
+            pk: -count for pk, count in Counter(unlinked).items()
+        })
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_recipe_links(sender, instance, **kwargs):
+    """Note the tags and ingredients a recipe deletion unlinks"""
+    instance._unlinking = {
+        relation: related_ids([instance.pk], relation)[instance.pk]
+        for relation in Recipe.RELATED_ID_FIELDS
+    }
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe_links(sender, instance, **kwargs):
+    """Drop a deleted recipe from the counts of its tags and ingredients"""
+    for relation, pks in instance.__dict__.pop('_unlinking', {}).items():
+        adjust_recipe_counts(relation, dict.fromkeys(pks, -1))
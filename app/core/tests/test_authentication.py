@@ -0,0 +1,161 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.authentication import CachedTokenAuthentication, TokenCache, \
+    token_cache
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@khalti.com',
+            'password123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def test_lookup_cached(self):
+        """Test that a cached token only costs a user lookup"""
+        with self.assertNumQueries(1):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+        with CaptureQueriesContext(connection) as queries:
+            cached_user, cached_token = self.auth.authenticate_credentials(
+                self.token.key
+            )
+
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('authtoken', queries[0]['sql'])
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(cached_user, self.user)
+        self.assertEqual(cached_token.key, self.token.key)
+        self.assertIsNot(cached_user, user)
+
+    def test_cached_user_not_shared(self):
+        """Test that changes to one request's user do not leak to the next"""
+        user, token = self.auth.authenticate_credentials(self.token.key)
+        user.name = 'mutated'
+        token.user = None
+
+        cached_user, cached_token = self.auth.authenticate_credentials(
+            self.token.key
+        )
+
+        self.assertEqual(cached_user.name, self.user.name)
+        self.assertEqual(cached_token.user, cached_user)
+        self.assertIsNot(cached_user._state, user._state)
+
+    def test_cached_user_saved_intact(self):
+        """Test that saving a cached user keeps its stored fields"""
+        self.auth.authenticate_credentials(self.token.key)
+        user, _ = self.auth.authenticate_credentials(self.token.key)
+
+        user.name = 'Changed'
+        user.save()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'Changed')
+        self.assertTrue(self.user.check_password('password123'))
+
+    def test_deleted_token_invalidated(self):
+        """Test that deleting a token removes it from the cache"""
+        key = self.token.key
+        self.auth.authenticate_credentials(key)
+        self.token.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(key)
+
+    def test_user_data_not_cached(self):
+        """Test that no user fields, such as the password, are cached"""
+        self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(
+            token_cache.get(self.token.key),
+            (self.token.key, self.user.id, self.token.created)
+        )
+
+    def test_user_changed_elsewhere(self):
+        """Test that user changes apply without invalidating the cache"""
+        self.auth.authenticate_credentials(self.token.key)
+        get_user_model().objects.filter(id=self.user.id).update(
+            email='new@khalti.com'
+        )
+
+        user, _ = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual(user.email, 'new@khalti.com')
+
+        get_user_model().objects.filter(id=self.user.id).update(
+            is_active=False
+        )
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_deactivated_user_invalidated(self):
+        """Test that deactivating a user drops the user's cached tokens"""
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    @override_settings(
+        TOKEN_AUTH_SHARED_CACHE='default',
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }},
+    )
+    def test_shared_cache_tier(self):
+        """Test that the shared cache serves lookups missing locally"""
+        self.auth.authenticate_credentials(self.token.key)
+        token_cache.clear()
+
+        with self.assertNumQueries(1):
+            user, _ = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual(user, self.user)
+
+        key = self.token.key
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(key)
+        caches['default'].clear()
+
+
+class TokenCacheTests(TestCase):
+
+    def test_least_recently_used_evicted(self):
+        """Test that the least recently used entry is evicted"""
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    @patch('core.authentication.time.monotonic')
+    def test_entries_expire(self, monotonic):
+        """Test that entries expire after the time to live"""
+        monotonic.return_value = 100
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set('a', 1)
+
+        monotonic.return_value = 159
+        self.assertEqual(cache.get('a'), 1)
+        monotonic.return_value = 160
+        self.assertIsNone(cache.get('a'))
@@ -1,8 +1,19 @@
-from unittest.mock import patch
+import json
+import os
+import re
+import tempfile
+from io import StringIO
+from unittest.mock import MagicMock, patch
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, override_settings
+
+from core.management.commands.explain_queries import _full_scans
+from core.models import Ingredient, Recipe, Tag
+from core.seed import SEED_PASSWORD
 
 
 class CommandsTestCase(TestCase):
@@ -11,15 +22,327 @@ class CommandsTestCase(TestCase):
         """Test waiting for db when db is available"""
 
         with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
+            gi.return_value = MagicMock()
+            call_command('wait_for_db', stdout=StringIO())
             self.assertEqual(gi.call_count, 1)
+            gi.return_value.cursor.return_value.__enter__.return_value \
+                .execute.assert_called_once_with('SELECT 1')
 
     @patch('time.sleep', return_value=None)
     def test_wait_for_db(self, ts):
         """Test waiting for db"""
 
         with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
+            gi.side_effect = [OperationalError] * 5 + [MagicMock()]
+            call_command('wait_for_db', stdout=StringIO())
             self.assertEqual(gi.call_count, 6)
+
+    @patch('time.sleep', return_value=None)
+    def test_wait_for_db_backoff(self, ts):
+        """Test that waits grow exponentially up to the maximum delay"""
+
+        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
+            gi.side_effect = [OperationalError] * 5 + [MagicMock()]
+            call_command(
+                'wait_for_db',
+                initial_delay=0.1,
+                max_delay=5,
+                stdout=StringIO()
+            )
+
+        delays = [call[0][0] for call in ts.call_args_list]
+        self.assertEqual(delays, sorted(delays))
+        self.assertGreaterEqual(delays[0], 0.05)
+        self.assertLessEqual(delays[-1], 5)
+
+    def test_wait_for_db_timeout(self):
+        """Test that the command fails once the deadline passes"""
+
+        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
+            gi.side_effect = OperationalError
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=0, stdout=StringIO())
+            self.assertEqual(gi.call_count, 1)
+
+    def test_wait_for_db_real_query(self):
+        """Test that readiness is reported from a real connection"""
+        out = StringIO()
+
+        call_command('wait_for_db', database=['default'], stdout=out)
+
+        self.assertIn('Database default ready after', out.getvalue())
+
+    def test_wait_for_db_unknown_alias(self):
+        """Test that unknown database aliases are rejected"""
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', database=['missing'])
+
+
+class SeedCommandsTestCase(TestCase):
+
+    def test_seed_data(self):
+        """Test seeding users with their tags, ingredients and recipes"""
+        call_command(
+            'seed_data',
+            users=2,
+            tags=3,
+            ingredients=4,
+            recipes=5,
+            tags_per_recipe=2,
+            ingredients_per_recipe=3,
+            stdout=StringIO()
+        )
+
+        user = get_user_model().objects.filter(
+            email__startswith='seed-'
+        ).first()
+        self.assertEqual(
+            get_user_model().objects.filter(email__startswith='seed-').count(),
+            2
+        )
+        self.assertTrue(user.check_password(SEED_PASSWORD))
+        self.assertEqual(Tag.objects.filter(user=user).count(), 3)
+        self.assertEqual(Ingredient.objects.filter(user=user).count(), 4)
+        self.assertEqual(Recipe.objects.count(), 10)
+        self.assertEqual(Recipe.tag.through.objects.count(), 20)
+        self.assertEqual(Recipe.ingredient.through.objects.count(), 30)
+
+    def test_benchmark_api_output(self):
+        """Test the benchmark writes results and rolls its data back"""
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command(
+                'benchmark_api',
+                users=1,
+                tags=3,
+                ingredients=3,
+                recipes=3,
+                requests=2,
+                warmup=0,
+                endpoints='tags list,recipe detail',
+                output=output.name,
+                stderr=StringIO()
+            )
+            results = json.load(output)
+
+        self.assertEqual(
+            set(results['endpoints']),
+            {'tags list', 'recipe detail'}
+        )
+        for modes in results['endpoints'].values():
+            self.assertEqual(set(modes), {'cold', 'warm'})
+            for figures in modes.values():
+                self.assertGreater(figures['throughput_rps'], 0)
+                self.assertLessEqual(figures['p50_ms'], figures['p99_ms'])
+        tags = results['endpoints']['tags list']
+        self.assertEqual(tags['warm']['method'], 'GET')
+        self.assertGreater(
+            tags['cold']['queries_per_request'],
+            tags['warm']['queries_per_request']
+        )
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_benchmark_api_leaves_no_files(self):
+        """Test the benchmark removes the images its requests store"""
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            MEDIA_ROOT=root,
+            IMAGE_STAGING_ROOT=root,
+            IMAGE_PROCESSING_BACKEND='sync'
+        ):
+            call_command(
+                'benchmark_api',
+                users=1,
+                tags=1,
+                ingredients=1,
+                recipes=2,
+                requests=1,
+                warmup=0,
+                endpoints='recipe upload image,recipe image upload chunk',
+                stdout=StringIO(),
+                stderr=StringIO()
+            )
+
+            self.assertEqual(
+                [files for _, _, files in os.walk(root) if files],
+                []
+            )
+
+    def test_benchmark_api_baseline_regression(self):
+        """Test the benchmark fails when queries grow past the baseline"""
+        baseline = {'endpoints': {'tags list': {'cold': {
+            'p50_ms': 10 ** 6,
+            'queries_per_request': 0,
+        }}}}
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as file:
+            json.dump(baseline, file)
+            file.flush()
+
+            with self.assertRaises(CommandError):
+                call_command(
+                    'benchmark_api',
+                    users=1,
+                    tags=1,
+                    ingredients=1,
+                    recipes=1,
+                    requests=1,
+                    warmup=0,
+                    endpoints='tags list',
+                    baseline=file.name,
+                    stdout=StringIO(),
+                    stderr=StringIO()
+                )
+
+
+class RebuildRelatedIdsCommandTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@khalti.com',
+            'password123'
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Salad',
+            time_minutes=5,
+            price=5
+        )
+        self.recipe.tag.add(self.tag)
+
+    def test_verify_current_ids(self):
+        """Test that verifying current ids succeeds"""
+        out = StringIO()
+
+        call_command('rebuild_related_ids', verify=True, stdout=out)
+
+        self.assertIn('All 1 recipes have current ids', out.getvalue())
+
+    def test_verify_stale_ids(self):
+        """Test that verifying stale ids fails without fixing them"""
+        Recipe.objects.update(tag_ids=[])
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_related_ids', verify=True, stdout=StringIO())
+        self.assertEqual(Recipe.objects.get().tag_ids, [])
+
+    def test_rebuild_stale_ids(self):
+        """Test that rebuilding fixes stale ids and bumps the version"""
+        Recipe.objects.update(tag_ids=[], ingredient_ids=[12345])
+        version = get_user_model().objects.get().recipes_version
+
+        call_command('rebuild_related_ids', batch_size=1, stdout=StringIO())
+
+        recipe = Recipe.objects.get()
+        self.assertEqual(recipe.tag_ids, [self.tag.id])
+        self.assertEqual(recipe.ingredient_ids, [])
+        self.assertEqual(
+            get_user_model().objects.get().recipes_version,
+            version + 1
+        )
+
+    def test_rebuild_recipe_counts(self):
+        """Test that wrong recipe counts are reported and fixed"""
+        Tag.objects.update(recipe_count=7)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_related_ids', verify=True, stdout=StringIO())
+        call_command('rebuild_related_ids', stdout=StringIO())
+
+        self.assertEqual(Tag.objects.get().recipe_count, 1)
+
+
+class BenchmarkCommandsTestCase(TestCase):
+    """Smoke test the benchmark commands on tiny data sets"""
+
+    def test_benchmark_assigned_only(self):
+        """Test both assigned_only strategies find the same tags"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_assigned_only',
+            tags=6,
+            recipes=4,
+            tags_per_recipe=2,
+            repeat=1,
+            stdout=out
+        )
+
+        output = out.getvalue()
+        self.assertIn('recipe_count', output)
+        counts = re.findall(r'^(\d+) rows', output, re.MULTILINE)
+        self.assertEqual(len(counts), 2)
+        self.assertEqual(counts[0], counts[1])
+        self.assertNotEqual(counts[0], '0')
+        self.assertFalse(Tag.objects.exists())
+
+    def test_benchmark_search(self):
+        """Test a search is timed at every size and the data rolled back"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_search',
+            sizes='20,10',
+            repeat=1,
+            stdout=out
+        )
+
+        sizes = re.findall(r'^\s*(\d+) recipes:', out.getvalue(), re.MULTILINE)
+        self.assertEqual(sizes, ['10', '20'])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_list_serialization(self):
+        """Test both list strategies render identical JSON"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_list_serialization',
+            recipes=5,
+            tags_per_recipe=3,
+            ingredients_per_recipe=3,
+            repeat=1,
+            stdout=out
+        )
+
+        self.assertIn('Identical output', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+
+class ExplainQueriesTests(TestCase):
+
+    def test_postgres_sequential_scans(self):
+        """Test that only sequential scans of a Postgres plan are reported"""
+        plan = '\n'.join((
+            'Nested Loop  (cost=0.56..16.61 rows=1 width=44)',
+            '  ->  Index Scan using core_recipe_pkey on core_recipe  '
+            '(cost=0.28..8.29 rows=1 width=4)',
+            '  ->  Seq Scan on core_tag  (cost=10000000000.00..'
+            '10000000001.05 rows=5 width=44)',
+        ))
+
+        self.assertEqual(_full_scans(plan, 'postgresql'), ['core_tag'])
+
+    def test_sqlite_scans(self):
+        """Test that SQLite scans without an index are reported"""
+        plan = '\n'.join((
+            '3 0 0 SCAN TABLE core_tag',
+            '5 0 0 SCAN TABLE core_recipe USING INDEX core_recipe_user_id',
+            '7 0 0 SEARCH TABLE core_user USING INTEGER PRIMARY KEY (rowid=?)',
+            '9 0 0 SCAN TABLE missing_table',
+        ))
+
+        self.assertEqual(_full_scans(plan, 'sqlite'), ['core_tag'])
+
+    def test_indexed_queries_pass(self):
+        """Test the audit passes on the indexed hot queries"""
+        out = StringIO()
+
+        call_command(
+            'explain_queries',
+            users=2,
+            tags=5,
+            ingredients=5,
+            recipes=5,
+            stdout=out
+        )
+
+        self.assertIn('All hot queries use indexes', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
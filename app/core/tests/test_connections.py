@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import tempfile
+import threading
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.connections import ConnectionPool, PoolTimeout, check_connections
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the pool with SQLite connections standing in for PostgreSQL"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def test_connections_reused(self):
+        """Test that sequential requests open a single connection"""
+        pool = ConnectionPool(self._connect, max_size=2)
+
+        for _ in range(20):
+            pool.checkin(pool.checkout())
+
+        stats = pool.stats()
+        self.assertEqual(stats['checkouts'], 20)
+        self.assertEqual(stats['connects'], 1)
+        self.assertEqual(stats['idle'], 1)
+        self.assertEqual(stats['in_use'], 0)
+
+    def test_dead_connection_replaced(self):
+        """Test that a connection failing its check is replaced"""
+        pool = ConnectionPool(self._connect)
+        dead = pool.checkout()
+        dead.close()
+        pool.checkin(dead)
+
+        connection = pool.checkout()
+
+        self.assertIsNot(connection, dead)
+        connection.execute('SELECT 1')
+        stats = pool.stats()
+        self.assertEqual(stats['discarded'], 1)
+        self.assertEqual(stats['connects'], 2)
+        self.assertEqual(stats['size'], 1)
+
+    def test_failed_reset_discards(self):
+        """Test that connections which cannot be reset leave the pool"""
+        def reset(connection):
+            raise sqlite3.OperationalError
+
+        pool = ConnectionPool(self._connect, reset=reset)
+        pool.checkin(pool.checkout())
+
+        self.assertEqual(pool.stats()['size'], 0)
+        self.assertEqual(pool.stats()['discarded'], 1)
+
+    def test_exhausted_pool_times_out(self):
+        """Test that checkouts beyond max_size time out"""
+        pool = ConnectionPool(self._connect, max_size=1, timeout=0.01)
+        pool.checkout()
+
+        with self.assertRaises(PoolTimeout):
+            pool.checkout()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_waits_for_checkin(self):
+        """Test that a checkout waits for a connection to be returned"""
+        pool = ConnectionPool(self._connect, max_size=1, timeout=5)
+        held = pool.checkout()
+        timer = threading.Timer(0.05, pool.checkin, args=(held,))
+        timer.start()
+        self.addCleanup(timer.join)
+
+        self.assertIs(pool.checkout(), held)
+        stats = pool.stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreater(stats['max_wait_ms'], 0)
+
+    def test_failed_connect_frees_slot(self):
+        """Test that a failed connect does not use up the pool"""
+        pool = ConnectionPool(self._connect, max_size=1, timeout=0.01)
+        with patch.object(pool, 'connect', side_effect=sqlite3.Error):
+            with self.assertRaises(sqlite3.Error):
+                pool.checkout()
+
+        self.assertIsNotNone(pool.checkout())
+
+
+class HealthCheckTests(TestCase):
+
+    def test_unusable_connection_closed(self):
+        """Test that dropped persistent connections are closed"""
+        connection.ensure_connection()
+        with patch.object(connection, 'in_atomic_block', False), \
+                patch.object(connection, 'is_usable', return_value=False), \
+                patch.object(connection, 'close') as close:
+            check_connections()
+
+        close.assert_called_once_with()
+
+    @override_settings(DB_HEALTH_CHECKS=False)
+    def test_health_checks_disabled(self):
+        """Test that no check runs with DB_HEALTH_CHECKS off"""
+        connection.ensure_connection()
+        with patch.object(connection, 'in_atomic_block', False), \
+                patch.object(connection, 'is_usable') as is_usable:
+            check_connections()
+
+        is_usable.assert_not_called()
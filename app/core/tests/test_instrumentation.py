@@ -0,0 +1,148 @@
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.instrumentation import QueryRecorder, fingerprint, request_stats
+from core.models import Tag
+from recipe.views import TagViewSet
+
+
+TAGS_URL = reverse('recipe:tag-list')
+INSTRUMENTATION_URL = reverse('instrumentation')
+
+
+class FingerprintTests(TestCase):
+
+    def test_literals_removed(self):
+        """Test that queries differing only in literals share a fingerprint"""
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 1 AND name = 'a''b'"),
+            fingerprint('SELECT *  FROM t\nWHERE id = 22 AND name = %s'),
+        )
+
+    def test_in_lists_collapsed(self):
+        """Test that IN lists of any length share a fingerprint"""
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            'SELECT * FROM t WHERE id IN (...)'
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (1)'),
+            'SELECT * FROM t WHERE id IN (...)'
+        )
+
+    def test_recorder_flags_duplicates(self):
+        """Test that the recorder reports queries repeated in a request"""
+        user = get_user_model().objects.create_user(
+            'test@khalti.com',
+            'password123'
+        )
+        tags = [Tag.objects.create(user=user, name=f'tag {i}')
+                for i in range(3)]
+        recorder = QueryRecorder()
+
+        with connection.execute_wrapper(recorder):
+            for tag in tags:
+                Tag.objects.get(id=tag.id)
+            Tag.objects.count()
+
+        self.assertEqual(recorder.count, 4)
+        duplicates = recorder.duplicates(3)
+        self.assertEqual(len(duplicates), 1)
+        self.assertEqual(duplicates[0][1], 3)
+
+
+@override_settings(INSTRUMENTATION_ENABLED=True)
+class InstrumentationMiddlewareTests(TestCase):
+
+    def setUp(self):
+        request_stats.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@khalti.com',
+            'password123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        request_stats.clear()
+
+    def test_server_timing_header(self):
+        """Test that responses carry query count and timings"""
+        res = self.client.get(TAGS_URL)
+
+        timing = res['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="2 queries"', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('render;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_serialization_timed(self):
+        """Test that building the response data is timed on its own"""
+        def serialize_rows(viewset, rows):
+            time.sleep(0.02)
+            return []
+
+        with patch.object(TagViewSet, 'serialize_rows', serialize_rows):
+            res = self.client.get(TAGS_URL)
+
+        serialize_ms = float(
+            res['Server-Timing'].split('serialize;dur=')[1].split(',')[0]
+        )
+        self.assertGreaterEqual(serialize_ms, 20)
+        stats = request_stats.snapshot()['GET recipe:tag-list']
+        self.assertGreaterEqual(stats['mean_serialize_ms'], 20)
+
+    def test_stats_aggregated_per_view(self):
+        """Test that requests are aggregated by method and view name"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(TAGS_URL)
+        self.client.get(TAGS_URL)
+
+        stats = request_stats.snapshot()['GET recipe:tag-list']
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(sum(stats['latency_buckets'].values()), 2)
+        self.assertEqual(stats['max_queries'], 2)
+        self.assertGreater(stats['mean_response_bytes'], 0)
+
+    @override_settings(INSTRUMENTATION_ENABLED=False)
+    def test_disabled(self):
+        """Test that nothing is recorded when instrumentation is off"""
+        res = self.client.get(TAGS_URL)
+
+        self.assertNotIn('Server-Timing', res)
+        self.assertEqual(request_stats.snapshot(), {})
+
+    def test_stats_endpoint_requires_admin(self):
+        """Test that only admins can read the aggregated stats"""
+        res = self.client.get(INSTRUMENTATION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stats_endpoint(self):
+        """Test that admins can read and reset the aggregated stats"""
+        admin = get_user_model().objects.create_superuser(
+            'admin@khalti.com',
+            'password123'
+        )
+        self.client.get(TAGS_URL)
+        self.client.force_authenticate(admin)
+
+        res = self.client.get(INSTRUMENTATION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('GET recipe:tag-list', res.data['views'])
+        self.assertIn('tag-list', res.data['response_cache'])
+        self.assertIn('connection_pools', res.data)
+
+        res = self.client.delete(INSTRUMENTATION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertNotIn('GET recipe:tag-list', request_stats.snapshot())
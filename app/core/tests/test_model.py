@@ -1,7 +1,7 @@
 from unittest.mock import patch
 from django.test import TestCase
 from django.contrib.auth import get_user_model
-from core import models
+from core import models, related_ids
 
 
 def sample_user(email='test@khalti.com', password='Test@0987'):
@@ -87,4 +87,169 @@ class ModelTest(TestCase):
         file_path = models.recipe_image_file_path(None, 'myimage.jpg')
 
         exp_path = f'uploads/recipe/{uuid}.jpg'
-        self.assertEqual(file_path, exp_path)
\ No newline at end of file
+        self.assertEqual(file_path, exp_path)
+
+    def test_recipe_image_derivative_path(self):
+        """Test that resized image names derive from the original"""
+        file_path = models.recipe_image_derivative_path(
+            'uploads/recipe/test-uuid.jpg', 'small', 'webp'
+        )
+
+        self.assertEqual(file_path, 'uploads/recipe/test-uuid_small.webp')
+
+
+class RecipeRelatedIdsTest(TestCase):
+    """Test that recipes keep a copy of their tag and ingredient ids"""
+
+    def setUp(self):
+        self.user = sample_user()
+        self.recipe = models.Recipe.objects.create(
+            user=self.user,
+            title='Steak and mushroom sauce',
+            time_minutes=5,
+            price=5.00
+        )
+        self.tags = [
+            models.Tag.objects.create(user=self.user, name=f'Tag {i}')
+            for i in range(3)
+        ]
+
+    def _stored(self, field='tag_ids'):
+        return models.Recipe.objects.values_list(field, flat=True).get(
+            id=self.recipe.id
+        )
+
+    def test_links_copied(self):
+        """Test that adding and removing links updates the ids"""
+        self.recipe.tag.add(self.tags[2], self.tags[0])
+        self.assertEqual(self._stored(), [self.tags[0].id, self.tags[2].id])
+        self.assertEqual(self.recipe.tag_ids, self._stored())
+
+        self.recipe.tag.remove(self.tags[0])
+        self.assertEqual(self._stored(), [self.tags[2].id])
+
+        self.recipe.tag.clear()
+        self.assertEqual(self._stored(), [])
+
+    def test_reverse_links_copied(self):
+        """Test that links changed from the tag side update the ids"""
+        ingredient = models.Ingredient.objects.create(
+            user=self.user,
+            name='Salt'
+        )
+        ingredient.recipe_set.add(self.recipe)
+        self.assertEqual(self._stored('ingredient_ids'), [ingredient.id])
+
+        ingredient.recipe_set.clear()
+        self.assertEqual(self._stored('ingredient_ids'), [])
+
+    def test_deleted_tag_dropped(self):
+        """Test that deleting a tag removes it from the ids"""
+        self.recipe.tag.add(*self.tags)
+
+        self.tags[1].delete()
+
+        self.assertEqual(self._stored(), [self.tags[0].id, self.tags[2].id])
+
+    def test_tag_linked_to_many_recipes(self):
+        """Test that the ids of every recipe of a tag are written at once"""
+        recipes = [self.recipe] + [
+            models.Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=5,
+                price=5.00
+            )
+            for i in range(4)
+        ]
+        for recipe in recipes[:2]:
+            recipe.tag.add(self.tags[0])
+
+        # Locking the recipes, reading the links and writing the ids take
+        # one query each
+        with self.assertNumQueries(3):
+            related_ids.sync_related_ids(
+                [recipe.id for recipe in recipes],
+                'tag'
+            )
+        self.tags[1].recipe_set.add(*recipes)
+
+        self.assertEqual(
+            list(models.Recipe.objects.order_by('id').values_list(
+                'tag_ids', flat=True
+            )),
+            [[self.tags[0].id, self.tags[1].id]] * 2 +
+            [[self.tags[1].id]] * 3
+        )
+
+    def test_save_keeps_ids(self):
+        """Test that saving a stale recipe does not overwrite its ids"""
+        stale = models.Recipe.objects.get(id=self.recipe.id)
+        self.recipe.tag.add(self.tags[0])
+
+        stale.title = 'Renamed'
+        stale.save()
+
+        self.assertEqual(self._stored(), [self.tags[0].id])
+
+
+class RecipeCountTest(TestCase):
+    """Test that tags and ingredients count the recipes linked to them"""
+
+    def setUp(self):
+        self.user = sample_user()
+        self.tag = models.Tag.objects.create(user=self.user, name='Vegan')
+        self.recipes = [
+            models.Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=5,
+                price=5.00
+            )
+            for i in range(3)
+        ]
+
+    def _count(self):
+        return models.Tag.objects.get(id=self.tag.id).recipe_count
+
+    def test_links_counted(self):
+        """Test that adding, removing and clearing links adjusts counts"""
+        for recipe in self.recipes:
+            recipe.tag.add(self.tag)
+        self.recipes[0].tag.add(self.tag)
+        self.assertEqual(self._count(), 3)
+
+        self.recipes[0].tag.remove(self.tag)
+        self.recipes[0].tag.remove(self.tag)
+        self.assertEqual(self._count(), 2)
+
+        self.recipes[1].tag.clear()
+        self.assertEqual(self._count(), 1)
+
+    def test_reverse_links_counted(self):
+        """Test that links changed from the tag side adjust counts"""
+        self.tag.recipe_set.add(*self.recipes)
+        self.assertEqual(self._count(), 3)
+
+        self.tag.recipe_set.remove(self.recipes[0])
+        self.assertEqual(self._count(), 2)
+
+        self.tag.recipe_set.clear()
+        self.assertEqual(self._count(), 0)
+
+    def test_deleted_recipe_uncounted(self):
+        """Test that deleting a recipe lowers the counts of its tags"""
+        self.tag.recipe_set.add(*self.recipes)
+
+        models.Recipe.objects.filter(id=self.recipes[0].id).delete()
+
+        self.assertEqual(self._count(), 2)
+
+    def test_save_keeps_count(self):
+        """Test that saving a stale tag does not overwrite its count"""
+        self.recipes[0].tag.add(self.tag)
+
+        self.tag.name = 'Vegetarian'
+        self.tag.save()
+
+        self.assertEqual(self._count(), 1)
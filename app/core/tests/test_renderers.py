@@ -0,0 +1,130 @@
+import io
+import json
+from collections import OrderedDict
+from datetime import datetime, time, timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.http import StreamingHttpResponse
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer, ChunkedJSONRenderer
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+DATA = OrderedDict((
+    ('price', Decimal('5.00')),
+    ('label', gettext_lazy('Tags')),
+    ('created', datetime(2020, 1, 2, 3, 4, 5)),
+    ('text', 'line\u2028break\u2029end'),
+    ('items', [{'id': 1, 'name': 'Vegan'}, {'id': 2, 'name': 'Dessert'}]),
+    ('count', 2),
+    ('next', None),
+))
+
+
+class RendererTests(TestCase):
+
+    def test_matches_json_renderer(self):
+        """Test that the fast renderer writes the bytes JSONRenderer does"""
+        self.assertEqual(
+            FastJSONRenderer().render(DATA),
+            JSONRenderer().render(DATA)
+        )
+
+    def test_datetimes_match_json_renderer(self):
+        """Test that dates and times are written as JSONRenderer does"""
+        data = {
+            'naive': datetime(2020, 1, 2, 3, 4, 5, 123456),
+            'aware': datetime(2020, 1, 2, 3, 4, 5, 123456, timezone.utc),
+            'time': time(3, 4, 5, 123456),
+            'items': [{'created': datetime(2020, 1, 2, 3, 4, 5)}],
+        }
+
+        self.assertEqual(
+            FastJSONRenderer().render(data),
+            JSONRenderer().render(data)
+        )
+
+    def test_indented_output(self):
+        """Test that indented output is still available"""
+        self.assertEqual(
+            FastJSONRenderer().render(DATA, 'application/json; indent=2'),
+            JSONRenderer().render(DATA, 'application/json; indent=2')
+        )
+
+    def test_stream_matches_render(self):
+        """Test that streamed chunks join to the rendered document"""
+        renderer = ChunkedJSONRenderer()
+
+        self.assertEqual(
+            b''.join(renderer.stream(DATA)),
+            JSONRenderer().render(DATA)
+        )
+        self.assertEqual(
+            renderer.render(DATA['items']),
+            JSONRenderer().render(DATA['items'])
+        )
+
+
+class ParserTests(TestCase):
+
+    def test_parse_valid_json(self):
+        """Test that valid JSON bodies are parsed"""
+        body = json.dumps({'title': 'Chocolate cake', 'tag': [1, 2]})
+
+        data = FastJSONParser().parse(io.BytesIO(body.encode()))
+
+        self.assertEqual(data, {'title': 'Chocolate cake', 'tag': [1, 2]})
+
+    def test_parse_invalid_json(self):
+        """Test that invalid JSON bodies raise a parse error"""
+        for body in (b'{"title": ', b'', b'\xff'):
+            with self.assertRaises(ParseError):
+                FastJSONParser().parse(io.BytesIO(body))
+
+
+class ChunkedResponseTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@khalti.com',
+            'password123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(3):
+            Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=10,
+                price=Decimal('5.00')
+            )
+
+    def test_list_chunked_on_request(self):
+        """Test that json-chunked lists are chunked with the same content"""
+        expected = self.client.get(RECIPES_URL)
+
+        res = self.client.get(RECIPES_URL, {'format': 'json-chunked'})
+
+        self.assertIsInstance(res, StreamingHttpResponse)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertIn('ETag', res)
+        self.assertEqual(
+            json.loads(b''.join(res.streaming_content)),
+            json.loads(expected.content)
+        )
+
+    def test_list_not_chunked_by_default(self):
+        """Test that plain JSON lists are not sent in chunks"""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIsInstance(res, StreamingHttpResponse)
@@ -0,0 +1,145 @@
+import tempfile
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import _create_cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import routers
+from core.models import Recipe
+from core.routers import ReplicaRouter
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+PIN_CACHE = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': tempfile.mkdtemp(),
+}
+
+
+@override_settings(
+    DB_REPLICAS=['replica'],
+    DB_PRIMARY_PIN_SECONDS=5,
+    DB_PRIMARY_PIN_CACHE='pins',
+    DB_REPLICA_MAX_LAG=5,
+    CACHES=dict(settings.CACHES, pins=PIN_CACHE)
+)
+class ReplicaRouterTests(TestCase):
+    """Test read routing, recording the alias chosen for each read
+
+    The reads themselves still run on the test database.
+    """
+
+    def setUp(self):
+        caches['pins'].clear()
+        routers._health.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@khalti.com',
+            'password123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        lag = patch('core.routers.replica_lag', return_value=0.0)
+        self.lag = lag.start()
+        self.addCleanup(lag.stop)
+
+    def _reads(self, method, url, data=None):
+        """Return the alias the router picked for each read of a request"""
+        aliases = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            aliases.append(db_for_read(router, model, **hints))
+
+        with patch.object(ReplicaRouter, 'db_for_read', record):
+            getattr(self.client, method)(url, data)
+
+        return aliases
+
+    def test_safe_requests_read_replica(self):
+        """Test that list reads go to the replica"""
+        aliases = self._reads('get', RECIPES_URL)
+
+        self.assertTrue(aliases)
+        self.assertEqual(set(aliases), {'replica'})
+
+    def test_reads_outside_views_use_primary(self):
+        """Test that reads outside the recipe views are not routed"""
+        self._reads('get', RECIPES_URL)
+
+        self.assertIsNone(ReplicaRouter().db_for_read(Recipe))
+        self.assertEqual(
+            ReplicaRouter().db_for_write(Recipe),
+            DEFAULT_DB_ALIAS
+        )
+
+    def test_writes_pin_user_to_primary(self):
+        """Test that users read from the primary right after writing"""
+        aliases = self._reads('post', TAGS_URL, {'name': 'Vegan'})
+        self.assertNotIn('replica', aliases)
+
+        aliases = self._reads('get', TAGS_URL)
+
+        self.assertTrue(aliases)
+        self.assertNotIn('replica', aliases)
+
+    def test_failed_writes_do_not_pin(self):
+        """Test that rejected writes keep reads on the replica"""
+        self._reads('post', TAGS_URL, {'name': ''})
+
+        self.assertIn('replica', self._reads('get', TAGS_URL))
+
+    def test_lagging_replica_skipped(self):
+        """Test that reads fall back to the primary when replicas lag"""
+        self.lag.return_value = 60.0
+
+        self.assertNotIn('replica', self._reads('get', RECIPES_URL))
+
+    def test_unreachable_replica_skipped(self):
+        """Test that reads fall back to the primary without a replica"""
+        self.lag.return_value = None
+
+        self.assertNotIn('replica', self._reads('get', RECIPES_URL))
+
+    def test_lag_checked_once_per_interval(self):
+        """Test that replica lag is not measured on every request"""
+        self._reads('get', RECIPES_URL)
+        self._reads('get', TAGS_URL)
+
+        self.assertEqual(self.lag.call_count, 1)
+
+    def test_no_migrations_on_replicas(self):
+        """Test that migrations only run on the primary"""
+        router = ReplicaRouter()
+
+        self.assertFalse(router.allow_migrate('replica', 'core'))
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, 'core'))
+
+    def test_pin_shared_between_cache_instances(self):
+        """Test that a pin taken by one process is seen by another"""
+        other = _create_cache(PIN_CACHE['BACKEND'], **PIN_CACHE)
+
+        routers.pin_to_primary(self.user.id)
+        self.assertTrue(other.get(routers._pin_key(self.user.id)))
+
+        other.set(routers._pin_key(0), True, 5)
+        self.assertTrue(routers.is_pinned(0))
+
+    def test_pin_cache_must_be_shared(self):
+        """Test that replicas need a pin cache shared between processes"""
+        routers.check_pin_cache()
+
+        with override_settings(DB_PRIMARY_PIN_CACHE=None):
+            with self.assertRaises(ImproperlyConfigured):
+                routers.check_pin_cache()
+        with override_settings(DB_PRIMARY_PIN_CACHE='default'):
+            with self.assertRaises(ImproperlyConfigured):
+                routers.check_pin_cache()
+        with override_settings(DB_REPLICAS=[], DB_PRIMARY_PIN_CACHE=None):
+            routers.check_pin_cache()
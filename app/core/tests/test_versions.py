@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core import versions
+
+
+class VersionsTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@khalti.com',
+            'password123'
+        )
+
+    def test_atomic_bumps_before_commit(self):
+        """Test that coalesced bumps are written inside the transaction"""
+        recipes = self.user.recipes_version
+        tags = self.user.tags_version
+        with CaptureQueriesContext(connection) as ctx:
+            with versions.atomic():
+                versions.bump_versions(self.user.id, versions.RECIPES)
+                versions.bump_versions(
+                    self.user.id,
+                    versions.RECIPES,
+                    versions.TAGS
+                )
+
+        queries = [query['sql'] for query in ctx.captured_queries]
+        bumps = [i for i, sql in enumerate(queries)
+                 if sql.startswith('UPDATE "core_user"')]
+        self.assertEqual(len(bumps), 1)
+        self.assertTrue(queries[-1].startswith('RELEASE SAVEPOINT'))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.recipes_version, recipes + 1)
+        self.assertEqual(self.user.tags_version, tags + 1)
+
+    def test_atomic_rolled_back_skips_bumps(self):
+        """Test that a failed transaction writes no bumps"""
+        with CaptureQueriesContext(connection) as ctx:
+            with self.assertRaises(ValueError):
+                with versions.atomic():
+                    versions.bump_versions(self.user.id, versions.RECIPES)
+                    raise ValueError
+
+        self.assertFalse(any(
+            query['sql'].startswith('UPDATE "core_user"')
+            for query in ctx.captured_queries
+        ))
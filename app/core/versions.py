@@ -0,0 +1,90 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+
+
+RECIPES = 'recipes'
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+COLLECTIONS = (RECIPES, TAGS, INGREDIENTS)
+
+_state = threading.local()
+
+
+def _field(collection):
+    if collection not in COLLECTIONS:
+        raise ValueError(f'Unknown collection {collection!r}')
+
+    return f'{collection}_version'
+
+
+def bump_versions(user_id, *collections):
+    """Mark collections of a user as changed
+
+    The counters live on the user row, so the bump commits or rolls back
+    with the change that caused it. Inside coalesced() the bump is held
+    back and merged with the others of the block.
+    """
+    if not collections:
+        return
+    fields = {_field(collection) for collection in collections}
+    pending = getattr(_state, 'pending', None)
+    if pending is not None:
+        pending[user_id].update(fields)
+        return
+    _update(user_id, fields)
+
+
+def _update(user_id, fields):
+    get_user_model().objects.filter(id=user_id).update(
+        **{field: F(field) + 1 for field in fields}
+    )
+
+
+@contextmanager
+def coalesced():
+    """Collect the bumps made inside the block into one per user
+
+    The collected bumps are written when the outermost block exits, with
+    one UPDATE per user. They are written on errors too, as changes made
+    outside a transaction stay, unless the block runs in a transaction
+    that the error rolls back.
+    """
+    if getattr(_state, 'pending', None) is not None:
+        yield
+        return
+    _state.pending = defaultdict(set)
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        pending = _state.pending
+        _state.pending = None
+        connection = transaction.get_connection()
+        if not (failed and connection.in_atomic_block) and \
+                not connection.needs_rollback:
+            for user_id, fields in pending.items():
+                _update(user_id, fields)
+
+
+@contextmanager
+def atomic():
+    """Run a block in a transaction, coalescing its version bumps
+
+    The bumps are written before the transaction commits, so no reader
+    sees the new rows under the old versions.
+    """
+    with transaction.atomic(), coalesced():
+        yield
+
+
+def collection_version(user_id, collection):
+    """Return the current version of a user's collection"""
+    return get_user_model().objects.filter(id=user_id).values_list(
+        _field(collection), flat=True
+    ).first()
@@ -1,3 +1,26 @@
-from django.shortcuts import render
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from core.authentication import CachedTokenAuthentication
+from core.connections import pool_stats
+from core.instrumentation import cache_stats, request_stats
+
+
+class InstrumentationView(APIView):
+    """Report the request measurements aggregated in this process"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return Response({
+            'views': request_stats.snapshot(),
+            'response_cache': cache_stats.snapshot(),
+            'connection_pools': pool_stats(),
+        })
+
+    def delete(self, request):
+        request_stats.clear()
+        cache_stats.clear()
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
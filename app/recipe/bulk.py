@@ -0,0 +1,140 @@
+from collections import Counter
+
+from django.db import connection
+from django.db.models import Case, Value, When
+
+from core import versions
+from core.models import Recipe
+from core.related_ids import adjust_recipe_counts
+
+
+BATCH_SIZE = 1000
+RELATED_FIELDS = ('tag', 'ingredient')
+
+
+def _batch_size(objs, fields):
+    """Return a batch size the database backend can handle for objs"""
+    supported = connection.ops.bulk_batch_size(fields, objs)
+
+    return min(BATCH_SIZE, max(supported, 1))
+
+
+def _split_related(item):
+    """Split validated data into model fields and related objects
+
+    The fields include the recipe's copy of the related ids, as bulk
+    writes send no m2m_changed signals to keep them in step.
+    """
+    fields = dict(item)
+    related = {
+        name: fields.pop(name) for name in RELATED_FIELDS if name in fields
+    }
+    for name, objs in related.items():
+        fields[Recipe.RELATED_ID_FIELDS[name]] = sorted(
+            {obj.pk for obj in objs}
+        )
+
+    return fields, related
+
+
+def _set_related(recipes, related_items, clear):
+    """Write the through rows of recipes in batches
+
+    When clear is set the existing links of every relation present in an
+    item are removed first, matching assignment semantics.
+    """
+    for name in RELATED_FIELDS:
+        through = getattr(Recipe, name).through
+        column = f'{name}_id'
+        recipe_ids = []
+        rows = []
+        for recipe, related in zip(recipes, related_items):
+            if name not in related:
+                continue
+            recipe_ids.append(recipe.id)
+            pks = dict.fromkeys(obj.pk for obj in related[name])
+            rows.extend(
+                through(recipe_id=recipe.id, **{column: pk}) for pk in pks
+            )
+
+        # Bulk writes send no m2m_changed signals to update the counts
+        counts = Counter(getattr(row, column) for row in rows)
+        if clear and recipe_ids:
+            unlinked = through.objects.filter(recipe_id__in=recipe_ids)
+            counts.subtract(unlinked.values_list(column, flat=True))
+            unlinked.delete()
+        if rows:
+            through.objects.bulk_create(
+                rows,
+                batch_size=_batch_size(rows, ['recipe_id', column])
+            )
+        adjust_recipe_counts(name, counts)
+
+
+def _update_fields(objs, fields):
+    """Write the given fields of objs with one UPDATE per batch"""
+    if not objs or not fields:
+        return
+    model = type(objs[0])
+    batch_size = _batch_size(objs, ['pk'] + list(fields))
+    for start in range(0, len(objs), batch_size):
+        batch = objs[start:start + batch_size]
+        updates = {}
+        for name in fields:
+            field = model._meta.get_field(name)
+            updates[name] = Case(
+                *(When(
+                    pk=obj.pk,
+                    then=Value(getattr(obj, field.attname), output_field=field)
+                ) for obj in batch),
+                output_field=field
+            )
+        model.objects.filter(pk__in=[obj.pk for obj in batch]).update(
+            **updates
+        )
+
+
+def bulk_create_recipes(user, items):
+    """Create recipes with their tags and ingredients from validated data"""
+    recipes = []
+    related_items = []
+    for item in items:
+        fields, related = _split_related(item)
+        recipes.append(Recipe(user=user, **fields))
+        related_items.append(related)
+
+    with versions.coalesced():
+        if connection.features.can_return_ids_from_bulk_insert:
+            Recipe.objects.bulk_create(
+                recipes,
+                batch_size=_batch_size(recipes, Recipe._meta.concrete_fields)
+            )
+        else:
+            # Without returned ids there is no way to link the through
+            # rows, and the bumps of each save are folded into the one below
+            for recipe in recipes:
+                recipe.save()
+        _set_related(recipes, related_items, clear=False)
+        # Bulk writes send no signals, so versions are bumped here
+        versions.bump_versions(user.id, *versions.COLLECTIONS)
+
+    return recipes
+
+
+def bulk_update_recipes(recipes, items):
+    """Apply validated partial updates to recipes, item by item"""
+    changed = set()
+    related_items = []
+    for recipe, item in zip(recipes, items):
+        fields, related = _split_related(item)
+        for name, value in fields.items():
+            setattr(recipe, name, value)
+        changed.update(fields)
+        related_items.append(related)
+
+    _update_fields(recipes, sorted(changed))
+    _set_related(recipes, related_items, clear=True)
+    for user_id in {recipe.user_id for recipe in recipes}:
+        versions.bump_versions(user_id, *versions.COLLECTIONS)
+
+    return recipes
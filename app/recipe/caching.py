@@ -0,0 +1,103 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from core.instrumentation import cache_stats
+from recipe.conditional import VersionedCollectionMixin
+
+
+def normalize_ids(value):
+    """Return comma separated ids sorted and without duplicates"""
+    ids = sorted({int(pk) for pk in value.split(',')})
+
+    return ','.join(str(pk) for pk in ids)
+
+
+def normalize_flag(value):
+    """Return an integer flag as 0 or 1"""
+    return str(int(bool(int(value))))
+
+
+def _response_cache():
+    """Return the response cache or None if caching is disabled"""
+    alias = getattr(settings, 'RESPONSE_CACHE', None)
+    if not alias:
+        return None
+
+    return caches[alias]
+
+
+class CachedResponseMixin(VersionedCollectionMixin):
+    """Serve repeated list and retrieve responses from the cache
+
+    Entries are keyed on the user, the action, the normalized query
+    parameters and the user's collection version. A write bumps the
+    version through the core signals, so stale entries are never read
+    again and simply expire. Requests with query parameters missing from
+    cache_query_params are not cached, since they could change the
+    response in ways the key does not capture.
+    """
+    cache_query_params = {}
+
+    def _cache_key(self, request):
+        """Return the cache key of a request or None if it is uncacheable"""
+        params = []
+        for name in sorted(request.query_params):
+            normalize = self.cache_query_params.get(name)
+            if normalize is None:
+                return None
+            try:
+                value = normalize(request.query_params[name])
+            except ValueError:
+                return None
+            params.append(f'{name}={value}')
+
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        key = '|'.join((
+            self.basename,
+            self.action,
+            str(self.kwargs.get(lookup, '')),
+            str(request.user.id),
+            str(self.get_collection_version()),
+            # Pagination links are absolute URLs
+            request.build_absolute_uri('/'),
+            '&'.join(params),
+        ))
+
+        return 'response:' + hashlib.sha1(key.encode()).hexdigest()
+
+    def _cached_response(self, request, respond, *args, **kwargs):
+        """Return the cached response data or respond and cache the result"""
+        cache = _response_cache()
+        key = self._cache_key(request) if cache is not None else None
+        name = f'{self.basename}-{self.action}'
+        if key is None:
+            cache_stats.record(name, 'bypass')
+            return respond(request, *args, **kwargs)
+
+        data = cache.get(key)
+        if data is not None:
+            cache_stats.record(name, 'hit')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        cache_stats.record(name, 'miss')
+        response = respond(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(
+            request, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(
+            request, super().retrieve, *args, **kwargs
+        )
@@ -0,0 +1,56 @@
+from itertools import islice
+
+from core.models import Recipe
+from core.renderers import NDJSONRenderer
+from recipe.bulk import RELATED_FIELDS
+from recipe.listing import RECIPE_LIST_FIELDS, serialize_recipe_rows
+
+
+EXPORT_CHUNK_SIZE = 500
+
+
+def _attach_related(rows):
+    """Add the tags and ingredients of recipe rows as serialized objects"""
+    ids = [row['id'] for row in rows]
+    for relation in RELATED_FIELDS:
+        through = getattr(Recipe, relation).through
+        column = f'{relation}_id'
+        related = {recipe_id: [] for recipe_id in ids}
+        links = through.objects.filter(
+            recipe_id__in=ids
+        ).order_by(column).values_list(
+            'recipe_id',
+            column,
+            f'{relation}__name',
+            f'{relation}__recipe_count'
+        )
+        for recipe_id, pk, name, count in links:
+            related[recipe_id].append(
+                {'id': pk, 'name': name, 'recipe_count': count}
+            )
+        for row in rows:
+            # serialize_recipe_rows lists whatever the row holds here
+            row[f'{relation}_ids'] = related[row['id']]
+
+    return rows
+
+
+def export_recipes(queryset, request=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the recipes of queryset as newline delimited JSON
+
+    Rows are read from a server-side cursor where the database has one,
+    and tags and ingredients are fetched for chunk_size recipes at a
+    time, so memory use does not grow with the number of recipes. Each
+    line matches the recipe detail representation.
+    """
+    rows = queryset.prefetch_related(None).values(
+        *RECIPE_LIST_FIELDS
+    ).iterator(chunk_size=chunk_size)
+    renderer = NDJSONRenderer()
+    while True:
+        batch = list(islice(rows, chunk_size))
+        if not batch:
+            return
+        yield renderer.render(
+            serialize_recipe_rows(_attach_related(batch), request)
+        )
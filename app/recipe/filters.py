@@ -0,0 +1,109 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+    TrigramSimilarity
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, Count, Exists, F, FloatField, \
+    IntegerField, OuterRef, Q, Value, When
+
+from core.models import Ingredient, Recipe, Tag
+
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+MATCH_CHOICES = (MATCH_ANY, MATCH_ALL)
+SEARCH_CONFIG = 'english'
+
+
+def filter_assigned(queryset):
+    """Return objects of queryset that are assigned to at least one recipe
+
+    The maintained recipe_count answers this without touching the through
+    table.
+    """
+    return queryset.filter(recipe_count__gt=0)
+
+
+def typeahead(queryset, text):
+    """Return objects whose name starts with or resembles text, best first
+
+    Prefix matches come first, followed by names that are similar
+    according to pg_trgm. Django compiles istartswith to
+    UPPER(name::text) LIKE UPPER(...), which the trigram GIN index on
+    (user, UPPER(name)) serves, and the similarity operator uses the one on
+    (user, name). Other databases only match substrings.
+    """
+    prefix = Case(
+        When(name__istartswith=text, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField()
+    )
+    if connection.vendor == 'postgresql':
+        return queryset.filter(
+            Q(name__istartswith=text) | Q(name__trigram_similar=text)
+        ).annotate(
+            prefix=prefix,
+            similarity=TrigramSimilarity('name', text)
+        ).order_by('-prefix', '-similarity', 'name', 'id')
+
+    return queryset.filter(name__icontains=text).annotate(
+        prefix=prefix
+    ).order_by('-prefix', 'name', 'id')
+
+
+def filter_recipes_by_related(queryset, relation, ids, match=MATCH_ANY):
+    """Return recipes of queryset linked to any or all of the given ids
+
+    The through table is filtered in a subquery, so each recipe is
+    returned once however many of the ids it matches. With MATCH_ALL the
+    links are grouped per recipe and only recipes linked to every id are
+    kept. On Postgres the recipes' id arrays are matched instead, through
+    their GIN indexes, unless RECIPE_DENORMALIZED_IDS is off.
+    """
+    ids = set(ids)
+    if connection.vendor == 'postgresql' and \
+            settings.RECIPE_DENORMALIZED_IDS:
+        lookup = 'contains' if match == MATCH_ALL else 'overlap'
+        return queryset.filter(**{
+            f'{Recipe.RELATED_ID_FIELDS[relation]}__{lookup}': sorted(ids)
+        })
+
+    through = getattr(Recipe, relation).through
+    links = through.objects.filter(**{f'{relation}_id__in': ids})
+    if match == MATCH_ALL:
+        links = links.values('recipe_id').annotate(
+            matched=Count(f'{relation}_id')
+        ).filter(matched=len(ids))
+
+    return queryset.filter(id__in=links.values('recipe_id'))
+
+
+def search_recipes(queryset, text):
+    """Return recipes matching the search text annotated with a rank
+
+    On Postgres this matches the trigger maintained search_vector through
+    its GIN index and ranks with ts_rank. Other databases fall back to
+    case insensitive substring matches, ranking title matches first.
+    """
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(text, config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        )
+
+    tagged = Tag.objects.filter(recipe=OuterRef('pk'), name__icontains=text)
+    with_ingredient = Ingredient.objects.filter(
+        recipe=OuterRef('pk'),
+        name__icontains=text
+    )
+    return queryset.annotate(
+        tagged=Exists(tagged),
+        with_ingredient=Exists(with_ingredient),
+    ).filter(
+        Q(title__icontains=text) | Q(tagged=True) | Q(with_ingredient=True)
+    ).annotate(
+        rank=Case(
+            When(title__icontains=text, then=Value(1.0)),
+            default=Value(0.4),
+            output_field=FloatField()
+        )
+    )
@@ -0,0 +1,212 @@
+import io
+import logging
+import os
+import shutil
+import uuid
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, features
+
+from core import versions
+from core.models import Recipe, recipe_image_derivative_path
+
+
+logger = logging.getLogger(__name__)
+
+# EXIF orientation values mapped to the transposes that undo them
+ORIENTATION_TAG = 274
+ORIENTATION_TRANSPOSES = {
+    2: (Image.FLIP_LEFT_RIGHT,),
+    3: (Image.ROTATE_180,),
+    4: (Image.FLIP_TOP_BOTTOM,),
+    5: (Image.ROTATE_90, Image.FLIP_TOP_BOTTOM),
+    6: (Image.ROTATE_270,),
+    7: (Image.ROTATE_270, Image.FLIP_TOP_BOTTOM),
+    8: (Image.ROTATE_90,),
+}
+
+
+def staging_path(ext=''):
+    """Return a new unique path in the staging area"""
+    os.makedirs(settings.IMAGE_STAGING_ROOT, exist_ok=True)
+
+    return os.path.join(settings.IMAGE_STAGING_ROOT, f'{uuid.uuid4()}{ext}')
+
+
+def stage_upload(uploaded):
+    """Move an uploaded file to the staging area and return its path"""
+    path = staging_path(os.path.splitext(uploaded.name)[1].lower()[:10])
+    if hasattr(uploaded, 'temporary_file_path'):
+        # Large uploads are already on disk, so move rather than copy them
+        shutil.move(uploaded.temporary_file_path(), path)
+        return path
+
+    with open(path, 'wb') as staged:
+        for chunk in uploaded.chunks():
+            staged.write(chunk)
+
+    return path
+
+
+def _apply_orientation(img):
+    """Rotate the image upright as its EXIF data would have it displayed"""
+    try:
+        exif = img._getexif() or {}
+    except (AttributeError, KeyError, IndexError, TypeError, ValueError):
+        exif = {}
+    for method in ORIENTATION_TRANSPOSES.get(exif.get(ORIENTATION_TAG), ()):
+        img = img.transpose(method)
+
+    return img
+
+
+def image_formats():
+    """Return the (extension, Pillow format, save options) of derivatives"""
+    formats = [('jpg', 'JPEG', {'quality': 85, 'optimize': True})]
+    if features.check('webp'):
+        formats.append(('webp', 'WEBP', {'quality': 80, 'method': 4}))
+
+    return formats
+
+
+def _encode(img, image_format, options):
+    """Return img encoded in the given format"""
+    buffer = io.BytesIO()
+    img.save(buffer, format=image_format, **options)
+
+    return buffer.getvalue()
+
+
+def encode_image(path):
+    """Validate the image at path and return its encoded variants
+
+    The result maps None to the full size JPEG and (size, extension) to
+    each derivative listed in IMAGE_DERIVATIVE_SIZES. Only pixel data is
+    written back, so EXIF and other metadata are dropped. Images larger
+    than IMAGE_MAX_DIMENSION are scaled down.
+    """
+    with Image.open(path) as img:
+        img.verify()
+
+    with Image.open(path) as img:
+        img = _apply_orientation(img)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        max_dimension = settings.IMAGE_MAX_DIMENSION
+        img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        formats = image_formats()
+        ext, image_format, options = formats[0]
+        variants = {None: _encode(img, image_format, options)}
+        for size, dimension in settings.IMAGE_DERIVATIVE_SIZES.items():
+            resized = img.copy()
+            resized.thumbnail((dimension, dimension), Image.LANCZOS)
+            for ext, image_format, options in formats:
+                variants[(size, ext)] = _encode(resized, image_format, options)
+
+    return variants
+
+
+def derivative_names(name):
+    """Return the derivative file names of a stored image by size and format"""
+    return {
+        size: {
+            ext: recipe_image_derivative_path(name, size, ext)
+            for ext, _, _ in image_formats()
+        }
+        for size in settings.IMAGE_DERIVATIVE_SIZES
+    }
+
+
+def delete_image(storage, name):
+    """Delete a stored image and its derivatives"""
+    storage.delete(name)
+    for names in derivative_names(name).values():
+        for derivative in names.values():
+            storage.delete(derivative)
+
+
+def stored_image_urls(storage, name, status, request=None):
+    """Return the URLs of a stored image keyed by size and format"""
+    if not name or status != Recipe.IMAGE_READY:
+        return None
+
+    def url(stored):
+        location = storage.url(stored)
+        if request is not None:
+            return request.build_absolute_uri(location)
+        return location
+
+    urls = {
+        size: {ext: url(derivative) for ext, derivative in names.items()}
+        for size, names in derivative_names(name).items()
+    }
+    urls['original'] = url(name)
+
+    return urls
+
+
+def image_urls(recipe, request=None):
+    """Return the URLs of a recipe's image keyed by size and format"""
+    return stored_image_urls(
+        recipe.image.storage,
+        recipe.image.name,
+        recipe.image_status,
+        request
+    )
+
+
+def process_recipe_image(recipe_id):
+    """Process the staged image of a pending recipe
+
+    The recipe is claimed by moving it from pending to processing, so a
+    job that was queued twice is only processed once.
+    """
+    claimed = Recipe.objects.filter(
+        id=recipe_id,
+        image_status=Recipe.IMAGE_PENDING
+    ).update(image_status=Recipe.IMAGE_PROCESSING)
+    if not claimed:
+        return
+    recipe = Recipe.objects.get(id=recipe_id)
+    versions.bump_versions(recipe.user_id, versions.RECIPES)
+    staged = recipe.image_staging
+    previous = recipe.image.name
+    storage = recipe.image.storage
+
+    try:
+        variants = encode_image(staged)
+    except Exception:
+        logger.exception('Failed to process image for recipe %s', recipe_id)
+        variants = None
+    finally:
+        if os.path.exists(staged):
+            os.remove(staged)
+
+    updates = {'image_status': Recipe.IMAGE_FAILED, 'image_staging': ''}
+    if variants is not None:
+        recipe.image.save(
+            'image.jpg',
+            ContentFile(variants.pop(None)),
+            save=False
+        )
+        for size, names in derivative_names(recipe.image.name).items():
+            for ext, name in names.items():
+                storage.save(name, ContentFile(variants[(size, ext)]))
+        updates = {
+            'image': recipe.image.name,
+            'image_status': Recipe.IMAGE_READY,
+            'image_staging': '',
+        }
+
+    # A newer upload replaces image_staging, in which case this result is
+    # stale and must not overwrite the newer job's state
+    current = Recipe.objects.filter(id=recipe_id, image_staging=staged)
+    if not current.update(**updates):
+        if variants is not None:
+            delete_image(storage, recipe.image.name)
+        return
+    versions.bump_versions(recipe.user_id, versions.RECIPES)
+    if variants is not None and previous:
+        delete_image(storage, previous)
@@ -0,0 +1,133 @@
+from django.conf import settings
+from rest_framework.response import Response
+
+from core.instrumentation import time_serialization
+from core.models import Recipe
+from core.related_ids import related_ids
+from recipe.images import stored_image_urls
+from recipe.serializers import RecipeSerializer
+
+
+RECIPE_LIST_FIELDS = (
+    'id', 'title', 'time_minutes', 'price', 'link', 'image', 'image_status',
+)
+ATTR_LIST_FIELDS = ('id', 'name', 'recipe_count')
+
+
+def recipe_rows(queryset):
+    """Return queryset as the rows needed to list recipes
+
+    With RECIPE_DENORMALIZED_IDS on, the tag and ingredient ids come from
+    the recipe row itself. Otherwise attach_related_ids fills them in
+    from the through tables.
+    """
+    fields = list(RECIPE_LIST_FIELDS)
+    if 'rank' in queryset.query.annotations:
+        # Cursor pagination reads the ordering fields from each row
+        fields.append('rank')
+    if settings.RECIPE_DENORMALIZED_IDS:
+        fields.extend(Recipe.RELATED_ID_FIELDS.values())
+
+    return queryset.prefetch_related(None).values(*fields)
+
+
+def attach_related_ids(rows):
+    """Add the tag and ingredient ids missing from recipe rows"""
+    for relation, key in Recipe.RELATED_ID_FIELDS.items():
+        ids = related_ids(
+            [row['id'] for row in rows if key not in row],
+            relation
+        )
+        for row in rows:
+            if key not in row:
+                row[key] = ids[row['id']]
+
+    return rows
+
+
+def serialize_recipe_rows(rows, request=None):
+    """Return recipe rows as RecipeSerializer would represent the recipes"""
+    rows = attach_related_ids(list(rows))
+    price = RecipeSerializer().fields['price']
+    storage = Recipe._meta.get_field('image').storage
+
+    return [
+        {
+            'id': row['id'],
+            'title': row['title'],
+            'ingredient': row['ingredient_ids'],
+            'tag': row['tag_ids'],
+            'time_minutes': row['time_minutes'],
+            'price': price.to_representation(row['price']),
+            'link': row['link'],
+            'image_status': row['image_status'],
+            'images': stored_image_urls(
+                storage,
+                row['image'],
+                row['image_status'],
+                request
+            ),
+        }
+        for row in rows
+    ]
+
+
+def serialize_attr_rows(rows):
+    """Return tag or ingredient rows as their serializers would"""
+    return [
+        {
+            'id': row['id'],
+            'name': row['name'],
+            'recipe_count': row['recipe_count'],
+        }
+        for row in rows
+    ]
+
+
+class LeanListMixin:
+    """List from values() rows instead of model instances and serializers
+
+    By default the list_fields columns are read and returned as they are,
+    which suits serializers made only of plain model fields. Viewsets whose
+    output needs more override get_list_rows and serialize_rows. Without
+    list_fields the viewset's serializer is used as ListModelMixin would.
+    """
+    list_fields = None
+
+    def get_list_rows(self, queryset):
+        """Return the rows to list from queryset"""
+        if self.list_fields is None:
+            return queryset
+
+        return queryset.values(*self.list_fields)
+
+    def serialize_rows(self, rows):
+        """Return rows as the response data of the viewset's serializer"""
+        if self.list_fields is None:
+            return self.get_serializer(rows, many=True).data
+
+        return [
+            {name: row[name] for name in self.list_fields} for row in rows
+        ]
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = self.get_list_rows(queryset)
+        page = self.paginate_queryset(rows)
+        with time_serialization(request):
+            data = self.serialize_rows(rows if page is None else page)
+        if page is not None:
+            return self.get_paginated_response(data)
+
+        return Response(data)
+
+
+class TimedRetrieveMixin:
+    """Retrieve as RetrieveModelMixin does, timing the serializer"""
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        with time_serialization(request):
+            data = self.get_serializer(instance).data
+
+        return Response(data)
@@ -0,0 +1,67 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset pagination for recipes, newest first or by search rank"""
+    ordering = '-id'
+    search_ordering = ('-rank', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def get_ordering(self, request, queryset, view):
+        if request.query_params.get('search'):
+            return self.search_ordering
+
+        return super().get_ordering(request, queryset, view)
+
+
+class RecipeAttrCursorPagination(CursorPagination):
+    """Keyset pagination for tags and ingredients, ordered by name
+
+    ?ordering=-recipe_count lists the most used first instead.
+    """
+    ordering = ('-name', 'id')
+    orderings = {'-recipe_count': ('-recipe_count', 'id')}
+    ordering_query_param = 'ordering'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get(self.ordering_query_param)
+        if ordering is None:
+            return super().get_ordering(request, queryset, view)
+        if ordering not in self.orderings:
+            raise ValidationError({
+                self.ordering_query_param:
+                    f'Must be one of {", ".join(self.orderings)}'
+            })
+
+        return self.orderings[ordering]
+
+
+class TypeaheadPagination(BasePagination):
+    """Return only the best few matches of a typeahead query"""
+    limit_query_param = 'limit'
+    default_limit = 10
+    max_limit = 50
+
+    def paginate_queryset(self, queryset, request, view=None):
+        try:
+            limit = int(request.query_params.get(
+                self.limit_query_param,
+                self.default_limit
+            ))
+        except ValueError:
+            raise ValidationError({
+                self.limit_query_param: 'A valid integer is required.'
+            })
+        limit = max(1, min(limit, self.max_limit))
+
+        return list(queryset[:limit])
+
+    def get_paginated_response(self, data):
+        return Response({'results': data})
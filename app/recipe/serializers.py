@@ -1,44 +1,171 @@
 from pyexpat import model
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
-from core.models import Tag, Ingredient, Recipe
+from rest_framework.relations import MANY_RELATION_KWARGS
+from django.conf import settings
+from core.models import Tag, Ingredient, Recipe, RecipeImageUpload
+from recipe.images import image_urls
+
+
+class BatchManyRelatedField(serializers.ManyRelatedField):
+    """Many related field resolving all submitted pks in one query"""
+    default_error_messages = {
+        'does_not_exist': 'Invalid pks {pk_values} - objects do not exist.',
+        'incorrect_type': 'Incorrect type. Expected pk value, '
+                          'received {data_type}.',
+    }
+
+    def to_pks(self, data):
+        """Return the submitted pks converted to the model's pk type"""
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+
+        pk_field = self.child_relation.queryset.model._meta.pk
+        pks = []
+        for item in data:
+            if isinstance(item, bool):
+                self.fail('incorrect_type', data_type=type(item).__name__)
+            try:
+                pks.append(pk_field.to_python(item))
+            except DjangoValidationError:
+                self.fail('incorrect_type', data_type=type(item).__name__)
+
+        return pks
+
+    def to_representation(self, iterable):
+        # Listed by pk, as the lean recipe rows list the related ids
+        return super().to_representation(
+            sorted(iterable, key=lambda value: value.pk)
+        )
+
+    def resolve(self, pks):
+        """Return the objects for pks keyed by pk"""
+        return self.child_relation.get_queryset().in_bulk(set(pks))
+
+    def to_internal_value(self, data):
+        pks = self.to_pks(data)
+        if not self.allow_empty and len(pks) == 0:
+            self.fail('empty')
+
+        # A list serializer may already have resolved the pks of every item
+        resolved = getattr(self.root, 'resolved_related', None)
+        if resolved is not None and self.field_name in resolved:
+            objects = resolved[self.field_name]
+        else:
+            objects = self.resolve(pks)
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in objects]
+        if missing:
+            self.fail(
+                'does_not_exist',
+                pk_values=', '.join(str(pk) for pk in missing)
+            )
+
+        return [objects[pk] for pk in pks]
+
+
+class BatchListSerializer(serializers.ListSerializer):
+    """List serializer resolving the related pks of all items at once
+
+    Every batch related field of the child gets one query for the pks
+    submitted across the list, instead of one query per item.
+    """
+
+    def to_internal_value(self, data):
+        self.resolved_related = {}
+        if isinstance(data, list):
+            self.resolved_related = self.resolve_related(data)
+
+        return super().to_internal_value(data)
+
+    def resolve_related(self, data):
+        """Return the related objects of data keyed by field and pk"""
+        resolved = {}
+        for name, field in self.child.fields.items():
+            if field.read_only or not isinstance(field, BatchManyRelatedField):
+                continue
+            pks = set()
+            for item in data:
+                if not isinstance(item, dict) or name not in item:
+                    continue
+                try:
+                    pks.update(field.to_pks(item[name]))
+                except serializers.ValidationError:
+                    # Reported when the item itself is validated
+                    continue
+            resolved[name] = field.resolve(pks) if pks else {}
+
+        return resolved
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field limited to objects of the requesting user"""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+
+        return BatchManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is None:
+            return queryset.none()
+
+        return queryset.filter(user=request.user)
 
 
 class TagSerializer(serializers.ModelSerializer):
     """Serializer for the tag objects"""
+    user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
     class Meta:
         model = Tag
-        fields = ('id', 'name')
-        read_only_fields = ('id',)
+        fields = ('id', 'name', 'recipe_count', 'user')
+        read_only_fields = ('id', 'recipe_count')
 
 
 
 class IngredientSerializer(serializers.ModelSerializer):
     """Serializer for the Ingredient objects"""
+    user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
     class Meta:
         model = Ingredient
-        fields = ('id', 'name')
-        read_only_fields = ('id',)
+        fields = ('id', 'name', 'recipe_count', 'user')
+        read_only_fields = ('id', 'recipe_count')
 
 
 class RecipeSerializer(serializers.ModelSerializer):
     """Serializer for the Recipe objects"""
 
-    ingredient = serializers.PrimaryKeyRelatedField(
+    ingredient = UserPrimaryKeyRelatedField(
         many=True,
         queryset = Ingredient.objects.all()
     )
-    tag = serializers.PrimaryKeyRelatedField(
+    tag = UserPrimaryKeyRelatedField(
         many=True,
         queryset = Tag.objects.all()
     )
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'title', 'ingredient', 'tag', 'time_minutes', 'price', 'link')
+        fields = (
+            'id', 'title', 'ingredient', 'tag', 'time_minutes', 'price',
+            'link', 'image_status', 'images',
+        )
 
-        read_only_fields = ('id',)
+        read_only_fields = ('id', 'image_status')
+        list_serializer_class = BatchListSerializer
+
+
+    def get_images(self, obj):
+        """Return the URLs of the recipe image by size and format"""
+        return image_urls(obj, self.context.get('request'))
 
 
 class RecipeDetailsSerializer(RecipeSerializer):
@@ -48,8 +175,37 @@ class RecipeDetailsSerializer(RecipeSerializer):
 
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading imgage to recipe"""
+    # Decoding is left to the image workers, so only a file is required here
+    image = serializers.FileField()
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
-        read_only_fields = ('id',)
\ No newline at end of file
+        fields = ('id', 'image', 'image_status', 'images')
+        read_only_fields = ('id', 'image_status')
+
+    def get_images(self, obj):
+        """Return the URLs of the recipe image by size and format"""
+        return image_urls(obj, self.context.get('request'))
+
+
+class RecipeImageUploadSerializer(serializers.ModelSerializer):
+    """Serializer for chunked recipe image uploads"""
+
+    class Meta:
+        model = RecipeImageUpload
+        fields = ('id', 'size', 'offset', 'checksum')
+        read_only_fields = ('id', 'offset')
+        extra_kwargs = {'checksum': {'write_only': True}}
+
+    def validate_size(self, value):
+        """Reject uploads over the size limit before any bytes are sent"""
+        if value <= 0:
+            raise serializers.ValidationError('Size must be positive.')
+        if value > settings.IMAGE_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f'Ensure the image is at most '
+                f'{settings.IMAGE_UPLOAD_MAX_SIZE} bytes.'
+            )
+
+        return value
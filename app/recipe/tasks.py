@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from core.models import Recipe
+from recipe.images import process_recipe_image, stage_upload
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Return the shared image worker pool, starting it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned workers set Django up from scratch instead of sharing
+            # the parent's database connections through fork
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_PROCESSING_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup
+            )
+
+    return _executor
+
+
+def run_image_job(recipe_id):
+    """Process a recipe image inside a worker process"""
+    try:
+        process_recipe_image(recipe_id)
+    finally:
+        close_old_connections()
+
+
+def enqueue_image_processing(recipe_id):
+    """Hand a pending recipe image to the configured backend
+
+    Pending recipes double as a database backed queue: jobs lost with a
+    worker pool are picked up again by the process_images command.
+    """
+    if settings.IMAGE_PROCESSING_BACKEND == 'sync':
+        process_recipe_image(recipe_id)
+        return
+
+    transaction.on_commit(
+        lambda: _get_executor().submit(run_image_job, recipe_id)
+    )
+
+
+def queue_recipe_image(recipe, uploaded):
+    """Stage an uploaded image for a recipe and queue it for processing"""
+    queue_staged_image(recipe, stage_upload(uploaded))
+
+
+def queue_staged_image(recipe, path):
+    """Queue an image already in the staging area for a recipe"""
+    previous = recipe.image_staging
+    recipe.image_staging = path
+    recipe.image_status = Recipe.IMAGE_PENDING
+    recipe.save(update_fields=['image_status', 'image_staging'])
+    if previous and os.path.exists(previous):
+        os.remove(previous)
+
+    enqueue_image_processing(recipe.id)
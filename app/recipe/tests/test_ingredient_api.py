@@ -49,7 +49,7 @@ class PublicIngredientApisTests(TestCase):
             ingredients = Ingredient.objects.all().order_by('-name')
             serializer = IngredientSerializer(ingredients, many=True)
             self.assertEqual(res.status_code, status.HTTP_200_OK)
-            self.assertEqual(res.data, serializer.data)
+            self.assertEqual(res.data['results'], serializer.data)
 
         
         def test_ingredients_limited_to_the_user(self):
@@ -65,8 +65,8 @@ class PublicIngredientApisTests(TestCase):
 
             res = self.client.get(INGREDIENT_URL)
             self.assertEqual(res.status_code, status.HTTP_200_OK)
-            self.assertEqual(len(res.data), 1)
-            self.assertEqual(res.data[0]['name'], ingredient.name)
+            self.assertEqual(len(res.data['results']), 1)
+            self.assertEqual(res.data['results'][0]['name'], ingredient.name)
 
         
         def test_create_ingredient_successful(self):
@@ -110,10 +110,11 @@ class PublicIngredientApisTests(TestCase):
 
             res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
 
+            ingredient1.refresh_from_db()
             serializer1 = IngredientSerializer(ingredient1)
             serializer2 = IngredientSerializer(ingredient2)
-            self.assertIn(serializer1.data, res.data)
-            self.assertNotIn(serializer2.data, res.data)
+            self.assertIn(serializer1.data, res.data['results'])
+            self.assertNotIn(serializer2.data, res.data['results'])
 
         def test_retrieve_ingredient_assigned_unique(self):
             """Test filtering ingredients by assigned returns unique items"""
@@ -136,7 +137,7 @@ class PublicIngredientApisTests(TestCase):
 
             res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
 
-            self.assertEqual(len(res.data), 1)
+            self.assertEqual(len(res.data['results']), 1)
         
 
 
@@ -158,8 +159,8 @@ class PublicIngredientApisTests(TestCase):
         #     serializer1 = IngredientSerializer(ingredient1)
         #     serializer2 = IngredientSerializer(ingredient2)
 
-        #     self.assertIn(serializer1.data, res.data)
-        #     self.assertNotIn(serializer2.data, res.data)
+        #     self.assertIn(serializer1.data, res.data['results'])
+        #     self.assertNotIn(serializer2.data, res.data['results'])
 
 
         # def test_retrieve_ingredients_assigned_unique(self):
@@ -186,7 +187,7 @@ class PublicIngredientApisTests(TestCase):
         #     recipe2.ingredient.add(ingredient)
 
         #     res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
-        #     self.assertEqual(len(res.data), 1)
+        #     self.assertEqual(len(res.data['results']), 1)
 
 
 
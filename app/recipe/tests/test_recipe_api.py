@@ -1,18 +1,39 @@
+import hashlib
+import io
+import json
 import tempfile
 import os
+from datetime import timedelta
+from decimal import Decimal
 from PIL import Image
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.viewsets import GenericViewSet
 
-from core.models import Recipe, Tag, Ingredient
+from core.instrumentation import cache_stats
+from core.models import Recipe, RecipeImageUpload, Tag, Ingredient
 
-from recipe.serializers import RecipeSerializer, RecipeDetailsSerializer
+from recipe import uploads
+from recipe.export import export_recipes
+from recipe.listing import ATTR_LIST_FIELDS, LeanListMixin, recipe_rows, \
+    serialize_attr_rows, serialize_recipe_rows
+from recipe.serializers import RecipeSerializer, RecipeDetailsSerializer, \
+    TagSerializer
 
 RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+EXPORT_URL = reverse('recipe:recipe-export')
 
 
 def image_upload_url(recipe_id):
@@ -20,6 +41,19 @@ def image_upload_url(recipe_id):
     return reverse('recipe:recipe-upload-image', args=[recipe_id])
 
 
+def image_upload_start_url(recipe_id):
+    """Return URL for starting a chunked recipe image upload"""
+    return reverse('recipe:recipe-start-image-upload', args=[recipe_id])
+
+
+def image_upload_chunk_url(recipe_id, upload_id):
+    """Return URL for sending chunks of a recipe image upload"""
+    return reverse(
+        'recipe:recipe-image-upload-chunk',
+        args=[recipe_id, upload_id]
+    )
+
+
 def detail_url(recipe_id):
     """Return recipe details url"""
     return reverse('recipe:recipe-detail', args=[recipe_id])
@@ -85,7 +119,7 @@ class PrivateRecipeTests(TestCase):
         recipes = Recipe.objects.all().order_by('-id')
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipes_limited_to_user(self):
         """Test retrieving recipes for user"""
@@ -101,8 +135,8 @@ class PrivateRecipeTests(TestCase):
         recipes = Recipe.objects.filter(user=self.user)
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
 
     
     def test_view_recipe_detail(self):
@@ -175,6 +209,65 @@ class PrivateRecipeTests(TestCase):
         self.assertIn(ingredient2, ingredient)
 
 
+    def test_create_recipe_with_other_users_tag(self):
+        """Test that tags of other users cannot be assigned"""
+        user2 = get_user_model().objects.create_user(
+            'other@khalti.com',
+            'password123'
+        )
+        tag = sample_tag(user=user2)
+        payload = {
+            'title': 'Borrowed tag',
+            'tag': [tag.id],
+            'time_minutes': 10,
+            'price': 5.00
+        }
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(tag.id), res.data['tag'][0])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_create_recipe_missing_ingredients_reported_together(self):
+        """Test that every missing ingredient is reported in one error"""
+        ingredient = sample_ingredient(user=self.user)
+        payload = {
+            'title': 'Missing ingredients',
+            'ingredient': [ingredient.id, 998, 999],
+            'time_minutes': 10,
+            'price': 5.00
+        }
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['ingredient']), 1)
+        self.assertIn('998, 999', res.data['ingredient'][0])
+
+    def test_create_recipe_ingredient_queries_constant(self):
+        """Test validating ingredients costs the same for any number"""
+        ingredients = [
+            sample_ingredient(user=self.user, name=f'Ingredient {i}')
+            for i in range(40)
+        ]
+
+        def count_queries(ingredient_ids):
+            payload = {
+                'title': 'Many ingredients',
+                'ingredient': ingredient_ids,
+                'time_minutes': 10,
+                'price': 5.00
+            }
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(RECIPES_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+            return len(ctx.captured_queries)
+
+        self.assertEqual(
+            count_queries([ingredients[0].id]),
+            count_queries([ingredient.id for ingredient in ingredients])
+        )
+
     def test_partial_update_recipe(self):
         """Test updating a recipe with patch"""
         recipe = sample_recipe(user=self.user)
@@ -213,6 +306,737 @@ class PrivateRecipeTests(TestCase):
         self.assertEqual(len(tag), 0)
 
 
+class RecipeBulkTests(TestCase):
+    """Test creating and updating recipes in bulk"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@khalti.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create(self):
+        """Test creating several recipes with tags and ingredients"""
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        payload = [
+            {
+                'title': f'Recipe {i}',
+                'time_minutes': 10,
+                'price': '5.00',
+                'tag': [tag.id],
+                'ingredient': [ingredient.id, ingredient.id],
+            }
+            for i in range(3)
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [recipe['title'] for recipe in res.data],
+            ['Recipe 0', 'Recipe 1', 'Recipe 2']
+        )
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 3)
+        for recipe in recipes:
+            self.assertEqual(list(recipe.tag.all()), [tag])
+            self.assertEqual(list(recipe.ingredient.all()), [ingredient])
+            self.assertEqual(recipe.tag_ids, [tag.id])
+            self.assertEqual(recipe.ingredient_ids, [ingredient.id])
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 3)
+
+    def test_bulk_create_resolves_related_once(self):
+        """Test that related ids are looked up once for the whole list"""
+        tags = [sample_tag(user=self.user, name=f'Tag {i}') for i in range(3)]
+        ingredient = sample_ingredient(user=self.user)
+        payload = [
+            {
+                'title': f'Recipe {i}',
+                'time_minutes': 10,
+                'price': '5.00',
+                'tag': [tags[i % 3].id],
+                'ingredient': [ingredient.id],
+            }
+            for i in range(6)
+        ]
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        sqls = [query['sql'] for query in ctx.captured_queries]
+        lookups = [
+            sql for sql in sqls
+            if ' IN (' in sql and 'JOIN' not in sql and (
+                'FROM "core_tag"' in sql or 'FROM "core_ingredient"' in sql
+            )
+        ]
+        self.assertEqual(len(lookups), 2)
+        bumps = [sql for sql in sqls if sql.startswith('UPDATE "core_user"')]
+        self.assertEqual(len(bumps), 1)
+
+    def test_bulk_create_invalid_item(self):
+        """Test that one invalid item rejects the whole request"""
+        payload = [
+            {
+                'title': 'Good',
+                'time_minutes': 10,
+                'price': '5.00',
+                'tag': [],
+                'ingredient': [],
+            },
+            {'title': 'Bad', 'price': '5.00', 'tag': [], 'ingredient': []},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('time_minutes', res.data[1])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_requires_list(self):
+        """Test that the bulk endpoint only accepts a list"""
+        res = self.client.post(BULK_URL, {'title': 'One'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_partial_update(self):
+        """Test patching several recipes at once"""
+        recipe1 = sample_recipe(user=self.user, title='One')
+        recipe2 = sample_recipe(user=self.user, title='Two')
+        recipe2.tag.add(sample_tag(user=self.user))
+        new_tag = sample_tag(user=self.user, name='Curry')
+        payload = [
+            {'id': recipe1.id, 'title': 'First', 'price': '7.50'},
+            {'id': recipe2.id, 'tag': [new_tag.id]},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe1.refresh_from_db()
+        recipe2.refresh_from_db()
+        self.assertEqual(recipe1.title, 'First')
+        self.assertEqual(str(recipe1.price), '7.50')
+        self.assertEqual(recipe1.time_minutes, 10)
+        self.assertEqual(recipe2.title, 'Two')
+        self.assertEqual(list(recipe2.tag.all()), [new_tag])
+        self.assertEqual(recipe2.tag_ids, [new_tag.id])
+        self.assertEqual(
+            list(Tag.objects.order_by('id').values_list(
+                'recipe_count', flat=True
+            )),
+            [0, 1]
+        )
+
+    def test_bulk_update_other_users_recipe(self):
+        """Test that recipes of other users cannot be bulk updated"""
+        user2 = get_user_model().objects.create_user(
+            'other@khalti.com',
+            'password123'
+        )
+        recipe = sample_recipe(user=user2, title='Theirs')
+        own = sample_recipe(user=self.user, title='Mine')
+        payload = [
+            {'id': own.id, 'title': 'Changed'},
+            {'id': recipe.id, 'title': 'Changed'},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('id', res.data[1])
+        own.refresh_from_db()
+        self.assertEqual(own.title, 'Mine')
+
+
+class RecipeFilterTests(TestCase):
+    """Test filtering recipes by tags and ingredients"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@khalti.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = sample_tag(user=self.user, name='Vegan')
+        self.dessert = sample_tag(user=self.user, name='Dessert')
+        self.both = sample_recipe(user=self.user, title='Vegan cheesecake')
+        self.both.tag.add(self.vegan, self.dessert)
+        self.vegan_only = sample_recipe(user=self.user, title='Curry')
+        self.vegan_only.tag.add(self.vegan)
+        self.untagged = sample_recipe(user=self.user, title='Fish and chips')
+
+    def _result_ids(self, params):
+        res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return [recipe['id'] for recipe in res.data['results']]
+
+    def test_filter_by_tags_any(self):
+        """Test recipes matching several tags are returned once"""
+        ids = self._result_ids({'tag': f'{self.vegan.id},{self.dessert.id}'})
+
+        self.assertEqual(ids, [self.vegan_only.id, self.both.id])
+
+    def test_filter_by_tags_all(self):
+        """Test match=all returns recipes having every tag"""
+        ids = self._result_ids({
+            'tag': f'{self.vegan.id},{self.dessert.id},{self.vegan.id}',
+            'match': 'all',
+        })
+
+        self.assertEqual(ids, [self.both.id])
+
+    def test_filter_by_tags_and_ingredients(self):
+        """Test tag and ingredient filters are combined"""
+        ingredient = sample_ingredient(user=self.user, name='Cashew')
+        self.vegan_only.ingredient.add(ingredient)
+
+        ids = self._result_ids({
+            'tag': f'{self.vegan.id}',
+            'ingredient': f'{ingredient.id}',
+        })
+
+        self.assertEqual(ids, [self.vegan_only.id])
+
+    def test_invalid_match(self):
+        """Test an unknown match mode is rejected"""
+        res = self.client.get(RECIPES_URL, {'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeSearchTests(TestCase):
+    """Test searching recipes by title, tag and ingredient names"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@khalti.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _search(self, text, **params):
+        res = self.client.get(RECIPES_URL, {'search': text, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return res
+
+    def test_search_ranks_title_matches_first(self):
+        """Test that recipes match on title, tags and ingredients"""
+        titled = sample_recipe(user=self.user, title='Curry noodles')
+        tagged = sample_recipe(user=self.user, title='Dal')
+        tagged.tag.add(sample_tag(user=self.user, name='curry'))
+        with_ingredient = sample_recipe(user=self.user, title='Rice')
+        with_ingredient.ingredient.add(
+            sample_ingredient(user=self.user, name='curry leaves')
+        )
+        sample_recipe(user=self.user, title='Pancake')
+
+        res = self._search('curry')
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [titled.id, with_ingredient.id, tagged.id])
+
+    def test_search_limited_to_user(self):
+        """Test that search only returns the user's recipes"""
+        user2 = get_user_model().objects.create_user(
+            'other@khalti.com',
+            'password123'
+        )
+        sample_recipe(user=user2, title='Curry')
+
+        res = self._search('curry')
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_search_paginates_by_rank(self):
+        """Test that search results page in rank order"""
+        tagged = sample_recipe(user=self.user, title='Dal')
+        tagged.tag.add(sample_tag(user=self.user, name='curry'))
+        titled = [
+            sample_recipe(user=self.user, title=f'Curry {i}') for i in range(3)
+        ]
+
+        res = self._search('curry', page_size=2)
+        ids = [recipe['id'] for recipe in res.data['results']]
+        res = self.client.get(res.data['next'])
+        ids += [recipe['id'] for recipe in res.data['results']]
+
+        self.assertEqual(
+            ids,
+            [recipe.id for recipe in reversed(titled)] + [tagged.id]
+        )
+
+
+class RecipePaginationTests(TestCase):
+    """Test cursor pagination of the recipe list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@khalti.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_pages_follow_cursor(self):
+        """Test walking every page returns each recipe once, newest first"""
+        recipes = [sample_recipe(user=self.user) for _ in range(5)]
+
+        ids = []
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data['results']), 2)
+            ids.extend(recipe['id'] for recipe in res.data['results'])
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+
+    def test_page_size_capped(self):
+        """Test that the requested page size is capped"""
+        sample_recipe(user=self.user)
+
+        res = self.client.get(RECIPES_URL, {'page_size': 100000})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertIsNone(res.data['next'])
+
+
+class RecipeQueryCountTests(TestCase):
+    """Test that recipe responses cost a constant number of queries"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@khalti.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _create_recipes(self, count):
+        """Create recipes with a tag and an ingredient each"""
+        start = Recipe.objects.count()
+        for i in range(start, start + count):
+            recipe = sample_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tag.add(sample_tag(user=self.user, name=f'Tag {i}'))
+            recipe.ingredient.add(
+                sample_ingredient(user=self.user, name=f'Ingredient {i}')
+            )
+
+    def _count_queries(self, url):
+        """Return the number of queries executed to GET the url"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return len(ctx.captured_queries)
+
+    def test_list_query_count_constant(self):
+        """Test listing recipes does not issue queries per recipe"""
+        self._create_recipes(1)
+        single = self._count_queries(RECIPES_URL)
+
+        self._create_recipes(10)
+        self.assertEqual(self._count_queries(RECIPES_URL), single)
+
+    def test_detail_query_count(self):
+        """Test retrieving a recipe prefetches tags and ingredients"""
+        recipe = sample_recipe(user=self.user)
+        for i in range(5):
+            recipe.tag.add(sample_tag(user=self.user, name=f'Tag {i}'))
+            recipe.ingredient.add(
+                sample_ingredient(user=self.user, name=f'Ingredient {i}')
+            )
+
+        # The collection version, the recipe and one query per relation
+        with self.assertNumQueries(4):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(len(res.data['tag']), 5)
+        self.assertEqual(len(res.data['ingredient']), 5)
+
+
+class RecipeConditionalGetTests(TestCase):
+    """Test that unchanged recipe listings are answered with 304"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@khalti.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+
+    def _assert_modified(self, etag):
+        """Assert the listing changed and return its new ETag"""
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+        return res['ETag']
+
+    def test_create_bumps_versions_once(self):
+        """Test that creating a recipe updates the user's versions once"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        payload = {
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': '9.00',
+            'tag': [sample_tag(user=self.user).id],
+            'ingredient': [sample_ingredient(user=self.user).id],
+        }
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        bumps = [
+            query for query in ctx.captured_queries
+            if query['sql'].startswith('UPDATE "core_user"')
+        ]
+        self.assertEqual(len(bumps), 1)
+        self._assert_modified(etag)
+
+    def test_not_modified_skips_list_query(self):
+        """Test that a matching ETag returns 304 with one query"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertFalse(res.content)
+
+    def test_etag_depends_on_query(self):
+        """Test that filtered listings have their own ETag"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'search': 'steak'},
+            HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_changes_modify_listing(self):
+        """Test that recipe writes and link changes bump the version"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        self.client.patch(detail_url(self.recipe.id), {'title': 'Changed'})
+        etag = self._assert_modified(etag)
+
+        self.recipe.tag.add(sample_tag(user=self.user))
+        etag = self._assert_modified(etag)
+
+        self.client.post(
+            BULK_URL,
+            [{'title': 'Bulk', 'time_minutes': 1, 'price': '1.00',
+              'tag': [], 'ingredient': []}],
+            format='json'
+        )
+        etag = self._assert_modified(etag)
+
+        self.client.delete(detail_url(self.recipe.id))
+        self._assert_modified(etag)
+
+    def test_other_users_changes_ignored(self):
+        """Test that changes by another user keep the listing unmodified"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        user2 = get_user_model().objects.create_user(
+            'other@khalti.com',
+            'password'
+        )
+        sample_recipe(user=user2)
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_user_save_keeps_versions(self):
+        """Test that saving a stale user does not roll the version back"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        stale = get_user_model().objects.get(id=self.user.id)
+        sample_recipe(user=self.user, title='New')
+        stale.name = 'Renamed'
+        stale.save()
+
+        self._assert_modified(etag)
+
+
+class RecipeResponseCacheTests(TestCase):
+    """Test that repeated recipe reads are served from the cache"""
+
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE].clear()
+        cache_stats.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@khalti.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+
+    def test_list_cached(self):
+        """Test that a repeated list only looks up the collection version"""
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(RECIPES_URL)
+
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.data, res.data)
+        stats = cache_stats.snapshot()['recipe-list']
+        self.assertEqual((stats['hit'], stats['miss']), (1, 1))
+
+    def test_params_normalized(self):
+        """Test that equivalent filters share a cache entry"""
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Spicy')
+        self.recipe.tag.add(tag1, tag2)
+
+        self.client.get(RECIPES_URL, {'tag': f'{tag2.id},{tag1.id}'})
+        res = self.client.get(RECIPES_URL, {'tag': f'{tag1.id},{tag2.id}'})
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+    def test_unknown_params_bypass_cache(self):
+        """Test that requests with unexpected parameters are not cached"""
+        res = self.client.get(RECIPES_URL, {'utm_source': 'mail'})
+
+        self.assertNotIn('X-Cache', res)
+        self.assertEqual(cache_stats.snapshot()['recipe-list']['bypass'], 1)
+
+    def test_writes_invalidate(self):
+        """Test that a write makes the next read miss the cache"""
+        self.client.get(RECIPES_URL)
+        self.client.get(detail_url(self.recipe.id))
+        tag = sample_tag(user=self.user, name='Vegan')
+        self.recipe.tag.add(tag)
+        tag.name = 'Vegetarian'
+        tag.save()
+
+        res = self.client.get(RECIPES_URL)
+        detail = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'][0]['tag'], [tag.id])
+        self.assertEqual(detail['X-Cache'], 'MISS')
+        self.assertEqual(detail.data['tag'][0]['name'], 'Vegetarian')
+
+    def test_users_isolated(self):
+        """Test that cached responses are never shared between users"""
+        self.client.get(RECIPES_URL)
+        user2 = get_user_model().objects.create_user(
+            'other@khalti.com',
+            'password'
+        )
+        self.client.force_authenticate(user2)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'], [])
+
+    @override_settings(RESPONSE_CACHE='')
+    def test_disabled(self):
+        """Test that an empty RESPONSE_CACHE turns caching off"""
+        self.client.get(RECIPES_URL)
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('X-Cache', res)
+
+
+class RecipeLeanListTests(TestCase):
+    """Test that lean list rows render exactly like the serializers"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@khalti.com',
+            'password'
+        )
+        self.request = APIRequestFactory().get(RECIPES_URL)
+
+    def _render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_recipe_rows_match_serializer(self):
+        """Test that recipe rows give byte identical JSON"""
+        tags = [sample_tag(user=self.user, name=f'Tag {i}') for i in range(3)]
+        ingredient = sample_ingredient(user=self.user)
+        recipe = sample_recipe(user=self.user, price=Decimal('5.5'))
+        recipe.tag.add(*tags)
+        recipe.ingredient.add(ingredient)
+        sample_recipe(user=self.user, title='Plain', link='http://x.com')
+        Recipe.objects.filter(id=recipe.id).update(
+            image='uploads/recipe/test.jpg',
+            image_status=Recipe.IMAGE_READY
+        )
+        queryset = Recipe.objects.order_by('-id')
+
+        lean = serialize_recipe_rows(recipe_rows(queryset), self.request)
+        serializer = RecipeSerializer(
+            queryset.prefetch_related('tag', 'ingredient'),
+            many=True,
+            context={'request': self.request}
+        )
+
+        self.assertEqual(self._render(lean), self._render(serializer.data))
+        self.assertIsNotNone(lean[1]['images'])
+
+    def test_serializer_lists_related_ids_in_order(self):
+        """Test that related ids are listed by id like recipe rows"""
+        tags = [sample_tag(user=self.user, name=f'Tag {i}') for i in range(3)]
+        field = RecipeSerializer().fields['tag']
+
+        self.assertEqual(
+            field.to_representation(list(reversed(tags))),
+            [tag.id for tag in tags]
+        )
+
+    @override_settings(RECIPE_DENORMALIZED_IDS=False)
+    def test_recipe_rows_from_through_tables(self):
+        """Test that rows read the through tables when asked to"""
+        tag = sample_tag(user=self.user)
+        recipe = sample_recipe(user=self.user)
+        recipe.tag.add(tag)
+        Recipe.objects.update(tag_ids=[])
+
+        rows = serialize_recipe_rows(
+            recipe_rows(Recipe.objects.all()),
+            self.request
+        )
+
+        self.assertEqual(rows[0]['tag'], [tag.id])
+
+    def test_recipe_rows_without_joins(self):
+        """Test that rows take related ids from the recipe row alone"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tag.add(sample_tag(user=self.user))
+
+        with CaptureQueriesContext(connection) as queries:
+            serialize_recipe_rows(
+                recipe_rows(Recipe.objects.all()),
+                self.request
+            )
+
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('core_recipe_tag', queries[0]['sql'])
+
+    def test_attr_rows_match_serializer(self):
+        """Test that tag rows give byte identical JSON"""
+        sample_tag(user=self.user, name='Vegan')
+        sample_tag(user=self.user, name='Dessert')
+        queryset = Tag.objects.order_by('-name', 'id')
+
+        lean = serialize_attr_rows(queryset.values(*ATTR_LIST_FIELDS))
+        serializer = TagSerializer(queryset, many=True)
+
+        self.assertEqual(self._render(lean), self._render(serializer.data))
+
+    def test_default_rows_match_serializer(self):
+        """Test that the mixin's own rows give byte identical JSON"""
+        sample_tag(user=self.user, name='Vegan')
+        sample_tag(user=self.user, name='Dessert')
+        expected = TagSerializer(Tag.objects.order_by('id'), many=True).data
+
+        for fields in (None, ATTR_LIST_FIELDS):
+            class TagList(LeanListMixin, GenericViewSet):
+                queryset = Tag.objects.order_by('id')
+                serializer_class = TagSerializer
+                pagination_class = None
+                list_fields = fields
+
+            res = TagList.as_view({'get': 'list'})(self.request)
+
+            self.assertEqual(self._render(res.data), self._render(expected))
+
+
+class RecipeExportTests(TestCase):
+    """Test the streaming NDJSON export of recipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@khalti.com',
+            'password'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _lines(self, content):
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_export_recipes(self):
+        """Test that every recipe of the user is streamed with details"""
+        recipe = sample_recipe(user=self.user, price=Decimal('5.5'))
+        recipe.tag.add(sample_tag(user=self.user))
+        recipe.ingredient.add(sample_ingredient(user=self.user))
+        sample_recipe(user=self.user, title='Plain')
+        other = get_user_model().objects.create_user(
+            'other@khalti.com',
+            'password'
+        )
+        sample_recipe(user=other, title='Not mine')
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(res, StreamingHttpResponse)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = self._lines(b''.join(res.streaming_content))
+        serializer = RecipeDetailsSerializer(
+            Recipe.objects.filter(user=self.user).order_by('-id'),
+            many=True,
+            context={'request': res.wsgi_request}
+        )
+        self.assertEqual(lines, json.loads(json.dumps(serializer.data)))
+
+    def test_export_filtered(self):
+        """Test that the export accepts the list filters"""
+        tag = sample_tag(user=self.user)
+        recipe = sample_recipe(user=self.user, title='Tagged')
+        recipe.tag.add(tag)
+        sample_recipe(user=self.user, title='Untagged')
+
+        res = self.client.get(EXPORT_URL, {'tag': tag.id})
+
+        lines = self._lines(b''.join(res.streaming_content))
+        self.assertEqual([line['title'] for line in lines], ['Tagged'])
+
+    def test_export_queries_per_chunk(self):
+        """Test that related objects are fetched once per chunk"""
+        for i in range(5):
+            recipe = sample_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tag.add(sample_tag(user=self.user, name=f'Tag {i}'))
+        queryset = Recipe.objects.filter(user=self.user).order_by('-id')
+
+        with CaptureQueriesContext(connection) as queries:
+            chunks = list(export_recipes(queryset, chunk_size=2))
+
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(len(queries), 1 + 3 * 2)
+        self.assertEqual(len(self._lines(b''.join(chunks))), 5)
+
+
 class RecipeImageUploadTests(TestCase):
 
     def setUp(self):
@@ -223,10 +1047,292 @@ class RecipeImageUploadTests(TestCase):
         )
         self.client.force_authenticate(self.user)
         self.recipe = sample_recipe(user=self.user)
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root.name,
+            IMAGE_STAGING_ROOT=os.path.join(self.media_root.name, 'staging'),
+            IMAGE_PROCESSING_BACKEND='sync',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
 
     def tearDown(self):
+        self.recipe.refresh_from_db()
         self.recipe.image.delete()
 
+    def _upload(self, img, **save_kwargs):
+        """Upload a Pillow image to the recipe"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.png') as ntf:
+            img.save(ntf, **save_kwargs)
+            ntf.seek(0)
+            return self.client.post(url, {'image': ntf}, format='multipart')
+
+    def test_upload_image_processed(self):
+        """Test that an uploaded image is re-encoded without metadata"""
+        exif = b'Exif\x00\x00II*\x00\x08\x00\x00\x00\x00\x00'
+        res = self._upload(
+            Image.new('RGB', (10, 10)),
+            format='JPEG',
+            exif=exif
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertEqual(self.recipe.image_staging, '')
+        self.assertTrue(self.recipe.image.path.endswith('.jpg'))
+        with Image.open(self.recipe.image.path) as img:
+            self.assertEqual(img.format, 'JPEG')
+            self.assertNotIn('exif', img.info)
+        self.assertEqual(
+            os.listdir(os.path.join(self.media_root.name, 'staging')),
+            []
+        )
+
+    def test_upload_image_bumps_versions_once(self):
+        """Test that an upload processed inline updates versions once"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self._upload(Image.new('RGB', (10, 10)), format='PNG')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        bumps = [
+            query for query in ctx.captured_queries
+            if query['sql'].startswith('UPDATE "core_user"')
+        ]
+        self.assertEqual(len(bumps), 1)
+
+    @override_settings(IMAGE_DERIVATIVE_SIZES={'small': 4, 'medium': 8})
+    def test_upload_image_derivatives(self):
+        """Test that resized copies are stored and exposed by URL"""
+        res = self._upload(Image.new('RGB', (16, 12)), format='PNG')
+
+        self.recipe.refresh_from_db()
+        root = os.path.splitext(self.recipe.image.path)[0]
+        urls = res.data['images']
+        self.assertEqual(set(urls), {'small', 'medium', 'original'})
+        self.assertTrue(urls['original'].endswith(self.recipe.image.name))
+        for size, dimensions in (('small', (4, 3)), ('medium', (8, 6))):
+            self.assertTrue(urls[size]['jpg'].endswith(f'_{size}.jpg'))
+            for ext in urls[size]:
+                with Image.open(f'{root}_{size}.{ext}') as img:
+                    self.assertEqual(img.size, dimensions)
+
+        detail = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(detail.data['images'], urls)
+
+    def test_replacing_image_deletes_derivatives(self):
+        """Test that uploading a new image removes the old files"""
+        self._upload(Image.new('RGB', (10, 10)), format='PNG')
+        self.recipe.refresh_from_db()
+        first = os.path.splitext(self.recipe.image.path)[0]
+
+        self._upload(Image.new('RGB', (10, 10)), format='PNG')
+
+        directory = os.path.dirname(first)
+        name = os.path.basename(first)
+        self.assertFalse(
+            [path for path in os.listdir(directory) if path.startswith(name)]
+        )
+
+    @override_settings(IMAGE_MAX_DIMENSION=20)
+    def test_upload_image_scaled_down(self):
+        """Test that large images are scaled to the maximum dimension"""
+        self._upload(Image.new('RGBA', (80, 40)), format='PNG')
+
+        self.recipe.refresh_from_db()
+        with Image.open(self.recipe.image.path) as img:
+            self.assertEqual(img.size, (20, 10))
+
+    def test_upload_corrupt_image_fails(self):
+        """Test that a file that is not an image is marked as failed"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            ntf.write(b'not an image')
+            ntf.seek(0)
+            res = self.client.post(url, {'image': ntf}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_FAILED)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def _png_bytes(self):
+        """Return the bytes of a small PNG image"""
+        buffer = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(buffer, format='PNG')
+
+        return buffer.getvalue()
+
+    def _send_chunk(self, upload_id, data, start, total, **headers):
+        return self.client.put(
+            image_upload_chunk_url(self.recipe.id, upload_id),
+            data,
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=(
+                f'bytes {start}-{start + len(data) - 1}/{total}'
+            ),
+            **headers
+        )
+
+    def test_chunked_upload(self):
+        """Test that an image sent in chunks is assembled and processed"""
+        content = self._png_bytes()
+        res = self.client.post(
+            image_upload_start_url(self.recipe.id),
+            {
+                'size': len(content),
+                'checksum': hashlib.sha256(content).hexdigest(),
+            }
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        upload_id = res.data['id']
+
+        middle = len(content) // 2
+        first = content[:middle]
+        res = self._send_chunk(
+            upload_id, first, 0, len(content),
+            HTTP_X_CHUNK_CHECKSUM=hashlib.sha256(first).hexdigest()
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['offset'], middle)
+
+        res = self.client.get(
+            image_upload_chunk_url(self.recipe.id, upload_id)
+        )
+        self.assertEqual(res.data['offset'], middle)
+
+        res = self._send_chunk(
+            upload_id, content[middle:], middle, len(content)
+        )
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_READY)
+        self.assertFalse(RecipeImageUpload.objects.exists())
+
+    def test_chunked_upload_wrong_offset(self):
+        """Test that chunks must continue where the upload stopped"""
+        content = self._png_bytes()
+        res = self.client.post(
+            image_upload_start_url(self.recipe.id),
+            {'size': len(content)}
+        )
+
+        res = self._send_chunk(res.data['id'], content[5:], 5, len(content))
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+
+    def test_chunked_upload_stale_offset(self):
+        """Test that a chunk for an offset already written is not written"""
+        content = self._png_bytes()
+        res = self.client.post(
+            image_upload_start_url(self.recipe.id),
+            {'size': len(content)}
+        )
+        upload = RecipeImageUpload.objects.get(id=res.data['id'])
+        self._send_chunk(upload.id, content[:10], 0, len(content))
+
+        with self.assertRaises(uploads.UploadError) as error:
+            uploads.write_chunk(upload, io.BytesIO(b'x' * 10), 0, 10)
+
+        self.assertEqual(error.exception.status_code, status.HTTP_409_CONFLICT)
+        with open(upload.path, 'rb') as staged:
+            self.assertEqual(staged.read(10), content[:10])
+        upload.refresh_from_db()
+        self.assertEqual(upload.offset, 10)
+
+    def test_chunked_upload_claimed(self):
+        """Test that a chunk is refused while another request writes one"""
+        content = self._png_bytes()
+        res = self.client.post(
+            image_upload_start_url(self.recipe.id),
+            {'size': len(content)}
+        )
+        upload = RecipeImageUpload.objects.get(id=res.data['id'])
+        RecipeImageUpload.objects.filter(id=upload.id).update(
+            writing_since=timezone.now()
+        )
+
+        res = self._send_chunk(upload.id, content[:10], 0, len(content))
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(os.path.getsize(upload.path), 0)
+
+        RecipeImageUpload.objects.filter(id=upload.id).update(
+            writing_since=timezone.now() - timedelta(
+                seconds=settings.IMAGE_UPLOAD_WRITE_TIMEOUT + 1
+            )
+        )
+        res = self._send_chunk(upload.id, content[:10], 0, len(content))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        upload.refresh_from_db()
+        self.assertEqual(upload.offset, 10)
+        self.assertIsNone(upload.writing_since)
+
+    def test_chunked_upload_failed_write_releases_claim(self):
+        """Test that a chunk failing its checksum can be sent again"""
+        content = self._png_bytes()
+        res = self.client.post(
+            image_upload_start_url(self.recipe.id),
+            {'size': len(content)}
+        )
+        upload = RecipeImageUpload.objects.get(id=res.data['id'])
+
+        res = self._send_chunk(
+            upload.id, content[:10], 0, len(content),
+            HTTP_X_CHUNK_CHECKSUM='0' * 64
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        upload.refresh_from_db()
+        self.assertEqual(upload.offset, 0)
+        self.assertIsNone(upload.writing_since)
+
+        res = self._send_chunk(upload.id, content[:10], 0, len(content))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_chunked_upload_not_an_image(self):
+        """Test that non image uploads are rejected from the first bytes"""
+        res = self.client.post(
+            image_upload_start_url(self.recipe.id),
+            {'size': 100}
+        )
+
+        res = self._send_chunk(res.data['id'], b'x' * 20, 0, 100)
+
+        self.assertEqual(
+            res.status_code,
+            status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+        self.assertFalse(RecipeImageUpload.objects.exists())
+
+    def test_chunked_upload_bad_checksum(self):
+        """Test that a chunk with a wrong checksum is not accepted"""
+        content = self._png_bytes()
+        res = self.client.post(
+            image_upload_start_url(self.recipe.id),
+            {'size': len(content)}
+        )
+        upload_id = res.data['id']
+
+        res = self._send_chunk(
+            upload_id, content, 0, len(content),
+            HTTP_X_CHUNK_CHECKSUM='0' * 64
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(RecipeImageUpload.objects.get().offset, 0)
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=10)
+    def test_chunked_upload_too_large(self):
+        """Test that oversized uploads are refused before any data"""
+        res = self.client.post(
+            image_upload_start_url(self.recipe.id),
+            {'size': 11}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     # def test_upload_image_to_recipe(self):
     #     """Test uploading an image to recipe"""
     #     url = image_upload_url(self.recipe.id)
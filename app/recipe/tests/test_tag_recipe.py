@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -47,7 +49,7 @@ class PrivateTagsApiTests(TestCase):
         tags = Tag.objects.all().order_by('-name')
         serializer = TagSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_to_user(self):
         """Test that tags returned are for authenticated user"""
@@ -61,8 +63,8 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
 
     
     def test_create_tag_successful(self):
@@ -85,6 +87,23 @@ class PrivateTagsApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+    def test_create_tag_duplicate_name(self):
+        """Test that a user cannot create two tags with the same name"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        user2 = get_user_model().objects.create_user(
+            'other@khalti.com',
+            'testpass'
+        )
+        Tag.objects.create(user=user2, name='Simple')
+
+        res = self.client.post(TAGS_URL, {'name': 'Vegan'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(TAGS_URL, {'name': 'Simple'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('user', res.data)
+
+
     def test_retrieve_tags_assign_to_recipe(self):
         """Test filtering tags by those assign to receipts"""
         tag1 = Tag.objects.create(user= self.user, name="lunch")
@@ -100,11 +119,12 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
+        tag1.refresh_from_db()
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
 
 
     def test_retrieve_tag_assigned_unique(self):
@@ -130,4 +150,135 @@ class PrivateTagsApiTests(TestCase):
         recipe2.tag.add(tag)
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
-        self.assertEqual(len(res.data), 1)
\ No newline at end of file
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_tags_paginated_by_name(self):
+        """Test that tags are paged by name"""
+        for name in ('b', 'a', 'c', 'A'):
+            Tag.objects.create(user=self.user, name=name)
+
+        names = []
+        res = self.client.get(TAGS_URL, {'page_size': 1})
+        while True:
+            names.extend(tag['name'] for tag in res.data['results'])
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(names, ['c', 'b', 'a', 'A'])
+
+    def test_tags_ordered_by_recipe_count(self):
+        """Test that tags can be listed most used first"""
+        tags = [Tag.objects.create(user=self.user, name=name)
+                for name in ('once', 'never', 'twice')]
+        for i in range(2):
+            recipe = Recipe.objects.create(
+                title=f'Recipe {i}',
+                time_minutes=3,
+                price=2,
+                user=self.user
+            )
+            recipe.tag.add(tags[2])
+        recipe.tag.add(tags[0])
+
+        res = self.client.get(TAGS_URL, {'ordering': '-recipe_count'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(tag['name'], tag['recipe_count'])
+             for tag in res.data['results']],
+            [('twice', 2), ('once', 1), ('never', 0)]
+        )
+
+    def test_invalid_ordering(self):
+        """Test that unknown orderings are rejected"""
+        res = self.client.get(TAGS_URL, {'ordering': 'user'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_assigned_only_uses_recipe_count(self):
+        """Test assigned_only filters on the count, not the recipe links"""
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        recipe = Recipe.objects.create(
+            title='pancake',
+            time_minutes=3,
+            price=2,
+            user=self.user
+        )
+        recipe.tag.add(tag)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(len(res.data['results']), 1)
+        sql = ' '.join(query['sql'] for query in ctx.captured_queries)
+        self.assertIn('recipe_count', sql)
+        self.assertNotIn('core_recipe_tag', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+    def test_typeahead_prefix_matches_first(self):
+        """Test that typeahead ranks prefix matches before other matches"""
+        for name in ('Sweet potato', 'Potato', 'Pasta', 'Potato salad'):
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {'q': 'pota'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag['name'] for tag in res.data['results']],
+            ['Potato', 'Potato salad', 'Sweet potato']
+        )
+
+    def test_typeahead_bounded(self):
+        """Test that typeahead returns at most the requested number"""
+        for i in range(5):
+            Tag.objects.create(user=self.user, name=f'Soup {i}')
+        user2 = get_user_model().objects.create_user(
+            'other@khalti.com',
+            'testpass'
+        )
+        Tag.objects.create(user=user2, name='Soup')
+
+        res = self.client.get(TAGS_URL, {'q': 'soup', 'limit': 3})
+
+        self.assertEqual(
+            [tag['name'] for tag in res.data['results']],
+            ['Soup 0', 'Soup 1', 'Soup 2']
+        )
+
+    def test_typeahead_invalid_limit(self):
+        """Test that a non numeric limit is rejected"""
+        res = self.client.get(TAGS_URL, {'q': 'soup', 'limit': 'all'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_not_modified(self):
+        """Test that an unchanged tag listing is answered with 304"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        etag = self.client.get(TAGS_URL)['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=f'W/{etag}')
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_assigning_tag_modifies_listing(self):
+        """Test that linking a tag to a recipe changes the tag listing"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Salad',
+            time_minutes=5,
+            price=3
+        )
+        etag = self.client.get(TAGS_URL, {'assigned_only': 1})['ETag']
+
+        recipe.tag.add(tag)
+        res = self.client.get(
+            TAGS_URL,
+            {'assigned_only': 1},
+            HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
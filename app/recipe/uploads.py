@@ -0,0 +1,170 @@
+import hashlib
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+
+from core.models import RecipeImageUpload
+
+
+READ_SIZE = 64 * 1024
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+IMAGE_SIGNATURES = (
+    b'\xff\xd8\xff',
+    b'\x89PNG\r\n\x1a\n',
+    b'GIF87a',
+    b'GIF89a',
+)
+SIGNATURE_LENGTH = 12
+
+
+class UploadError(Exception):
+    """Raised when a chunk cannot be accepted"""
+
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def is_image_signature(head):
+    """Return whether the first bytes of a file belong to a known image"""
+    if head.startswith(IMAGE_SIGNATURES):
+        return True
+
+    return head[:4] == b'RIFF' and head[8:12] == b'WEBP'
+
+
+def parse_content_range(header, size):
+    """Return the start and length of the chunk described by the header"""
+    match = CONTENT_RANGE.match(header or '')
+    if not match:
+        raise UploadError('Expected a "bytes start-end/total" Content-Range.')
+    start, end, total = (int(value) for value in match.groups())
+    if total != size or end < start or end >= size:
+        raise UploadError(
+            'Content-Range does not fit the upload.',
+            status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+
+    return start, end - start + 1
+
+
+def _read_head(stream, length):
+    """Read enough of the first chunk to recognise the file type"""
+    head = b''
+    while len(head) < min(SIGNATURE_LENGTH, length):
+        data = stream.read(min(SIGNATURE_LENGTH, length) - len(head))
+        if not data:
+            break
+        head += data
+
+    return head
+
+
+def write_chunk(upload, stream, start, length, checksum=''):
+    """Stream a chunk from the request body into the upload file
+
+    Bytes go straight to their offset in the staged file while a SHA-256
+    of the chunk is computed, so nothing is buffered in memory and no
+    reassembly is needed. The first chunk is rejected unless it starts
+    like an image.
+
+    The upload is claimed with a conditional UPDATE before the chunk is
+    streamed, outside any transaction, so a concurrent request for the
+    same upload is refused before it touches the file. The new offset is
+    only written if the claim still holds, and a failed write leaves the
+    offset where it was.
+    """
+    claimed_at = timezone.now()
+    expired = claimed_at - timedelta(
+        seconds=settings.IMAGE_UPLOAD_WRITE_TIMEOUT
+    )
+    claimed = RecipeImageUpload.objects.filter(
+        Q(writing_since__isnull=True) | Q(writing_since__lt=expired),
+        id=upload.id,
+        offset=start
+    ).update(writing_since=claimed_at)
+    if not claimed:
+        offset = RecipeImageUpload.objects.filter(id=upload.id).values_list(
+            'offset', flat=True
+        ).first()
+        if offset is not None and offset != start:
+            raise UploadError(
+                f'Expected a chunk starting at {offset}.',
+                status.HTTP_409_CONFLICT
+            )
+        raise UploadError(
+            'Upload is being written by another request.',
+            status.HTTP_409_CONFLICT
+        )
+
+    claim = RecipeImageUpload.objects.filter(
+        id=upload.id,
+        offset=start,
+        writing_since=claimed_at
+    )
+    try:
+        _write(upload, stream, start, length, checksum)
+    except BaseException:
+        claim.update(writing_since=None)
+        raise
+    if not claim.update(offset=start + length, writing_since=None):
+        raise UploadError(
+            'Upload was taken over by another request.',
+            status.HTTP_409_CONFLICT
+        )
+    upload.offset = start + length
+
+
+def _write(upload, stream, start, length, checksum):
+    """Write a chunk to the staged file, checking its length and digest"""
+    digest = hashlib.sha256()
+    remaining = length
+    with open(upload.path, 'r+b') as staged:
+        staged.seek(start)
+        if start == 0:
+            head = _read_head(stream, length)
+            if not is_image_signature(head):
+                raise UploadError(
+                    'Upload is not a supported image type.',
+                    status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+                )
+            staged.write(head)
+            digest.update(head)
+            remaining -= len(head)
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            staged.write(data)
+            digest.update(data)
+            remaining -= len(data)
+
+    if remaining:
+        raise UploadError('Chunk is shorter than its Content-Range.')
+    if checksum and digest.hexdigest() != checksum.lower():
+        raise UploadError('Chunk checksum does not match.')
+
+
+def verify_upload(upload):
+    """Check the assembled file against the checksum given at creation"""
+    if not upload.checksum:
+        return
+    digest = hashlib.sha256()
+    with open(upload.path, 'rb') as staged:
+        for data in iter(lambda: staged.read(READ_SIZE), b''):
+            digest.update(data)
+    if digest.hexdigest() != upload.checksum.lower():
+        raise UploadError('Upload checksum does not match.')
+
+
+def discard_upload(upload):
+    """Delete an upload and its partial file"""
+    if os.path.exists(upload.path):
+        os.remove(upload.path)
+    upload.delete()
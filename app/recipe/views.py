@@ -1,12 +1,32 @@
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 
-from core.models import Ingredient, Tag, Recipe
+from core import versions
+from core.authentication import CachedTokenAuthentication
+from core.renderers import NDJSONRenderer, ChunkedRenderMixin
+from core.routers import ReplicaReadMixin
+from core.models import Ingredient, Tag, Recipe, RecipeImageUpload
 
 from recipe import serializers
+from recipe import filters
+from recipe.bulk import bulk_create_recipes, bulk_update_recipes
+from recipe.caching import CachedResponseMixin, normalize_flag, \
+    normalize_ids
+from recipe.conditional import ConditionalListMixin
+from recipe.export import export_recipes
+from recipe.listing import ATTR_LIST_FIELDS, LeanListMixin, \
+    TimedRetrieveMixin, recipe_rows, serialize_recipe_rows
+from recipe import uploads
+from recipe.images import staging_path
+from recipe.tasks import queue_recipe_image, queue_staged_image
+from recipe.pagination import RecipeAttrCursorPagination, \
+    RecipeCursorPagination, TypeaheadPagination
 
 
 # class TagViewSet(viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin):
@@ -48,50 +68,96 @@ from recipe import serializers
 
 # REFACTOR CODE......
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+class BaseRecipeAttrViewSet(ReplicaReadMixin,
+                            ChunkedRenderMixin,
+                            ConditionalListMixin,
+                            CachedResponseMixin,
+                            LeanListMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """Base viewset for user owned recipe attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeAttrCursorPagination
+    list_fields = ATTR_LIST_FIELDS
+    cache_query_params = {
+        'assigned_only': normalize_flag,
+        'ordering': str,
+        'q': str,
+        'limit': int,
+        'cursor': str,
+        'page_size': int,
+    }
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
         assigned_only = bool(
             int(self.request.query_params.get('assigned_only', 0))
         )
-        queryset = self.queryset
+        queryset = self.queryset.filter(user=self.request.user)
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = filters.filter_assigned(queryset)
+        query = self.request.query_params.get('q')
+        if query:
+            return filters.typeahead(queryset, query)
+
+        return queryset.order_by('-name', 'id')
+
+
+    @property
+    def paginator(self):
+        """Return the best matches only for a typeahead query q"""
+        if not hasattr(self, '_paginator') and \
+                self.request.query_params.get('q'):
+            self._paginator = TypeaheadPagination()
+
+        return super().paginator
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-name').distinct()
 
-        
     def perform_create(self, serializer):
         """Create a new object"""
-        serializer.save(user=self.request.user)
+        with versions.atomic():
+            serializer.save(user=self.request.user)
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags in the database"""
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    version_collection = versions.TAGS
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage ingredients in the database"""
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    version_collection = versions.INGREDIENTS
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin,
+                    ChunkedRenderMixin,
+                    ConditionalListMixin,
+                    CachedResponseMixin,
+                    LeanListMixin,
+                    TimedRetrieveMixin,
+                    viewsets.ModelViewSet):
     """Manage recipe in the database"""
     serializer_class = serializers.RecipeSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeCursorPagination
     queryset = Recipe.objects.all()
+    version_collection = versions.RECIPES
+    cache_query_params = {
+        'tag': normalize_ids,
+        'ingredient': normalize_ids,
+        'match': str,
+        'search': str,
+        'cursor': str,
+        'page_size': int,
+    }
+    bulk_max_items = 1000
 
 
     def _params_to_ints(self, qs):
@@ -103,20 +169,71 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Retrieve the recipes for the authenticated user"""
         tags = self.request.query_params.get('tag')
         ingredients = self.request.query_params.get('ingredient')
+        search = self.request.query_params.get('search')
+        match = self.request.query_params.get('match', filters.MATCH_ANY)
+        if match not in filters.MATCH_CHOICES:
+            raise ValidationError(
+                {'match': f'Must be one of {", ".join(filters.MATCH_CHOICES)}'}
+            )
         queryset = self.queryset
         if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tag__id__in=tag_ids)
+            queryset = filters.filter_recipes_by_related(
+                queryset, 'tag', self._params_to_ints(tags), match
+            )
         if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredient__id__in=ingredient_ids)
+            queryset = filters.filter_recipes_by_related(
+                queryset,
+                'ingredient',
+                self._params_to_ints(ingredients),
+                match
+            )
+        queryset = queryset.filter(user=self.request.user)
+        if search:
+            queryset = filters.search_recipes(queryset, search).order_by(
+                '-rank', '-id'
+            )
+        else:
+            queryset = queryset.order_by('-id')
 
-        return queryset.filter(user=self.request.user)
+        return self._prefetch_related(queryset)
+
+
+    def _prefetch_related(self, queryset):
+        """Prefetch tags and ingredients with only the columns needed"""
+        if self.action != 'retrieve':
+            return queryset
+        fields = ATTR_LIST_FIELDS
+
+        return queryset.prefetch_related(
+            Prefetch('tag', queryset=Tag.objects.only(*fields)),
+            Prefetch('ingredient', queryset=Ingredient.objects.only(*fields)),
+        )
+
+
+    def get_list_rows(self, queryset):
+        return recipe_rows(queryset)
+
+
+    def serialize_rows(self, rows):
+        return serialize_recipe_rows(rows, self.request)
 
 
     def perform_create(self, serializer):
         """Create a new object"""
-        serializer.save(user=self.request.user)
+        with versions.atomic():
+            serializer.save(user=self.request.user)
+
+
+    def perform_update(self, serializer):
+        """Update an object"""
+        with versions.atomic():
+            serializer.save()
+
+
+    def perform_destroy(self, instance):
+        """Delete an object"""
+        with versions.atomic():
+            instance.delete()
 
     
     def get_serializer_class(self):
@@ -125,13 +242,15 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeDetailsSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action in ('start_image_upload', 'image_upload_chunk'):
+            return serializers.RecipeImageUploadSerializer
 
         return self.serializer_class
 
 
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """Upload an image to a recipe"""
+        """Accept an image for a recipe and queue it for processing"""
         recipe = self.get_object()
         serializer = self.get_serializer(
             recipe,
@@ -139,13 +258,215 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
         if serializer.is_valid():
-            serializer.save()
+            with versions.atomic():
+                queue_recipe_image(
+                    recipe,
+                    serializer.validated_data['image']
+                )
+            recipe.refresh_from_db()
+            return Response(
+                self.get_serializer(recipe).data,
+                status=status.HTTP_202_ACCEPTED
+            )
+
+        return Response(
+            serializer.errors,
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+
+    @action(methods=['POST'], detail=True, url_path='image-upload')
+    def start_image_upload(self, request, pk=None):
+        """Start a resumable chunked upload of an image for a recipe"""
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+
+        if serializer.is_valid():
+            path = staging_path()
+            open(path, 'wb').close()
+            serializer.save(recipe=recipe, path=path)
             return Response(
                 serializer.data,
-                status=status.HTTP_200_OK
+                status=status.HTTP_201_CREATED
             )
 
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+
+    @action(
+        methods=['GET', 'PUT'],
+        detail=True,
+        url_path=r'image-upload/(?P<upload_id>[0-9a-f-]+)'
+    )
+    def image_upload_chunk(self, request, pk=None, upload_id=None):
+        """Report the progress of an upload or append a chunk to it
+
+        Chunks are sent as the raw request body with a Content-Range
+        header and an optional X-Chunk-Checksum SHA-256 hex digest. Once
+        the last byte arrives the image is queued for processing.
+        """
+        recipe = self.get_object()
+        upload = get_object_or_404(
+            RecipeImageUpload,
+            id=upload_id,
+            recipe=recipe
+        )
+        if request.method == 'GET':
+            return Response(self.get_serializer(upload).data)
+
+        try:
+            start, length = uploads.parse_content_range(
+                request.META.get('HTTP_CONTENT_RANGE'),
+                upload.size
+            )
+            uploads.write_chunk(
+                upload,
+                request.stream,
+                start,
+                length,
+                request.META.get('HTTP_X_CHUNK_CHECKSUM', '')
+            )
+            if upload.offset == upload.size:
+                uploads.verify_upload(upload)
+        except uploads.UploadError as error:
+            if error.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE:
+                uploads.discard_upload(upload)
+            return Response(
+                {'detail': error.message},
+                status=error.status_code
+            )
+
+        if upload.offset < upload.size:
+            return Response(self.get_serializer(upload).data)
+
+        with versions.atomic():
+            upload.delete()
+            queue_staged_image(recipe, upload.path)
+        recipe.refresh_from_db()
+        return Response(
+            serializers.RecipeImageSerializer(
+                recipe,
+                context=self.get_serializer_context()
+            ).data,
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+    @action(
+        methods=['GET'],
+        detail=False,
+        url_path='export',
+        renderer_classes=(NDJSONRenderer,)
+    )
+    def export(self, request):
+        """Stream every recipe of the user as newline delimited JSON
+
+        Accepts the same tag, ingredient, match and search filters as the
+        list. Each line holds one recipe with its tags and ingredients.
+        """
+        response = StreamingHttpResponse(
+            export_recipes(self.get_queryset(), request),
+            content_type=NDJSONRenderer.media_type
+        )
+        response['Content-Disposition'] = \
+            'attachment; filename="recipes.ndjson"'
+
+        return response
+
+
+    @action(methods=['POST', 'PATCH'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """Create or partially update a list of recipes in one transaction"""
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {'non_field_errors': ['Expected a list of items.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > self.bulk_max_items:
+            return Response(
+                {'non_field_errors': [
+                    f'Ensure there are no more than {self.bulk_max_items} '
+                    f'items.'
+                ]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if request.method == 'POST':
+            return self._bulk_create(items)
+
+        return self._bulk_update(items)
+
+
+    def _bulk_create(self, items):
+        """Validate and create every item or none of them"""
+        serializer = self.get_serializer(data=items, many=True)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with versions.atomic():
+            recipes = bulk_create_recipes(
+                self.request.user,
+                serializer.validated_data
+            )
+
+        return Response(
+            self._bulk_response_data(recipes),
+            status=status.HTTP_201_CREATED
+        )
+
+
+    def _bulk_update(self, items):
+        """Validate and apply every partial update or none of them"""
+        ids = [item.get('id') if isinstance(item, dict) else None
+               for item in items]
+        instances = Recipe.objects.filter(user=self.request.user).in_bulk(
+            [pk for pk in ids if isinstance(pk, int)]
+        )
+        serializer = self.get_serializer(data=items, many=True, partial=True)
+        valid = serializer.is_valid()
+        errors = serializer.errors if not valid else [{} for _ in items]
+
+        seen = set()
+        for index, pk in enumerate(ids):
+            if pk not in instances:
+                errors[index]['id'] = ['Recipe not found.']
+            elif pk in seen:
+                errors[index]['id'] = ['Duplicate id.']
+            seen.add(pk)
+
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with versions.atomic():
+            recipes = bulk_update_recipes(
+                [instances[pk] for pk in ids],
+                serializer.validated_data
+            )
+
+        return Response(
+            self._bulk_response_data(recipes),
+            status=status.HTTP_200_OK
+        )
+
+
+    def _bulk_response_data(self, recipes):
+        """Serialize recipes written by a bulk request in input order"""
+        queryset = Recipe.objects.filter(
+            id__in=[recipe.id for recipe in recipes]
+        ).prefetch_related(
+            Prefetch('tag', queryset=Tag.objects.only('id')),
+            Prefetch('ingredient', queryset=Ingredient.objects.only('id')),
+        )
+        written = {recipe.id: recipe for recipe in queryset}
+
+        return serializers.RecipeSerializer(
+            [written[recipe.id] for recipe in recipes],
+            many=True
+        ).data